@@ -11,8 +11,6 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from . import op
-
 bl_info = {
     "name": "UEModel Exporter",
     "author": "HAI",
@@ -24,11 +22,14 @@ bl_info = {
 }
 
 
+# op is imported lazily so the exporter core (exporter/builder.py and friends) can be imported without bpy
 def register():
+    from . import op
     op.register()
 
 
 def unregister():
+    from . import op
     op.unregister()
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+"""
+Fans a manifest of .blend files out over several background blender processes, doesn't need bpy itself:
+    python batch_driver.py manifest.json --blender /path/to/blender --jobs 8 --report report.json
+
+The manifest looks like
+    {
+        "defaults": {"scale_factor": 100},
+        "jobs": [
+            {"blend": "props/crate.blend", "output": "out/crate.uemodel", "options": {"export_collision": false}},
+            {"blend": "chars/walk.blend", "output": "out/walk.ueanim", "options": {"key_reduction": true}},
+            ...
+        ]
+    }
+relative paths are resolved against the manifest's folder. .ueanim outputs export an animation (see cli.py),
+defaults only take options that every job's format has.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from time import perf_counter
+
+CLI_PATH = Path(__file__).resolve().parent / "cli.py"
+
+
+@dataclass(slots=True)
+class JobResult:
+    blend: str
+    output: str
+    exit_code: int
+    duration: float
+    log_tail: str
+
+
+def run_job(blender: str, job: dict, job_manifest: Path, timeout: float | None) -> JobResult:
+    command = [
+        blender,
+        "--background",
+        "--factory-startup",
+        job["blend"],
+        "--python-exit-code", "1",
+        "--python", str(CLI_PATH),
+        "--",
+        "--manifest", str(job_manifest),
+    ]
+
+    start_time = perf_counter()
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, timeout=timeout, check=False)
+        exit_code = process.returncode
+        log = process.stdout + process.stderr
+    except subprocess.TimeoutExpired as e:
+        exit_code = -1
+        log = f"Timed out after {timeout} seconds\n{e.stdout or ''}"
+    duration = perf_counter() - start_time
+
+    return JobResult(job["blend"], job["output"], exit_code, duration, "\n".join(log.splitlines()[-20:]))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Export many .blend files to .uemodel or .ueanim in parallel")
+    parser.add_argument("manifest", type=Path)
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"), help="blender executable")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="number of blender processes")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds before a job is killed")
+    parser.add_argument("--report", type=Path, help="write the results as json")
+    args = parser.parse_args(argv)
+
+    manifest = json.loads(args.manifest.read_text())
+    root = args.manifest.resolve().parent
+    defaults = manifest.get("defaults", {})
+
+    jobs = []
+    for job in manifest["jobs"]:
+        jobs.append({
+            "blend": str(root / job["blend"]),
+            "output": str(root / job["output"]),
+            "options": {**defaults, **job.get("options", {})},
+        })
+
+    start_time = perf_counter()
+    with tempfile.TemporaryDirectory() as temp_dir, ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        futures = []
+        for idx, job in enumerate(jobs):
+            job_manifest = Path(temp_dir) / f"job_{idx}.json"
+            job_manifest.write_text(json.dumps({"output": job["output"], "options": job["options"]}))
+            futures.append(pool.submit(run_job, args.blender, job, job_manifest, args.timeout))
+
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            status = "ok" if result.exit_code == 0 else f"FAILED ({result.exit_code})"
+            print(f"[{status}] {result.blend} -> {result.output} in {result.duration:.2f} s")  # noqa: T201
+            if result.exit_code != 0:
+                print(result.log_tail)  # noqa: T201
+    total_time = perf_counter() - start_time
+
+    failed = [result for result in results if result.exit_code != 0]
+    busy_time = sum(result.duration for result in results)
+    print(  # noqa: T201
+        f"{len(results) - len(failed)}/{len(results)} exports succeeded in {total_time:.2f} s "
+        f"({busy_time:.2f} s of blender time, {busy_time / max(total_time, 1e-9):.1f}x parallel)"
+    )
+
+    if args.report:
+        args.report.write_text(json.dumps({
+            "total_time": total_time,
+            "results": [asdict(result) for result in results],
+        }, indent=4))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
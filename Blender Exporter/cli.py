@@ -0,0 +1,132 @@
+"""
+Headless export, run inside blender:
+    blender -b file.blend --python-exit-code 1 --python cli.py -- --output file.uemodel --scale-factor 1 --no-export-collision
+    blender -b file.blend --python-exit-code 1 --python cli.py -- --manifest job.json
+    blender -b file.blend --python-exit-code 1 --python cli.py -- --output walk.ueanim --no-key-reduction
+
+A manifest is a json object like {"output": "file.uemodel", "options": {"scale_factor": 1}},
+arguments given on the command line override the manifest. Outputs ending in .ueanim export the animation
+of the active armature (or set "format": "ueanim"), the model options don't apply to those and vice versa.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import traceback
+from dataclasses import MISSING, fields
+from pathlib import Path
+from typing import get_type_hints
+
+if __name__ in ("__main__", "__mp_main__") and not __package__:
+    # started with --python, load this folder as a package so the relative imports below work.
+    # spawned worker processes (convex hulls) import the main script again as __mp_main__
+    import importlib.util
+
+    package_dir = Path(__file__).resolve().parent
+    spec = importlib.util.spec_from_file_location(
+        "uemodel_exporter",
+        package_dir / "__init__.py",
+        submodule_search_locations=[str(package_dir)],
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["uemodel_exporter"] = package
+    spec.loader.exec_module(package)
+    __package__ = "uemodel_exporter"
+
+from .importer.logging import Log
+from .options import UEAnimOptions, UEFormatOptions, UEModelOptions
+
+OPTIONS_BY_FORMAT: dict[str, type[UEFormatOptions]] = {"uemodel": UEModelOptions, "ueanim": UEAnimOptions}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="uemodel_exporter", description="Export the open .blend file to .uemodel or .ueanim")
+    parser.add_argument("--output", type=Path, help="output file, or output directory when --batch-mode is set")
+    parser.add_argument("--manifest", type=Path, help="json file with the output path and options")
+    parser.add_argument("--format", choices=list(OPTIONS_BY_FORMAT), help="default: from the output's extension, else uemodel")
+
+    # one flag per option of every format, so new options show up here without extra work
+    # the type comes from the annotation, a default like scale_factor = 100 would make it an int flag
+    added = set()
+    for options_class in OPTIONS_BY_FORMAT.values():
+        option_types = get_type_hints(options_class)
+        for option in fields(options_class):
+            if option.name in added:
+                continue
+            added.add(option.name)
+
+            flag = "--" + option.name.replace("_", "-")
+            default = option.default if option.default is not MISSING else None
+            if isinstance(default, bool):
+                parser.add_argument(flag, action=argparse.BooleanOptionalAction, default=None, help=f"default: {default}")
+            else:
+                parser.add_argument(flag, type=option_types[option.name], default=None, help=f"default: {default}")
+
+    return parser
+
+
+def parse_job(argv: list[str]) -> tuple[Path, UEFormatOptions]:
+    args = build_parser().parse_args(argv)
+
+    output = None
+    export_format = None
+    option_values = {}
+    if args.manifest:
+        manifest = json.loads(args.manifest.read_text())
+        if manifest.get("output"):
+            output = args.manifest.parent / manifest["output"]
+        export_format = manifest.get("format")
+        option_values.update(manifest.get("options", {}))
+
+    output = args.output or output
+    if output is None:
+        raise ValueError("No output given, pass --output or set it in the manifest")
+
+    export_format = args.format or export_format or ("ueanim" if output.suffix == ".ueanim" else "uemodel")
+    if export_format not in OPTIONS_BY_FORMAT:
+        raise ValueError(f"Unknown format {export_format}")
+    options_class = OPTIONS_BY_FORMAT[export_format]
+
+    option_names = {option.name for option in fields(options_class)}
+    for name in {option.name for options in OPTIONS_BY_FORMAT.values() for option in fields(options)}:
+        value = getattr(args, name)
+        if value is not None:
+            option_values[name] = value
+
+    unknown_options = set(option_values) - option_names
+    if unknown_options:
+        raise ValueError(f"Unknown {export_format} options: {', '.join(sorted(unknown_options))}")
+
+    return output, options_class(**option_values)
+
+
+def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        # blender leaves its own arguments in sys.argv, ours come after "--"
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    try:
+        output, options = parse_job(argv)
+
+        from .exporter.logic import UEFormatExport
+
+        if getattr(options, "batch_mode", "NONE") != "NONE":
+            from .exporter.batch import collect_batch_groups, export_batch
+
+            output.mkdir(parents=True, exist_ok=True)
+            groups = collect_batch_groups(options.batch_mode, UEFormatExport(options).get_objects())
+            export_batch(options, output, groups)
+        else:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            UEFormatExport(options).export_file(output)
+    except Exception:  # noqa: BLE001
+        Log.error(traceback.format_exc())
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
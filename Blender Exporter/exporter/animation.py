@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import numpy as np
+import numpy.typing as npt
+
+from ..importer import classes as uf_classes
+from .skeleton import compute_local_transforms, decompose_transforms
+
+# samples are stored as (frames, bones, 10): translation xyz, rotation xyzw, scale xyz
+POSITION_CHANNELS = slice(0, 3)
+ROTATION_CHANNELS = slice(3, 7)
+SCALE_CHANNELS = slice(7, 10)
+
+
+def build_pose_samples(matrices: npt.NDArray[np.floating], parent_indices: npt.NDArray[np.integer]) -> npt.NDArray[np.float64]:
+    """Turns (frames, bones, 4, 4) armature space pose matrices into (frames, bones, 10) parent relative samples."""
+    num_frames, num_bones = matrices.shape[:2]
+
+    # every frame is its own skeleton, offset the parents so all frames go through in one call
+    frame_offsets = np.arange(num_frames)[:, None] * num_bones
+    all_parents = np.where(parent_indices[None, :] != -1, parent_indices[None, :] + frame_offsets, -1).reshape(-1)
+    local_matrices = compute_local_transforms(matrices.reshape(-1, 4, 4), all_parents)
+    translations, rotations, scales = decompose_transforms(local_matrices)
+
+    samples = np.empty((num_frames * num_bones, 10), dtype=np.float64)
+    samples[:, POSITION_CHANNELS] = translations
+    samples[:, ROTATION_CHANNELS] = rotations
+    samples[:, SCALE_CHANNELS] = scales
+    return samples.reshape(num_frames, num_bones, 10)
+
+
+def interpolate_kept(values: npt.NDArray[np.float64], keep: npt.NDArray[np.bool_], is_rotation: bool = False) -> npt.NDArray[np.float64]:
+    """
+    Rebuilds every frame of (frames, bones, channels) values from the kept keys only, linearly between neighbours,
+    the way they'll be played back. Rotations are nlerped along the shorter arc.
+    """
+    num_frames = len(values)
+    frames = np.arange(num_frames)[:, None]
+    previous = np.maximum.accumulate(np.where(keep, frames, 0), axis=0)
+    following = np.flip(np.minimum.accumulate(np.flip(np.where(keep, frames, num_frames - 1), axis=0), axis=0), axis=0)
+
+    span = following - previous
+    t = np.where(span > 0, (frames - previous) / np.maximum(span, 1), 0.0)[..., None]
+    start = np.take_along_axis(values, previous[..., None], axis=0)
+    end = np.take_along_axis(values, following[..., None], axis=0)
+
+    if is_rotation:
+        end = np.where(np.sum(start * end, axis=-1, keepdims=True) < 0, -end, end)
+        rebuilt = start + (end - start) * t
+        return rebuilt / np.maximum(np.linalg.norm(rebuilt, axis=-1, keepdims=True), 1e-12)
+    return start + (end - start) * t
+
+
+def key_errors(values: npt.NDArray[np.float64], rebuilt: npt.NDArray[np.float64], is_rotation: bool = False) -> npt.NDArray[np.float64]:
+    if is_rotation:
+        # angle between the quaternions in radians, q and -q are the same rotation
+        cosines = np.clip(np.abs(np.sum(values * rebuilt, axis=-1)), 0.0, 1.0)
+        return 2.0 * np.arccos(cosines)
+    return np.linalg.norm(values - rebuilt, axis=-1)
+
+
+def reduce_keys(values: npt.NDArray[np.float64], tolerance: float, is_rotation: bool = False) -> npt.NDArray[np.bool_]:
+    """
+    Picks which keys of (frames, bones, channels) values to keep so linear playback stays within tolerance,
+    for every bone at once. Starts from the first and last key and keeps adding the worst frame of every
+    segment that's still off, like Douglas-Peucker. Tracks that never move end up with a single key.
+    """
+    num_frames, num_bones = values.shape[:2]
+    keep = np.zeros((num_frames, num_bones), dtype=bool)
+    keep[0] = True
+    if tolerance <= 0:
+        keep[:] = True
+        return keep
+
+    keep[-1] = True
+    frames = np.arange(num_frames)[:, None]
+    active = np.arange(num_bones)  # bones that still have frames out of tolerance
+    while len(active) != 0:
+        active_values, active_keep = values[:, active], keep[:, active]
+        errors = key_errors(active_values, interpolate_kept(active_values, active_keep, is_rotation), is_rotation)
+        errors[active_keep] = 0.0
+        off = errors > tolerance
+        if not np.any(off):
+            break
+
+        # one new key per (segment, bone): the frame with the biggest error since the previous kept key
+        segments = np.maximum.accumulate(np.where(active_keep, frames, 0), axis=0)
+        frame_indices, bone_indices = np.nonzero(off)
+        segment_keys = segments[frame_indices, bone_indices].astype(np.int64) * len(active) + bone_indices
+        order = np.lexsort((-errors[frame_indices, bone_indices], segment_keys))
+        first = np.concatenate(([True], segment_keys[order][1:] != segment_keys[order][:-1]))
+        worst = order[first]
+        keep[frame_indices[worst], active[bone_indices[worst]]] = True
+
+        active = active[np.any(off, axis=0)]
+
+    # a track that ends where it started and stayed within tolerance doesn't need its last key
+    if num_frames > 1:
+        two_keys = np.count_nonzero(keep, axis=0) == 2
+        unchanged = key_errors(values[-1], values[0], is_rotation) <= tolerance
+        keep[-1, two_keys & unchanged] = False
+    return keep
+
+
+def build_tracks(
+    names: list[str],
+    samples: npt.NDArray[np.floating],
+    position_tolerance: float = 0.0,
+    rotation_tolerance: float = 0.0,
+    scale_tolerance: float = 0.0,
+) -> list[uf_classes.Track]:
+    """Reduces the keys of (frames, bones, 10) samples channel by channel and packs them into one track per bone."""
+    samples = np.asarray(samples, dtype=np.float64)
+    keep_positions = reduce_keys(samples[:, :, POSITION_CHANNELS], position_tolerance)
+    keep_rotations = reduce_keys(samples[:, :, ROTATION_CHANNELS], rotation_tolerance, is_rotation=True)
+    keep_scales = reduce_keys(samples[:, :, SCALE_CHANNELS], scale_tolerance)
+
+    def pack_keys(keep: npt.NDArray[np.bool_], values: npt.NDArray[np.float64], dtype: np.dtype) -> npt.NDArray[np.void]:
+        key_frames = np.flatnonzero(keep)
+        keys = np.empty(len(key_frames), dtype=dtype)
+        keys["frame"] = key_frames
+        keys["value"] = values[key_frames]
+        return keys
+
+    return [
+        uf_classes.Track(
+            name,
+            pack_keys(keep_positions[:, idx], samples[:, idx, POSITION_CHANNELS], uf_classes.VECTOR_KEY_DTYPE),
+            pack_keys(keep_rotations[:, idx], samples[:, idx, ROTATION_CHANNELS], uf_classes.QUAT_KEY_DTYPE),
+            pack_keys(keep_scales[:, idx], samples[:, idx, SCALE_CHANNELS], uf_classes.VECTOR_KEY_DTYPE),
+        )
+        for idx, name in enumerate(names)
+    ]
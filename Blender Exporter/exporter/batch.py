@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from time import perf_counter
+
+import bpy
+from bpy.types import ArmatureModifier, Object
+
+from ..importer import classes as uf_classes
+from ..importer.logging import Log, Profiler, get_peak_rss
+from ..options import UEModelOptions
+from .logic import UEFormatExport
+
+
+@dataclass(slots=True)
+class BatchFileResult:
+    path: Path
+    build_time: float
+    write_time: float
+    num_bytes: int
+
+
+def collect_batch_groups(mode: str, objects: list[Object]) -> list[tuple[str, list[Object]]]:
+    """
+    Splits the objects into one group per output file, named after the object or top-level collection.
+    Objects outside every collection are grouped under the scene name.
+    """
+    if mode == "OBJECT":
+        groups = []
+        for obj in objects:
+            if obj.type != "MESH":
+                continue
+            # skinned meshes need their skeleton to stay valid on their own
+            armature_objects = [
+                modifier.object for modifier in obj.modifiers
+                if isinstance(modifier, ArmatureModifier) and modifier.object
+            ]
+            groups.append((obj.name, [*armature_objects[:1], obj]))
+        return groups
+
+    if mode == "COLLECTION":
+        exported = set(objects)
+        scene = bpy.context.scene
+        groups = []
+        for collection in scene.collection.children:
+            collection_objects = [obj for obj in collection.all_objects if obj in exported]
+            if collection_objects:
+                groups.append((collection.name, collection_objects))
+
+        # objects that sit right in the scene collection aren't in any top-level collection, they get a file named after the scene
+        root_objects = [obj for obj in scene.collection.objects if obj in exported]
+        if root_objects:
+            Log.info(f"{len(root_objects)} objects aren't in a collection, exporting them as {scene.name}")
+            groups.append((scene.name, root_objects))
+        return groups
+
+    raise ValueError(f"Unknown batch mode {mode}")
+
+
+def unique_path(directory: Path, name: str, extension: str, used_paths: set[str]) -> Path:
+    """
+    Names that clean to the same file name (Rock.001 and Rock_001) get _1, _2... appended, otherwise the pool would
+    write both to one file. Compared case insensitively, like windows and macos file systems do.
+    """
+    stem = bpy.path.clean_name(name)
+    path = directory / (stem + extension)
+    suffix = 1
+    while path.name.lower() in used_paths:
+        path = directory / f"{stem}_{suffix}{extension}"
+        suffix += 1
+
+    if suffix != 1:
+        Log.warn(f"{stem}{extension} is taken already, exporting {name} as {path.name}")
+    used_paths.add(path.name.lower())
+    return path
+
+
+def export_batch(
+    options: UEModelOptions,
+    directory: Path,
+    groups: list[tuple[str, list[Object]]],
+    extension: str = ".uemodel",
+) -> list[BatchFileResult]:
+    """
+    Extracts every group on the calling (main) thread and serializes the finished models on a thread pool,
+    so writing one file overlaps with extracting the next. Profiled files are written on the calling thread,
+    the profiler only follows the thread that started it.
+    """
+    results: list[BatchFileResult] = []
+    start_time = perf_counter()
+
+    def build(exporter: UEFormatExport, path: Path, object_name: str) -> tuple[uf_classes.UEModel | None, float]:
+        build_start_time = perf_counter()
+        if options.streaming_export:
+            # streaming reads the scene while it writes, so it can't move to the pool
+            exporter.stream_uemodel(path, object_name)
+            uemodel = None
+        else:
+            uemodel = exporter.build_uemodel()
+        return uemodel, perf_counter() - build_start_time
+
+    def write(exporter: UEFormatExport, path: Path, object_name: str, uemodel, build_time: float) -> BatchFileResult:
+        write_start_time = perf_counter()
+        if uemodel is not None:  # streamed files are written already
+            exporter.write_data(path, object_name, uemodel)
+        if options.validate_export:
+            exporter.validate_file(path)
+        return BatchFileResult(path, build_time, perf_counter() - write_start_time, path.stat().st_size)
+
+    used_paths: set[str] = set()
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+        futures: list[Future[BatchFileResult]] = []
+        for name, group_objects in groups:
+            path = unique_path(directory, name, extension, used_paths)
+            exporter = UEFormatExport(options, group_objects)
+            # named after the group, get_obj_name would name every mesh of a shared rig after the armature
+            object_name = name
+
+            if not options.profile_export:
+                uemodel, build_time = build(exporter, path, object_name)
+                futures.append(pool.submit(write, exporter, path, object_name, uemodel, build_time))
+                continue
+
+            Profiler.start(path.name)
+            peak_rss_before = get_peak_rss()
+            try:
+                with Profiler.phase("Build"):
+                    uemodel, build_time = build(exporter, path, object_name)
+                with Profiler.phase("Write"):
+                    result = write(exporter, path, object_name, uemodel, build_time)
+            finally:
+                phases = Profiler.stop()
+            exporter.write_profile(path, phases, get_peak_rss(), peak_rss_before)
+
+            future: Future[BatchFileResult] = Future()
+            future.set_result(result)
+            futures.append(future)
+
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            Log.info(
+                f"{result.path.name}: extracted in {result.build_time * 1000:.1f} ms, "
+                f"written in {result.write_time * 1000:.1f} ms, {result.num_bytes} bytes"
+            )
+
+    total_time = perf_counter() - start_time
+    Log.info(summarize_batch(results, total_time))
+    return results
+
+
+def summarize_batch(results: list[BatchFileResult], total_time: float) -> str:
+    total_megabytes = sum(result.num_bytes for result in results) / (1024 * 1024)
+    total_time = max(total_time, 1e-9)
+    return (
+        f"Exported {len(results)} files ({total_megabytes:.2f} MB) in {total_time:.2f} s, "
+        f"{len(results) / total_time:.2f} files/s, {total_megabytes / total_time:.2f} MB/s"
+    )
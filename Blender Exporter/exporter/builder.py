@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import io
+from collections.abc import Iterable
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+import numpy as np
+import numpy.typing as npt
+
+from ..importer import classes as uf_classes
+from ..importer.classes import ANIM_IDENTIFIER, MAGIC, MODEL_IDENTIFIER
+from ..importer.logging import Log
+from .classes import ConvexCollision, UEAnim, UEModel, UEModelLOD, UEModelSkeleton
+from .colors import quantize_unit_floats
+from .compression import compress_payload
+from .convex import build_collision_hulls
+from .decimation import generate_lod_chains
+from .vertex_cache import VERTEX_CACHE_SIZE, VertexCacheStats, optimize_lod
+from .skeleton import build_bones, build_sockets, compute_local_transforms, decompose_transforms, remove_bones
+from .writer import FArchiveWriter
+
+# nothing in here imports bpy, so models can be built and written on machines without blender
+
+
+def make_weights(
+    bone_indices: npt.ArrayLike,
+    vertex_indices: npt.ArrayLike,
+    weights: npt.ArrayLike,
+) -> npt.NDArray[np.void]:
+    columns = np.broadcast_arrays(np.asarray(bone_indices), np.asarray(vertex_indices), np.asarray(weights))
+    packed = np.empty(len(columns[0]), dtype=uf_classes.WEIGHT_DTYPE)
+    packed["bone_index"], packed["vertex_index"], packed["weight"] = columns
+    return packed
+
+
+def make_morph_target(
+    name: str,
+    vertex_indices: npt.ArrayLike,
+    position_deltas: npt.ArrayLike,
+    normal_deltas: npt.ArrayLike | None = None,
+) -> uf_classes.MorphTarget:
+    vertex_indices = np.asarray(vertex_indices).reshape(-1)
+    deltas = np.zeros(len(vertex_indices), dtype=uf_classes.MORPH_DELTA_DTYPE)
+    deltas["vertex_index"] = vertex_indices
+    deltas["position"] = np.asarray(position_deltas).reshape(-1, 3)
+    if normal_deltas is not None:
+        deltas["normal"] = np.asarray(normal_deltas).reshape(-1, 3)
+    return uf_classes.MorphTarget(name, deltas)
+
+
+def merge_lods(lods: list[uf_classes.UEModelLOD], name: str) -> uf_classes.UEModelLOD:
+    """
+    Joins the LODs of several objects into one, every section keeps its own material. Uv channels and vertex colors
+    that only some of them have are filled with zeros and white, normals and tangents are kept if all of them have them.
+    """
+    vertex_offsets = np.cumsum([0] + [len(lod.vertices) for lod in lods])
+    index_offsets = np.cumsum([0] + [lod.indices.size for lod in lods])
+
+    merged = uf_classes.UEModelLOD(name)
+    merged.vertices = np.concatenate([lod.vertices for lod in lods])
+    merged.indices = np.concatenate([lod.indices.reshape(-1, 3) + offset for lod, offset in zip(lods, vertex_offsets)]).astype(np.int32)
+    if all(len(lod.normals) == len(lod.vertices) for lod in lods):
+        merged.normals = np.concatenate([lod.normals for lod in lods])
+    if all(isinstance(lod.tangents, np.ndarray) and len(lod.tangents) == len(lod.vertices) for lod in lods):
+        merged.tangents = np.concatenate([lod.tangents for lod in lods])
+
+    for channel in range(max(len(lod.uvs) for lod in lods)):
+        merged.uvs.append(np.concatenate([
+            lod.uvs[channel] if channel < len(lod.uvs) else np.zeros((len(lod.vertices), 2), dtype=np.float32)
+            for lod in lods
+        ]))
+
+    color_names = list(dict.fromkeys(color.name for lod in lods for color in lod.colors))
+    for color_name in color_names:
+        parts = []
+        for lod in lods:
+            color = next((color for color in lod.colors if color.name == color_name), None)
+            if color is None:
+                parts.append(np.full((len(lod.vertices), 4), 255, dtype=np.uint8))
+            else:
+                parts.append(color.data if color.data.dtype == np.uint8 else quantize_unit_floats(color.data))
+        merged.colors.append(uf_classes.VertexColor(color_name, np.concatenate(parts)))
+
+    for lod, offset in zip(lods, index_offsets):
+        merged.materials += [
+            uf_classes.Material(material.material_name, material.first_index + int(offset), material.num_faces)
+            for material in lod.materials
+        ]
+
+    weights = [lod.weights.copy() for lod in lods]
+    for lod_weights, offset in zip(weights, vertex_offsets):
+        lod_weights["vertex_index"] += offset
+    merged.weights = np.concatenate(weights)
+
+    morph_names = list(dict.fromkeys(morph.name for lod in lods for morph in lod.morphs))
+    for morph_name in morph_names:
+        parts = []
+        for lod, offset in zip(lods, vertex_offsets):
+            for morph in lod.morphs:
+                if morph.name == morph_name:
+                    deltas = morph.deltas.copy()
+                    deltas["vertex_index"] += offset
+                    parts.append(deltas)
+        merged.morphs.append(uf_classes.MorphTarget(morph_name, np.concatenate(parts)))
+
+    return merged
+
+
+class UEModelBuilder:
+    """Collects LODs, collisions and a skeleton from plain numpy arrays and turns them into a UEModel."""
+
+    def __init__(self) -> None:
+        # serialized entries (bytes) can be mixed in, they're written out as they are
+        self.lods: list[uf_classes.UEModelLOD | bytes] = []
+        self.collisions: list[uf_classes.ConvexCollision | bytes] = []
+        self.skeleton: uf_classes.UEModelSkeleton | bytes | None = None
+        self.removed_bones: list[int] = []
+        self.num_bones = 0
+
+    def add_lod(
+        self,
+        name: str,
+        vertices: npt.ArrayLike,
+        indices: npt.ArrayLike,
+        *,
+        normals: npt.ArrayLike | None = None,
+        tangents: npt.ArrayLike | None = None,
+        uvs: Iterable[npt.ArrayLike] = (),
+        colors: Iterable[uf_classes.VertexColor] = (),
+        materials: Iterable[uf_classes.Material] = (),
+        weights: npt.NDArray[np.void] | None = None,
+        morphs: Iterable[uf_classes.MorphTarget] = (),
+    ) -> uf_classes.UEModelLOD:
+        """Adds a LOD, every per vertex array has to be indexed the same way as vertices."""
+        lod = uf_classes.UEModelLOD(name)
+        lod.vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+        lod.indices = np.asarray(indices, dtype=np.int32).reshape(-1, 3)
+
+        if normals is not None:
+            normals = np.asarray(normals, dtype=np.float32)
+            if normals.shape[-1] == 3:
+                # stored as (binormal sign, x, y, z)
+                normals = np.hstack((np.ones((len(normals), 1), dtype=np.float32), normals))
+            lod.normals = normals
+        if tangents is not None:
+            lod.tangents = np.asarray(tangents, dtype=np.float32).reshape(-1, 3)
+
+        lod.uvs = [np.asarray(uv, dtype=np.float32).reshape(-1, 2) for uv in uvs]
+        lod.colors = list(colors)
+        lod.materials = list(materials)
+        if weights is not None:
+            lod.weights = weights
+        lod.morphs = list(morphs)
+
+        self.lods.append(lod)
+        return lod
+
+    def add_collision(self, name: str, vertices: npt.ArrayLike, indices: npt.ArrayLike) -> uf_classes.ConvexCollision:
+        collision = uf_classes.ConvexCollision(
+            name,
+            np.asarray(vertices, dtype=np.float32).reshape(-1, 3),
+            np.asarray(indices, dtype=np.int32).reshape(-1, 3),
+        )
+        self.collisions.append(collision)
+        return collision
+
+    def add_serialized_lod(self, data: bytes) -> None:
+        """Adds a LOD that was serialized with serialize_entry, its weights have to be final already."""
+        self.lods.append(data)
+
+    def add_serialized_collision(self, data: bytes) -> None:
+        self.collisions.append(data)
+
+    def set_serialized_skeleton(self, data: bytes, num_bones: int, socket_indices: list[int] | None = None) -> None:
+        """
+        Sets an already serialized skeleton, num_bones and socket_indices describe the armature it came from
+        so the weights of the other LODs still get remapped.
+        """
+        self.skeleton = data
+        self.num_bones = num_bones
+        self.removed_bones = list(socket_indices or [])
+
+    def set_bone_removal(self, num_bones: int, removed_bones: list[int]) -> None:
+        """
+        For a builder that only gets some of the LODs while the skeleton is handled somewhere else (streaming),
+        its weights are still remapped against the skeleton when it's built.
+        """
+        self.num_bones = num_bones
+        self.removed_bones = list(removed_bones)
+
+    def set_skeleton(
+        self,
+        names: list[str],
+        parent_indices: npt.ArrayLike,
+        matrices: npt.ArrayLike,
+        *,
+        socket_indices: list[int] | None = None,
+        export_sockets: bool = True,
+    ) -> uf_classes.UEModelSkeleton:
+        """
+        Sets the skeleton from armature space (N, 4, 4) bone matrices.
+        Socket bones are exported as sockets and taken out of the bone list when the model is built.
+        """
+        parent_indices = np.asarray(parent_indices, dtype=np.int32)
+        translations, rotations, scales = decompose_transforms(compute_local_transforms(matrices, parent_indices))
+
+        self.skeleton = uf_classes.UEModelSkeleton()
+        self.num_bones = len(names)
+        self.skeleton.bones = build_bones(names, parent_indices, translations, rotations)
+        self.removed_bones = list(socket_indices or [])
+        if export_sockets:
+            self.skeleton.sockets = build_sockets(names, parent_indices, self.removed_bones, translations, rotations, scales)
+        return self.skeleton
+
+    def generate_lod_chains(self, ratios: list[float]) -> dict[int, list[uf_classes.UEModelLOD]]:
+        """
+        Decimates every LOD0 once per triangle ratio into LOD1..N and puts each chain right behind its LOD0.
+        Entries of the LODS list are read as successive levels, so the LOD0s of several objects are merged
+        into one LOD per level instead. Returns the chains by id() of the LOD0 they were made from.
+        """
+        base_lods = [lod for lod in self.lods if isinstance(lod, uf_classes.UEModelLOD) and lod.name == "LOD0"]
+        if len(ratios) == 0 or len(base_lods) == 0:
+            return {}
+        if len(base_lods) != len(self.lods) and len(base_lods) > 1:
+            raise ValueError("LODs of several objects are merged, they can't be mixed with serialized or other LODs")
+
+        chains = dict(zip([id(lod) for lod in base_lods], generate_lod_chains(base_lods, ratios)))
+        if len(base_lods) == 1:
+            lods = []
+            for lod in self.lods:
+                lods.append(lod)
+                lods.extend(chains.get(id(lod), []))
+            self.lods = lods
+        else:
+            levels = [base_lods, *zip(*chains.values())]
+            self.lods = [merge_lods(list(level), f"LOD{index}") for index, level in enumerate(levels)]
+        return chains
+
+    def build_convex_hulls(
+        self,
+        max_vertices: int,
+        max_hulls: int = 1,
+        max_workers: int | None = None,
+    ) -> dict[int, list[uf_classes.ConvexCollision]]:
+        """
+        Replaces every (not yet serialized) collision with its convex hull, or up to max_hulls hulls when it's concave.
+        Returns the hulls by id() of the collision they replaced.
+        """
+        collisions = [collision for collision in self.collisions if isinstance(collision, uf_classes.ConvexCollision)]
+        hulls = dict(zip([id(collision) for collision in collisions], build_collision_hulls(collisions, max_vertices, max_hulls, max_workers)))
+        self.collisions = [hull for collision in self.collisions for hull in hulls.get(id(collision), [collision])]
+        return hulls
+
+    def optimize_lods(self, cache_size: int = VERTEX_CACHE_SIZE) -> list[tuple[uf_classes.UEModelLOD, VertexCacheStats]]:
+        """Reorders triangles and vertices of every (not yet serialized) LOD for the gpu vertex cache."""
+        return [(lod, optimize_lod(lod, cache_size)) for lod in self.lods if isinstance(lod, uf_classes.UEModelLOD)]
+
+    def build(self) -> uf_classes.UEModel:
+        if len(self.removed_bones) != 0:
+            lods = [lod for lod in self.lods if isinstance(lod, uf_classes.UEModelLOD)]
+            skeleton = self.skeleton if isinstance(self.skeleton, uf_classes.UEModelSkeleton) else None
+            remove_bones(skeleton, lods, self.removed_bones, self.num_bones)
+            self.removed_bones = []
+
+        uemodel = uf_classes.UEModel()
+        if len(self.lods) != 0:
+            uemodel.lods = self.lods
+        if len(self.collisions) != 0:
+            uemodel.collisions = self.collisions
+        if self.skeleton is not None:
+            uemodel.skeleton = self.skeleton
+        return uemodel
+
+    def write(
+        self,
+        path: str | Path | BinaryIO,
+        object_name: str,
+        scale_factor: float = 100,
+        compression_type: str = "NONE",
+    ) -> None:
+        write_uemodel(path, object_name, self.build(), scale_factor, compression_type)
+
+
+def write_uemodel(
+    path: str | Path | BinaryIO,
+    object_name: str,
+    uemodel: uf_classes.UEModel,
+    scale_factor: float = 100,
+    compression_type: str = "NONE",
+) -> None:
+    write_ueformat(path, MODEL_IDENTIFIER, object_name, lambda ar: write_uemodel_data(ar, uemodel, scale_factor), compression_type)
+
+
+def write_ueanim(
+    path: str | Path | BinaryIO,
+    object_name: str,
+    ueanim: uf_classes.UEAnim,
+    scale_factor: float = 100,
+    compression_type: str = "NONE",
+) -> None:
+    write_ueformat(path, ANIM_IDENTIFIER, object_name, lambda ar: UEAnim.to_archive(ueanim, ar, scale_factor), compression_type)
+
+
+def write_ueformat(
+    path: str | Path | BinaryIO,
+    identifier: str,
+    object_name: str,
+    write_data: Callable[[FArchiveWriter], None],
+    compression_type: str = "NONE",
+) -> None:
+    """Writes the shared header, then the payload written by write_data, compressed if asked to."""
+    # path can also be an already open binary stream, e.g. sys.stdout.buffer or socket.makefile("wb")
+    with FArchiveWriter(path) as ar:
+        ar: FArchiveWriter
+
+        is_compressed = compression_type != "NONE"
+        write_header(ar, identifier, object_name, is_compressed)
+
+        if not is_compressed:
+            write_data(ar)
+            return
+
+        payload = io.BytesIO()
+        with FArchiveWriter(payload) as payload_ar:
+            write_data(payload_ar)
+        write_compressed(ar, payload.getbuffer(), object_name, compression_type)
+
+
+def write_header(ar: FArchiveWriter, identifier: str, object_name: str, is_compressed: bool) -> None:
+    file_version = uf_classes.EUEFormatVersion.LatestVersion
+    ar.write_string(MAGIC)
+    ar.write_fstring(identifier)
+    ar.write_byte(int.to_bytes(file_version, byteorder="big"))
+    ar.write_fstring(object_name)
+    ar.write_bool(is_compressed)
+
+
+def write_compressed(ar: FArchiveWriter, uncompressed_data: memoryview, object_name: str, compression_type: str) -> None:
+    Log.time_start(f"Compress {object_name}")
+    compression_type, compressed_data = compress_payload(uncompressed_data, compression_type)
+    Log.time_end(f"Compress {object_name}")
+    Log.info(f"Compressed {uncompressed_data.nbytes} bytes to {len(compressed_data)} bytes using {compression_type}")
+
+    ar.write_fstring(compression_type)
+    ar.write_int(uncompressed_data.nbytes)
+    ar.write_int(len(compressed_data))
+    ar.write_bytes(compressed_data)
+
+
+def serialize_entry(
+    entry: uf_classes.UEModelLOD | uf_classes.ConvexCollision | uf_classes.UEModelSkeleton,
+    scale_factor: float,
+) -> bytes:
+    """Serializes one LOD, collision or skeleton exactly like UEModel.to_archive would write it."""
+    if isinstance(entry, uf_classes.UEModelLOD):
+        write = lambda ar: UEModelLOD.to_archive(entry, ar, scale_factor)
+    elif isinstance(entry, uf_classes.ConvexCollision):
+        write = lambda ar: ConvexCollision.to_archive(entry, ar, scale_factor)
+    else:
+        write = lambda ar: UEModelSkeleton.to_archive(entry, ar, scale_factor)
+
+    stream = io.BytesIO()
+    with FArchiveWriter(stream) as ar:
+        write(ar)
+    return stream.getvalue()
+
+
+def write_uemodel_data(ar: FArchiveWriter, uemodel: uf_classes.UEModel, scale_factor: float) -> None:
+    if uemodel.lods or uemodel.collisions or uemodel.skeleton:
+        UEModel.to_archive(uemodel, ar, scale_factor)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import filecmp
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+from dataclasses import fields
+from pathlib import Path
+
+from ..options import UEFormatOptions
+
+# bump whenever the serialized layout of a section or what gets extracted changes, so old entries stop matching
+CACHE_VERSION = 7
+
+# options that change how or where files are written, but not the serialized sections
+IGNORED_OPTIONS = {
+    "compression_type",
+    "profile_export",
+    "export_selected_only",
+    "batch_mode",
+    "validate_export",
+    "streaming_export",
+    "use_export_cache",
+    "export_cache_size",
+}
+
+
+def default_cache_directory() -> Path:
+    return Path(tempfile.gettempdir()) / "uemodel_export_cache"
+
+
+def new_hasher(*parts: bytes) -> hashlib.blake2b:
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(CACHE_VERSION.to_bytes(4, "little"))
+    for part in parts:
+        hasher.update(part)
+    return hasher
+
+
+def hash_options(options: UEFormatOptions) -> bytes:
+    relevant = [
+        f"{field.name}={getattr(options, field.name)!r}"
+        for field in fields(options)
+        if field.name not in IGNORED_OPTIONS
+    ]
+    return "\0".join(relevant).encode()
+
+
+class ExportCache:
+    """
+    Serialized LOD, collision and skeleton sections on disk, one file per content hash.
+    Hits bump the mtime of their file, evict() then drops the least recently used files
+    once the cache is bigger than max_size bytes.
+    """
+
+    def __init__(self, directory: Path, max_size: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        path = self.entry_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self.entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write next to the entry and swap it in, other blender instances may share the cache
+        temp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+    def evict(self) -> int:
+        entries = []
+        for path in self.directory.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+            removed += 1
+        return removed
+
+
+def pack_entries(parts: list[bytes]) -> bytes:
+    """Puts several serialized entries into one cache entry, like all the hulls of one collision object."""
+    return b"".join(struct.pack("<i", len(part)) + part for part in parts)
+
+
+def unpack_entries(data: bytes) -> list[bytes]:
+    parts = []
+    offset = 0
+    while offset < len(data):
+        size, = struct.unpack_from("<i", data, offset)
+        parts.append(data[offset + 4:offset + 4 + size])
+        offset += 4 + size
+    return parts
+
+
+def write_if_changed(path: Path, data: bytes | memoryview) -> bool:
+    """Writes data to path unless the file already holds exactly these bytes, returns whether it was written."""
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+
+    with open(path, "wb") as file:
+        file.write(data)
+    return True
+
+
+def replace_if_changed(new_path: Path, path: Path) -> bool:
+    """Moves new_path over path unless both hold the same bytes, returns whether path was replaced."""
+    try:
+        if filecmp.cmp(new_path, path, shallow=False):
+            new_path.unlink()
+            return False
+    except OSError:
+        pass
+
+    os.replace(new_path, path)
+    return True
@@ -6,12 +6,25 @@ import numpy as np
 import numpy.typing as npt
 
 from ..importer import classes as uf_classes
+from .colors import quantize_unit_floats
 from .utils import write_byte_size_wrapper
 
 if TYPE_CHECKING:
     from .writer import FArchiveWriter
 
 
+# lods, collisions and the skeleton can also be bytes that were serialized ahead of time (see builder.serialize_entry),
+# those are copied into the archive as they are
+
+# arrays that need converting go through ar.write_converted_array, so sizing a section never converts anything
+
+
+def scale_field(records: npt.NDArray, dtype: np.dtype, field: str, scale_factor: float) -> npt.NDArray:
+    scaled = records.astype(dtype)  # always a copy, so scaling doesn't touch the source
+    scaled[field] *= scale_factor
+    return scaled
+
+
 class UEModel:
     @classmethod
     def to_archive(
@@ -25,7 +38,7 @@ class UEModel:
             ar.write_int(len(model.lods))
             write_byte_size_wrapper(ar, lambda ar: sum([UEModelLOD.to_archive(lod, ar, scale_factor) for lod in model.lods]))
 
-        if model.skeleton:
+        if model.skeleton is not None:
             ar.write_fstring("SKELETON")
             ar.write_int(1)
             not_none_skel: uf_classes.UEModelSkeleton = model.skeleton
@@ -37,6 +50,43 @@ class UEModel:
             write_byte_size_wrapper(ar, lambda ar: sum([ConvexCollision.to_archive(collision, ar, scale_factor) for collision in model.collisions]))
 
 
+class UEAnim:
+    @classmethod
+    def to_archive(
+        cls,
+        anim: uf_classes.UEAnim,
+        ar: FArchiveWriter,
+        scale_factor: float,
+    ) -> None:
+        ar.write_int(anim.num_frames)
+        ar.write_float(anim.frames_per_second)
+
+        if anim.tracks and len(anim.tracks) != 0:
+            ar.write_fstring("TRACKS")
+            ar.write_int(len(anim.tracks))
+            write_byte_size_wrapper(ar, lambda ar: sum([Track.to_archive(track, ar, scale_factor) for track in anim.tracks]))
+
+
+class Track:
+    @classmethod
+    def to_archive(cls, track: uf_classes.Track, ar: FArchiveWriter, scale_factor: float) -> int:
+        number_bytes_written = ar.write_fstring(track.name)
+
+        number_bytes_written += ar.write_int(len(track.position_keys))
+        number_bytes_written += ar.write_converted_array(
+            track.position_keys,
+            uf_classes.VECTOR_KEY_DTYPE,
+            lambda keys: scale_field(keys, uf_classes.VECTOR_KEY_DTYPE, "value", scale_factor),
+        )
+
+        number_bytes_written += ar.write_int(len(track.rotation_keys))
+        number_bytes_written += ar.write_array(track.rotation_keys, uf_classes.QUAT_KEY_DTYPE)
+
+        number_bytes_written += ar.write_int(len(track.scale_keys))
+        number_bytes_written += ar.write_array(track.scale_keys, uf_classes.VECTOR_KEY_DTYPE)
+        return number_bytes_written
+
+
 class UEModelLOD:
     @classmethod
     def to_archive(
@@ -45,35 +95,47 @@ class UEModelLOD:
         ar: FArchiveWriter,
         scale_factor: float,
     ) -> int:
+        if isinstance(lod, bytes):
+            return ar.write_bytes(lod)
+
         number_bytes_in_lod_name = ar.write_fstring(lod.name)
-        pos_before = ar.tell()
-        ar.pad(4)
+        number_bytes_for_lod_data = write_byte_size_wrapper(ar, lambda ar: cls.write_lod_data(lod, ar, scale_factor))
+
+        return number_bytes_in_lod_name + number_bytes_for_lod_data
 
-        number_bytes_for_vertices = number_bytes_for_indices =  number_bytes_for_normals \
+    @classmethod
+    def write_lod_data(
+        cls,
+        lod: uf_classes.UEModelLOD,
+        ar: FArchiveWriter,
+        scale_factor: float,
+    ) -> int:
+        number_bytes_for_vertices = number_bytes_for_indices =  number_bytes_for_normals = number_bytes_for_tangents \
         =  number_bytes_for_vertex_colors = number_bytes_for_texcoords = number_bytes_for_materials = number_bytes_for_weights = number_bytes_for_morphs_targets \
         = 0
 
         if lod.vertices is not None:
             number_bytes_for_vertices = ar.write_fstring("VERTICES")
-            flattened_verts = lod.vertices.flatten() * scale_factor
-            number_bytes_for_vertices += ar.write_int(flattened_verts.shape[0] // 3)
-            number_bytes_for_vertices += write_byte_size_wrapper(ar, lambda ar: ar.write_float_vector(flattened_verts))
+            number_bytes_for_vertices += ar.write_int(lod.vertices.size // 3)
+            number_bytes_for_vertices += write_byte_size_wrapper(ar, lambda ar: ar.write_scaled_float_vector(lod.vertices, scale_factor))
 
         if lod.indices is not None:
             number_bytes_for_indices = ar.write_fstring("INDICES")
-            flattened_indices = lod.indices.flatten()
+            flattened_indices = lod.indices.reshape(-1)
             number_bytes_for_indices += ar.write_int(flattened_indices.shape[0])
             number_bytes_for_indices += write_byte_size_wrapper(ar, lambda ar: ar.write_int_vector(flattened_indices))
 
         if lod.normals is not None:
             number_bytes_for_normals = ar.write_fstring("NORMALS")
-            flattened_normals = lod.normals.flatten()
+            flattened_normals = lod.normals.reshape(-1)
             number_bytes_for_normals += ar.write_int(flattened_normals.shape[0] // 4)
             number_bytes_for_normals += write_byte_size_wrapper(ar, lambda ar: ar.write_float_vector(flattened_normals))
-        
-        # TODO: TANGENTS section
-        # leaving this here for later
-        # flattened = np.array(ar.read_float_vector(array_size * 3)).reshape(array_size, 3)
+
+        if lod.tangents is not None and len(lod.tangents) != 0:
+            number_bytes_for_tangents = ar.write_fstring("TANGENTS")
+            flattened_tangents = np.asarray(lod.tangents).reshape(-1)
+            number_bytes_for_tangents += ar.write_int(flattened_tangents.shape[0] // 3)
+            number_bytes_for_tangents += write_byte_size_wrapper(ar, lambda ar: ar.write_float_vector(flattened_tangents))
 
         if lod.colors and len(lod.colors) != 0:
             number_bytes_for_vertex_colors = ar.write_fstring("VERTEXCOLORS")
@@ -86,7 +148,7 @@ class UEModelLOD:
             def write_uvs(ar: FArchiveWriter, uv: npt.NDArray):
                 flattened_uv = uv.reshape(-1)
                 total_bytes_written = ar.write_int(flattened_uv.shape[0] // 2)
-                total_bytes_written += ar.write_float_vector(tuple(flattened_uv))
+                total_bytes_written += ar.write_float_vector(flattened_uv)
                 return total_bytes_written
             number_bytes_for_texcoords += write_byte_size_wrapper(ar, lambda ar: sum([write_uvs(ar, uv) for uv in lod.uvs]))
         
@@ -95,10 +157,10 @@ class UEModelLOD:
             number_bytes_for_materials += ar.write_int(len(lod.materials))
             number_bytes_for_materials += write_byte_size_wrapper(ar, lambda ar: sum([Material.to_archive(mat, ar) for mat in lod.materials]))
 
-        if lod.weights and len(lod.weights) != 0:
+        if lod.weights is not None and len(lod.weights) != 0:
             number_bytes_for_weights = ar.write_fstring("WEIGHTS")
             number_bytes_for_weights += ar.write_int(len(lod.weights))
-            number_bytes_for_weights += write_byte_size_wrapper(ar, lambda ar: sum([Weight.to_archive(weight, ar) for weight in lod.weights ]))
+            number_bytes_for_weights += write_byte_size_wrapper(ar, lambda ar: ar.write_array(lod.weights, uf_classes.WEIGHT_DTYPE))
 
         if lod.morphs and len(lod.morphs) != 0:
             number_bytes_for_morphs_targets = ar.write_fstring("MORPHTARGETS")
@@ -106,20 +168,16 @@ class UEModelLOD:
             number_bytes_for_morphs_targets += write_byte_size_wrapper(ar, lambda ar: sum([MorphTarget.to_archive(morph, ar, scale_factor) for morph in lod.morphs]))
 
 
-        total_bytes_for_lod_data = number_bytes_for_vertices + number_bytes_for_indices + number_bytes_for_normals \
+        return number_bytes_for_vertices + number_bytes_for_indices + number_bytes_for_normals + number_bytes_for_tangents \
         +  number_bytes_for_vertex_colors + number_bytes_for_texcoords + number_bytes_for_materials + number_bytes_for_weights + number_bytes_for_morphs_targets
-        
-        pos_after = ar.tell()
-        ar.seek(pos_before)
-        ar.write_int(total_bytes_for_lod_data)
-        ar.seek(pos_after)
-        
-        return total_bytes_for_lod_data + number_bytes_in_lod_name + 4  # add 4 cuz lod_size itself takes 4 bytes
 
 
 class UEModelSkeleton:
     @classmethod
     def to_archive(cls, skel: uf_classes.UEModelSkeleton, ar: FArchiveWriter, scale_factor: float) -> int:
+        if isinstance(skel, bytes):
+            return ar.write_bytes(skel)
+
         number_bytes_for_bones = number_bytes_for_sockets = number_bytes_for_virtual_bones = 0
         
         if skel.bones and len(skel.bones) != 0:
@@ -143,19 +201,20 @@ class UEModelSkeleton:
 class ConvexCollision:
     @classmethod
     def to_archive(cls, coll: uf_classes.ConvexCollision, ar: FArchiveWriter, scale_factor: float) -> int:
+        if isinstance(coll, bytes):
+            return ar.write_bytes(coll)
+
         number_bytes_written = ar.write_fstring(coll.name)
         
         if coll.vertices is not None:
-            flattened = (coll.vertices * scale_factor).reshape(-1)
-            vertices_count = flattened.shape[0]
-            number_bytes_written += ar.write_int(vertices_count // 3)
-            number_bytes_written += ar.write_float_vector(tuple(flattened))
+            number_bytes_written += ar.write_int(coll.vertices.size // 3)
+            number_bytes_written += ar.write_scaled_float_vector(coll.vertices, scale_factor)
 
         if coll.indices is not None:
             flattened = coll.indices.reshape(-1)
             indices_count = flattened.shape[0]
             number_bytes_written += ar.write_int(indices_count)
-            number_bytes_written += ar.write_int_vector(tuple(flattened))
+            number_bytes_written += ar.write_int_vector(flattened)
 
         return number_bytes_written
 
@@ -165,12 +224,12 @@ class VertexColor:
     def to_archive(cls, vcol: uf_classes.VertexColor, ar: FArchiveWriter) -> int:
         number_bytes_written = ar.write_fstring(vcol.name)
 
-        original_array = (vcol.data.astype(np.int32) * 255)
-        flattened = original_array.reshape(-1)
-        count = flattened.shape[0]
-        
-        number_bytes_written += ar.write_int(count // 4)
-        number_bytes_written += ar.write_byte_vector(tuple(flattened))
+        # extraction already hands out bytes, 0..1 floats (e.g. from the builder) are rounded here
+        number_bytes_written += ar.write_int(vcol.data.size // 4)
+        if vcol.data.dtype == np.uint8:
+            number_bytes_written += ar.write_byte_vector(vcol.data.reshape(-1))
+        else:
+            number_bytes_written += ar.write_converted_array(vcol.data, "<u1", quantize_unit_floats)
 
         return number_bytes_written
 
@@ -196,33 +255,17 @@ class Bone:
         return number_bytes_written
 
 
-class Weight:
-    @classmethod
-    def to_archive(cls, weight: uf_classes.Weight, ar: FArchiveWriter) -> int:
-        number_bytes_written = ar.write_short(weight.bone_index)
-        number_bytes_written += ar.write_int(weight.vertex_index)
-        number_bytes_written += ar.write_float(weight.weight)
-
-        return number_bytes_written
-
-
 class MorphTarget:
     @classmethod
     def to_archive(cls, morphTarget: uf_classes.MorphTarget, ar: FArchiveWriter, scale_factor: float) -> int:
         number_bytes_written = ar.write_fstring(morphTarget.name)
         number_bytes_written += ar.write_int(len(morphTarget.deltas))
-        for morphTargetData in morphTarget.deltas:
-            number_bytes_written += MorphTargetData.to_archive(morphTargetData, ar, scale_factor)
-        return number_bytes_written
-
-
-class MorphTargetData:
-    @classmethod
-    def to_archive(cls, morphTargetData: uf_classes.MorphTargetData, ar: FArchiveWriter, scale_factor: float) -> int:
-        number_bytes_written = ar.write_float_vector(tuple((np.array(morphTargetData.position) * scale_factor).tolist()))
-        number_bytes_written += ar.write_float_vector(morphTargetData.normals)
-        number_bytes_written += ar.write_int(morphTargetData.vertex_index)
 
+        number_bytes_written += ar.write_converted_array(
+            morphTarget.deltas,
+            uf_classes.MORPH_DELTA_DTYPE,
+            lambda deltas: scale_field(deltas, uf_classes.MORPH_DELTA_DTYPE, "position", scale_factor),
+        )
         return number_bytes_written
 
 
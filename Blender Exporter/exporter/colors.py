@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import numpy as np
+import numpy.typing as npt
+
+# linear 0..1 sampled at 16 bits mapped to srgb bytes, converting is then one multiply and one lookup per channel.
+# 16 bits keeps the darkest steps (where srgb is steepest) within a tenth of a byte
+SRGB_TABLE_SIZE = 1 << 16
+
+
+def build_srgb_table(size: int = SRGB_TABLE_SIZE) -> npt.NDArray[np.uint8]:
+    linear = np.linspace(0.0, 1.0, size)
+    srgb = np.where(linear <= 0.0031308, linear * 12.92, 1.055 * np.power(linear, 1 / 2.4) - 0.055)
+    return np.rint(srgb * 255).astype(np.uint8)
+
+
+LINEAR_TO_SRGB = build_srgb_table()
+
+
+def quantize_unit_floats(values: npt.ArrayLike) -> npt.NDArray[np.uint8]:
+    """0..1 floats to bytes, rounded to the nearest step instead of truncated."""
+    return np.rint(np.clip(np.asarray(values, dtype=np.float32), 0.0, 1.0) * 255).astype(np.uint8)
+
+
+def linear_to_srgb_bytes(colors: npt.NDArray[np.floating]) -> npt.NDArray[np.uint8]:
+    """Linear (N, 4) RGBA floats to sRGB bytes, alpha isn't a color so it stays linear."""
+    colors = np.asarray(colors, dtype=np.float32).reshape(-1, 4)
+    table_indices = np.rint(np.clip(colors[:, :3], 0.0, 1.0) * (SRGB_TABLE_SIZE - 1)).astype(np.intp)
+
+    quantized = np.empty(colors.shape, dtype=np.uint8)
+    quantized[:, :3] = LINEAR_TO_SRGB[table_indices]
+    quantized[:, 3] = quantize_unit_floats(colors[:, 3])
+    return quantized
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from ..importer.logging import Log
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# these are the names the UEFormat importer checks for
+COMPRESSION_TYPES = ("NONE", "GZIP", "ZSTD")
+
+BLOCK_SIZE = 4 * 1024 * 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def is_zstd_available() -> bool:
+    return zstandard is not None
+
+
+def compress_payload(payload: bytes | memoryview, compression_type: str) -> tuple[str, bytes]:
+    """Returns the compression type that was actually used and the compressed payload."""
+    if compression_type == "ZSTD" and not is_zstd_available():
+        Log.warn("zstandard is not installed, falling back to GZIP compression")
+        compression_type = "GZIP"
+
+    if compression_type == "ZSTD":
+        # one frame, since the importer only decompresses the first one
+        # zstd splits the work across its own worker threads
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1, write_content_size=True)
+        return compression_type, compressor.compress(payload)
+
+    if compression_type == "GZIP":
+        return compression_type, compress_gzip_blocks(payload)
+
+    raise ValueError(f"Unknown compression type {compression_type}")
+
+
+def compress_gzip_blocks(payload: bytes | memoryview, block_size: int = BLOCK_SIZE) -> bytes:
+    # each block becomes an independent gzip member, gzip.decompress reads them back as one stream
+    # zlib releases the GIL while compressing, so the blocks compress in parallel
+    payload = memoryview(payload).cast("B")
+    blocks = [payload[offset:offset + block_size] for offset in range(0, len(payload), block_size)]
+    if len(blocks) <= 1:
+        return compress_gzip_block(payload)
+
+    with ThreadPoolExecutor(max_workers=min(len(blocks), os.cpu_count() or 1)) as pool:
+        return b"".join(pool.map(compress_gzip_block, blocks))
+
+
+def compress_gzip_block(block: bytes | memoryview) -> bytes:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16 + MAX_WBITS = gzip container
+    return compressor.compress(block) + compressor.flush()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import numpy.typing as npt
+
+from ..importer import classes as uf_classes
+from ..importer.logging import Log
+
+# the hull code lives in a folder of its own, worker processes import it from there by name. inside blender the addon
+# is a bl_ext.* package that a plain python child can't import, and its __init__ would pull in bpy anyway
+WORKER_DIRECTORY = str(Path(__file__).resolve().parent / "workers")
+if WORKER_DIRECTORY not in sys.path:
+    sys.path.append(WORKER_DIRECTORY)
+
+from uemodel_convex_hulls import ConvexHull, build_hulls, decompose, quickhull  # noqa: E402
+
+# starting worker processes costs more than hulling a few small meshes, those stay on threads
+PROCESS_POOL_MIN_VERTICES = 100_000
+
+
+def find_python_executable() -> str | None:
+    """The python that spawned workers run on. Blender's sys.executable can be blender itself, not its bundled python."""
+    if Path(sys.executable).name.lower().startswith("python"):
+        return sys.executable
+
+    bin_directory = Path(sys.prefix) / "bin"
+    version = sys.version_info
+    for name in (f"python{version.major}.{version.minor}", f"python{version.major}", "python.exe"):
+        if (bin_directory / name).is_file():
+            return str(bin_directory / name)
+    return None
+
+
+def build_collision_hulls(
+    collisions: list[uf_classes.ConvexCollision],
+    max_vertices: int,
+    max_hulls: int = 1,
+    max_workers: int | None = None,
+) -> list[list[uf_classes.ConvexCollision]]:
+    """
+    Builds the convex hull(s) of every collision in a process pool, or on threads if the meshes are small or
+    processes can't be started. Collisions that are flat stay as they are.
+    """
+    if len(collisions) == 0:
+        return []
+
+    def run(pool: Executor) -> list[list[tuple[npt.NDArray[np.float32], npt.NDArray[np.int32]]]]:
+        futures = [
+            pool.submit(build_hulls, collision.vertices, collision.indices, max_vertices, max_hulls)
+            for collision in collisions
+        ]
+        return [future.result() for future in futures]
+
+    max_workers = min(len(collisions), max_workers or os.cpu_count() or 1)
+    results = None
+    python_executable = find_python_executable()
+    if python_executable is None:
+        Log.warn("Can't find a python to run worker processes with, building convex hulls on threads")
+    elif max_workers > 1 and sum(len(collision.vertices) for collision in collisions) >= PROCESS_POOL_MIN_VERTICES:
+        try:
+            # never fork, blender doesn't survive being forked
+            context = multiprocessing.get_context("spawn")
+            context.set_executable(python_executable)
+            with ProcessPoolExecutor(max_workers, mp_context=context) as pool:
+                results = run(pool)
+        except (BrokenProcessPool, OSError) as e:
+            Log.warn(f"Can't build convex hulls in worker processes, using threads instead: {e}")
+    if results is None:
+        with ThreadPoolExecutor(max_workers) as pool:
+            results = run(pool)
+
+    hulls = []
+    for collision, result in zip(collisions, results):
+        if len(result) == 0:
+            hulls.append([collision])
+        elif len(result) == 1:
+            hulls.append([uf_classes.ConvexCollision(collision.name, *result[0])])
+        else:
+            hulls.append([uf_classes.ConvexCollision(f"{collision.name}_{idx}", *hull) for idx, hull in enumerate(result)])
+    return hulls
@@ -0,0 +1,460 @@
+from __future__ import annotations
+
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from ..importer import classes as uf_classes
+from .geometry import build_material_sections
+
+# quadric error edge collapse (Garland & Heckbert), run as half edge collapses so every kept vertex keeps its own
+# uvs, weights and morph deltas. each pass collapses an independent set of cheap edges at once instead of one at a time.
+# collapses are picked on the welded mesh (render vertices at the same spot are one vertex), the render vertices then
+# follow along: hard edges only split normals and collapse freely, uv and color seams only collapse along themselves.
+
+# a collapse is rejected when it turns a triangle further than this from the input triangle it came from
+# (cosine between the normals), comparing against the current triangle would let the error pile up over passes
+MIN_NORMAL_COSINE = 0.5
+
+
+def parse_lod_ratios(text: str) -> list[float]:
+    """Parses "0.5, 0.25" into triangle ratios, anything outside (0, 1) is dropped."""
+    ratios = []
+    for part in text.replace(";", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        ratio = float(part)
+        if 0 < ratio < 1:
+            ratios.append(ratio)
+    return ratios
+
+
+def compute_quadrics(positions: npt.NDArray[np.float64], triangles: npt.NDArray[np.int64]) -> npt.NDArray[np.float64]:
+    """Returns the area weighted plane quadric (V, 4, 4) of every vertex."""
+    corners = positions[triangles]
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    double_areas = np.linalg.norm(face_normals, axis=1)
+    unit_normals = face_normals / np.maximum(double_areas, 1e-30)[:, None]
+
+    planes = np.empty((len(triangles), 4))
+    planes[:, :3] = unit_normals
+    planes[:, 3] = -np.einsum("ij,ij->i", unit_normals, corners[:, 0])
+    face_quadrics = np.einsum("fi,fj->fij", planes, planes) * (0.5 * double_areas)[:, None, None]
+
+    # accumulate with bincount per component, way faster than np.add.at on (V, 4, 4)
+    num_vertices = len(positions)
+    flat_corners = triangles.reshape(-1)
+    repeated = np.repeat(face_quadrics.reshape(-1, 16), 3, axis=0)
+    quadrics = np.stack([np.bincount(flat_corners, weights=repeated[:, i], minlength=num_vertices) for i in range(16)], axis=1)
+    return quadrics.reshape(num_vertices, 4, 4)
+
+
+@dataclass(slots=True)
+class Seams:
+    # directed edges (removed * V + kept) a seam vertex may collapse along, the ones its own wedge changes across
+    directed_keys: npt.NDArray[np.int64]
+    # every seam edge (low * V + high), vertices off the seam mustn't collapse across one
+    edge_keys: npt.NDArray[np.int64]
+    on_seam: npt.NDArray[np.bool_]
+    # where seams meet, end or fold, these stay put
+    locked: npt.NDArray[np.bool_]
+
+
+def weld_positions(positions: npt.NDArray[np.floating]) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """Gives render vertices at exactly the same position (split at seams or hard edges) one shared vertex."""
+    welded_positions, geometry = np.unique(positions, axis=0, return_inverse=True)
+    return geometry.reshape(-1).astype(np.int64), welded_positions.astype(np.float64)
+
+
+def build_wedges(
+    geometry: npt.NDArray[np.int64],
+    attributes: npt.NDArray[np.floating] | None,
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Groups the render vertices of every welded vertex into wedges, copies that only differ in their normal.
+    Returns the wedge of every render vertex and the welded vertex of every wedge.
+    """
+    if attributes is None or attributes.shape[1] == 0:
+        return geometry, np.arange(geometry.max() + 1 if len(geometry) != 0 else 0)
+    keys = np.hstack((geometry[:, None].astype(np.float64), attributes))
+    unique_keys, wedges = np.unique(keys, axis=0, return_inverse=True)
+    return wedges.reshape(-1).astype(np.int64), unique_keys[:, 0].astype(np.int64)
+
+
+def find_seams(
+    triangles: npt.NDArray[np.int64],
+    corner_wedges: npt.NDArray[np.int64],
+    wedge_geometry: npt.NDArray[np.int64],
+    num_vertices: int,
+) -> Seams:
+    """
+    An edge is a seam when either end uses a different wedge in the two triangles sharing it.
+    A vertex is on a (simple) seam when it has two wedges and two seam edges its wedge changes across.
+    """
+    starts, ends = triangles.reshape(-1), np.roll(triangles, -1, axis=1).reshape(-1)
+    start_wedges, end_wedges = corner_wedges.reshape(-1), np.roll(corner_wedges, -1, axis=1).reshape(-1)
+    swapped = starts > ends
+    lows, highs = np.where(swapped, ends, starts), np.where(swapped, starts, ends)
+    low_wedges, high_wedges = np.where(swapped, end_wedges, start_wedges), np.where(swapped, start_wedges, end_wedges)
+
+    keys = lows * num_vertices + highs
+    order = np.argsort(keys, kind="stable")
+    keys, lows, highs, low_wedges, high_wedges = keys[order], lows[order], highs[order], low_wedges[order], high_wedges[order]
+
+    # the two triangles of a manifold edge end up next to each other, open edges are boundaries and locked anyway
+    first = np.flatnonzero(keys[1:] == keys[:-1])
+    low_changes = low_wedges[first] != low_wedges[first + 1]
+    high_changes = high_wedges[first] != high_wedges[first + 1]
+
+    changed_vertices = np.concatenate((lows[first][low_changes], highs[first][high_changes]))
+    seam_edges = np.bincount(changed_vertices, minlength=num_vertices)
+    used_wedges = np.unique(corner_wedges)
+    wedge_counts = np.bincount(wedge_geometry[used_wedges], minlength=num_vertices)
+    on_seam = (wedge_counts == 2) & (seam_edges == 2)
+
+    directed_keys = np.concatenate((
+        lows[first][low_changes] * num_vertices + highs[first][low_changes],
+        highs[first][high_changes] * num_vertices + lows[first][high_changes],
+    ))
+    return Seams(
+        directed_keys=np.unique(directed_keys),
+        edge_keys=keys[first][low_changes | high_changes],
+        on_seam=on_seam,
+        locked=(wedge_counts > 1) & ~on_seam,
+    )
+
+
+def find_boundary_vertices(triangles: npt.NDArray[np.int64], num_vertices: int) -> npt.NDArray[np.bool_]:
+    """Vertices on an open or non-manifold edge of the welded mesh."""
+    starts, ends = triangles.reshape(-1), np.roll(triangles, -1, axis=1).reshape(-1)
+    edge_keys = np.minimum(starts, ends) * num_vertices + np.maximum(starts, ends)
+    unique_keys, counts = np.unique(edge_keys, return_counts=True)
+
+    boundary = np.zeros(num_vertices, dtype=bool)
+    open_keys = unique_keys[counts != 2]
+    boundary[open_keys // num_vertices] = True
+    boundary[open_keys % num_vertices] = True
+    return boundary
+
+
+def find_collapses(
+    positions: npt.NDArray[np.float64],
+    triangles: npt.NDArray[np.int64],
+    quadrics: npt.NDArray[np.float64],
+    locked: npt.NDArray[np.bool_],
+    reference_normals: npt.NDArray[np.float64],
+    seams: Seams | None = None,
+    rounds: int = 4,
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """
+    Picks the cheapest collapse of every unlocked vertex and keeps an independent set of the cheaper half:
+    a collapse wins when it has the lowest priority of all collapses touching the triangles it changes,
+    a few rounds then fill in around the winners. Returns the removed vertices, the vertices they collapse into
+    and the cost, cheapest first.
+    """
+    num_vertices = len(positions)
+    empty = np.zeros(0, dtype=np.int64)
+
+    # every directed edge is a candidate v -> u. edges around an unlocked vertex are all interior,
+    # so both directions already show up in the triangles
+    removed, kept = triangles.reshape(-1), np.roll(triangles, -1, axis=1).reshape(-1)
+    unlocked = ~locked[removed]
+    removed, kept = removed[unlocked], kept[unlocked]
+    if seams is not None:
+        # seam vertices slide along their seam, everything else stays off seams
+        along_seam = np.isin(removed * num_vertices + kept, seams.directed_keys)
+        across_seam = np.isin(np.minimum(removed, kept) * num_vertices + np.maximum(removed, kept), seams.edge_keys)
+        allowed = np.where(seams.on_seam[removed], along_seam, ~across_seam)
+        removed, kept = removed[allowed], kept[allowed]
+    if len(removed) == 0:
+        return empty, empty, np.zeros(0)
+
+    homogeneous = np.hstack((positions[kept], np.ones((len(kept), 1))))
+    costs = np.einsum("ej,ej->e", np.einsum("ei,eij->ej", homogeneous, quadrics[removed] + quadrics[kept]), homogeneous)
+
+    # cheapest target per removed vertex
+    cost = np.full(num_vertices, np.inf)
+    np.minimum.at(cost, removed, costs)
+    best = costs == cost[removed]
+    target = np.full(num_vertices, -1, dtype=np.int64)
+    target[removed[best]] = kept[best]
+
+    # every (candidate vertex, triangle around it) pair
+    triangle_of_corner = np.repeat(np.arange(len(triangles)), 3)
+    corner_vertices = triangles.reshape(-1)
+    is_candidate = target[corner_vertices] != -1
+    pair_vertices = corner_vertices[is_candidate]
+    pair_triangle_indices = triangle_of_corner[is_candidate]
+    pair_triangles = triangles[pair_triangle_indices]
+    pair_targets = target[pair_vertices]
+
+    # the edge has to be shared by exactly two triangles, those two disappear
+    disappears = np.any(pair_triangles == pair_targets[:, None], axis=1)
+    valid = np.bincount(pair_vertices[disappears], minlength=num_vertices) == 2
+
+    # the remaining triangles must not flip or fold over
+    moved = pair_triangles[~disappears]
+    moved_vertices = pair_vertices[~disappears]
+    new_triangles = np.where(moved == moved_vertices[:, None], pair_targets[~disappears][:, None], moved)
+    new_corners = positions[new_triangles]
+    new_normals = np.cross(new_corners[:, 1] - new_corners[:, 0], new_corners[:, 2] - new_corners[:, 0])
+    cosines = np.einsum("ij,ij->i", reference_normals[pair_triangle_indices[~disappears]], new_normals)
+    limits = MIN_NORMAL_COSINE * np.linalg.norm(new_normals, axis=1)
+    folds = (cosines <= limits) | ~np.any(new_normals, axis=1)
+    valid &= np.bincount(moved_vertices[folds], minlength=num_vertices) == 0
+    valid &= target != -1
+
+    # only the cheaper half competes, so one pass doesn't eat into the expensive collapses
+    if np.any(valid):
+        valid &= cost <= np.median(cost[valid])
+
+    # random (but seeded, so exports are reproducible) priorities among the cheap candidates, ranking by cost
+    # instead would only let the few local minima of a smooth cost field through
+    candidates = np.flatnonzero(valid)
+    if len(candidates) == 0:
+        return empty, empty, np.zeros(0)
+    no_rank = len(candidates)
+    rank = np.full(num_vertices, no_rank, dtype=np.int64)
+    rank[candidates] = np.random.default_rng(len(triangles)).permutation(len(candidates))
+
+    touched = pair_triangles[valid[pair_vertices]]
+    touched_owners = pair_vertices[valid[pair_vertices]]
+    winners = np.zeros(num_vertices, dtype=bool)
+    blocked = np.zeros(num_vertices, dtype=bool)
+    for _ in range(rounds):
+        # candidates touching a vertex that an earlier winner changes are out
+        conflicts = np.any(blocked[touched], axis=1)
+        out = np.bincount(touched_owners[conflicts], minlength=num_vertices) != 0
+        competing = valid & ~winners & ~out
+        in_play = competing[touched_owners]
+        if not np.any(in_play):
+            break
+
+        lowest_rank = np.full(num_vertices, no_rank, dtype=np.int64)
+        np.minimum.at(lowest_rank, touched[in_play].reshape(-1), np.repeat(rank[touched_owners[in_play]], 3))
+        beaten = np.any(lowest_rank[touched[in_play]] != rank[touched_owners[in_play]][:, None], axis=1)
+        new_winners = competing & (np.bincount(touched_owners[in_play][beaten], minlength=num_vertices) == 0)
+
+        winners |= new_winners
+        blocked[touched[new_winners[touched_owners]].reshape(-1)] = True
+
+    winners = np.flatnonzero(winners)
+    winners = winners[np.argsort(cost[winners], kind="stable")]
+    return winners, target[winners], cost[winners]
+
+
+def decimate(
+    positions: npt.ArrayLike,
+    triangles: npt.ArrayLike,
+    target_triangles: int,
+    *,
+    locked: npt.NDArray[np.bool_] | None = None,
+    attributes: npt.NDArray[np.floating] | None = None,
+    normals: npt.NDArray[np.floating] | None = None,
+    triangle_groups: npt.NDArray[np.integer] | None = None,
+    max_passes: int = 200,
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Collapses edges until at most target_triangles are left, or nothing can be collapsed anymore.
+    attributes (uvs, colors, one row per vertex) define the seams, normals pick which copy of a vertex a corner
+    moves to. Boundary and locked vertices and vertices between triangle_groups are never removed.
+    Returns the surviving triangles in their original order, still indexing into positions,
+    and the index of the input triangle each one came from.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    if len(positions) == 0:
+        return triangles, np.arange(len(triangles))
+
+    geometry, welded_positions = weld_positions(positions)
+    num_welded = len(welded_positions)
+    wedges, wedge_geometry = build_wedges(geometry, None if attributes is None else np.asarray(attributes, dtype=np.float64))
+    wedge_order = np.argsort(wedges, kind="stable")
+    wedge_starts = np.searchsorted(wedges[wedge_order], np.arange(len(wedge_geometry) + 1))
+    # one wedge per vertex means no seams, nothing to look for every pass
+    has_seams = len(wedge_geometry) != num_welded
+    normals = None if normals is None else np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+
+    welded = geometry[triangles]
+    sources = np.flatnonzero(~is_degenerate(welded))
+    triangles, welded = triangles[sources], welded[sources]
+    if len(triangles) <= target_triangles:
+        return triangles, sources
+
+    quadrics = compute_quadrics(welded_positions, welded)
+    corners = welded_positions[welded]
+    input_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    input_normals /= np.maximum(np.linalg.norm(input_normals, axis=1), 1e-30)[:, None]
+    surviving_normals = input_normals
+
+    fixed = find_boundary_vertices(welded, num_welded)
+    if locked is not None:
+        fixed[geometry[locked]] = True
+    if triangle_groups is not None:
+        corner_groups = np.repeat(np.asarray(triangle_groups)[sources], 3)
+        lowest_group = np.full(num_welded, np.iinfo(np.int64).max)
+        highest_group = np.full(num_welded, -1)
+        np.minimum.at(lowest_group, welded.reshape(-1), corner_groups)
+        np.maximum.at(highest_group, welded.reshape(-1), corner_groups)
+        fixed |= (highest_group != -1) & (lowest_group != highest_group)
+
+    for _ in range(max_passes):
+        excess = len(triangles) - target_triangles
+        if excess <= 0:
+            break
+
+        seams = find_seams(welded, wedges[triangles], wedge_geometry, num_welded) if has_seams else None
+        locked_now = fixed | seams.locked if seams is not None else fixed
+        removed, kept, _ = find_collapses(welded_positions, welded, quadrics, locked_now, surviving_normals, seams)
+        if len(removed) == 0:
+            break
+
+        # every collapse drops two triangles, don't overshoot
+        count = min(math.ceil(excess / 2), len(removed))
+        removed, kept = removed[:count], kept[:count]
+
+        quadrics[kept] += quadrics[removed]
+        triangles = collapse_render_vertices(triangles, welded, geometry, removed, kept, wedges, wedge_order, wedge_starts, normals)
+        remap = np.arange(num_welded)
+        remap[removed] = kept
+        welded = remap[welded]
+
+        surviving = ~is_degenerate(welded)
+        triangles, welded, sources = triangles[surviving], welded[surviving], sources[surviving]
+        surviving_normals = surviving_normals[surviving]
+
+    return triangles, sources
+
+
+def collapse_render_vertices(
+    triangles: npt.NDArray[np.int64],
+    welded: npt.NDArray[np.int64],
+    geometry: npt.NDArray[np.int64],
+    removed: npt.NDArray[np.int64],
+    kept: npt.NDArray[np.int64],
+    wedges: npt.NDArray[np.int64],
+    wedge_order: npt.NDArray[np.int64],
+    wedge_starts: npt.NDArray[np.int64],
+    normals: npt.NDArray[np.float64] | None,
+) -> npt.NDArray[np.int64]:
+    """
+    Moves the render vertices of every removed welded vertex onto the vertex it collapses into. The two triangles
+    that disappear tell which wedge goes where (one per side of a seam), inside that wedge the copy with the closest
+    normal is picked, so hard edges stay hard.
+    """
+    target = np.full(len(geometry) and geometry.max() + 1, -1, dtype=np.int64)
+    target[removed] = kept
+
+    triangle_indices, corner_indices = np.nonzero(target[welded] != -1)
+    corner_targets = target[welded[triangle_indices, corner_indices]]
+    target_corners = welded[triangle_indices] == corner_targets[:, None]
+    disappearing = np.any(target_corners, axis=1)
+    from_copies = triangles[triangle_indices[disappearing], corner_indices[disappearing]]
+    to_copies = triangles[triangle_indices[disappearing], np.argmax(target_corners[disappearing], axis=1)]
+
+    wedge_target = np.full(len(wedge_starts) - 1, -1, dtype=np.int64)
+    wedge_target[wedges[from_copies]] = wedges[to_copies]
+    # copies that aren't used by a disappearing triangle go with any wedge of the target
+    fallback = np.full(len(target), -1, dtype=np.int64)
+    fallback[geometry[from_copies]] = wedges[to_copies]
+
+    moving = np.flatnonzero(target[geometry] != -1)
+    target_wedges = wedge_target[wedges[moving]]
+    target_wedges = np.where(target_wedges == -1, fallback[geometry[moving]], target_wedges)
+
+    # every (moving copy, copy in its target wedge) pair, the best scoring one per moving copy wins
+    sizes = wedge_starts[target_wedges + 1] - wedge_starts[target_wedges]
+    owners = np.repeat(np.arange(len(moving)), sizes)
+    offsets = np.arange(len(owners)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    members = wedge_order[np.repeat(wedge_starts[target_wedges], sizes) + offsets]
+    if normals is not None:
+        scores = np.einsum("ij,ij->i", normals[moving[owners]], normals[members])
+    else:
+        scores = np.zeros(len(owners))
+    order = np.lexsort((-scores, owners))
+    best = order[np.concatenate(([True], owners[order][1:] != owners[order][:-1]))]
+
+    render_remap = np.arange(len(geometry))
+    render_remap[moving[owners[best]]] = members[best]
+    return render_remap[triangles]
+
+
+def is_degenerate(triangles: npt.NDArray[np.int64]) -> npt.NDArray[np.bool_]:
+    return (triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2]) | (triangles[:, 2] == triangles[:, 0])
+
+
+def decimate_lod(lod: uf_classes.UEModelLOD, ratio: float, name: str) -> uf_classes.UEModelLOD:
+    """Builds a lower LOD with about ratio times the triangles, keeping material sections, seams and weights intact."""
+    triangles = np.asarray(lod.indices, dtype=np.int64).reshape(-1, 3)
+    num_vertices = len(lod.vertices)
+
+    # which section every triangle belongs to, vertices shared between sections stay put
+    triangle_sections = np.zeros(len(triangles), dtype=np.int64)
+    for section_index, material in enumerate(lod.materials):
+        start = material.first_index // 3
+        triangle_sections[start:start + material.num_faces] = section_index
+
+    # uvs and colors make seams, normals only pick between the copies of a vertex
+    attributes = [uv.reshape(num_vertices, -1) for uv in lod.uvs]
+    attributes += [np.asarray(color.data, dtype=np.float64).reshape(num_vertices, -1) for color in lod.colors]
+    normals = lod.normals[:, 1:] if lod.normals is not None and len(lod.normals) == num_vertices else None
+
+    decimated, sources = decimate(
+        lod.vertices,
+        triangles,
+        int(len(triangles) * ratio),
+        attributes=np.hstack(attributes) if attributes else None,
+        normals=normals,
+        triangle_groups=triangle_sections,
+    )
+
+    # drop vertices that aren't used anymore, keeping their order
+    used = np.zeros(num_vertices, dtype=bool)
+    used[decimated.reshape(-1)] = True
+    old_to_new = np.full(num_vertices, -1, dtype=np.int64)
+    old_to_new[used] = np.arange(np.count_nonzero(used))
+
+    new_lod = uf_classes.UEModelLOD(name)
+    new_lod.vertices = lod.vertices[used]
+    new_lod.indices = old_to_new[decimated].astype(np.int32)
+    if lod.normals is not None and len(lod.normals) == num_vertices:
+        new_lod.normals = lod.normals[used]
+    if isinstance(lod.tangents, np.ndarray) and len(lod.tangents) == num_vertices:
+        new_lod.tangents = lod.tangents[used]
+    new_lod.uvs = [uv[used] for uv in lod.uvs]
+    new_lod.colors = [uf_classes.VertexColor(color.name, color.data[used]) for color in lod.colors]
+    new_lod.materials = build_material_sections(triangle_sections[sources], [material.material_name for material in lod.materials])
+    new_lod.weights = remap_vertex_records(lod.weights, old_to_new)
+    new_lod.morphs = [uf_classes.MorphTarget(morph.name, remap_vertex_records(morph.deltas, old_to_new)) for morph in lod.morphs]
+    return new_lod
+
+
+def remap_vertex_records(records: npt.NDArray[np.void], old_to_new: npt.NDArray[np.int64]) -> npt.NDArray[np.void]:
+    """Drops weight or morph records of removed vertices and renumbers the rest."""
+    new_indices = old_to_new[records["vertex_index"]]
+    kept = new_indices != -1
+    remapped = records[kept]
+    remapped["vertex_index"] = new_indices[kept]
+    return remapped
+
+
+def generate_lod_chains(
+    lods: list[uf_classes.UEModelLOD],
+    ratios: list[float],
+    max_workers: int | None = None,
+) -> list[list[uf_classes.UEModelLOD]]:
+    """
+    Decimates every LOD once per ratio on a thread pool, each level starts from the original LOD
+    so all of them run at the same time. Returns LOD1..N for every input LOD.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as pool:
+        futures = [
+            [pool.submit(decimate_lod, lod, ratio, f"LOD{level}") for level, ratio in enumerate(ratios, start=1)]
+            for lod in lods
+        ]
+        return [[future.result() for future in chain] for chain in futures]
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass, field
+from operator import attrgetter
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import numpy.typing as npt
+from bpy.types import Armature, Mesh, Object, Scene
+
+from ..importer import classes as uf_classes
+from .colors import linear_to_srgb_bytes, quantize_unit_floats
+from .geometry import compute_uv_tangents, weld_corners
+from .skeleton import SkeletonIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    from bpy.types import bpy_prop_collection
+
+
+@dataclass(slots=True)
+class MeshArrays:
+    # for LODs everything is per render vertex, render_source maps each one back to its blender vertex
+    # collisions keep blender vertices and only fill positions and triangles
+    positions: npt.NDArray[np.float32]
+    triangles: npt.NDArray[np.int32]
+    normals: npt.NDArray[np.float32] | None = None
+    tangents: npt.NDArray[np.float32] | None = None
+    uvs: list[npt.NDArray[np.float32]] = field(default_factory=list)
+    colors: list[uf_classes.VertexColor] = field(default_factory=list)
+    triangle_materials: npt.NDArray[np.int32] | None = None
+    render_source: npt.NDArray[np.int64] | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+def read_array(collection: bpy_prop_collection, attribute: str, width: int, dtype: npt.DTypeLike) -> npt.NDArray[Any]:
+    buffer = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attribute, buffer)
+    return buffer.reshape(-1, width) if width != 1 else buffer
+
+
+def extract_mesh_arrays(
+    mesh: Mesh,
+    *,
+    collision_only: bool = False,
+    sort_by_material: bool = False,
+    with_tangents: bool = False,
+    srgb_colors: bool = True,
+) -> MeshArrays:
+    """
+    Reads the mesh into numpy arrays with foreach_get, collisions only need positions and triangles.
+    With sort_by_material, triangles are stable sorted so every material is one contiguous range.
+    With with_tangents, tangents of the first uv map are read too, the bitangent signs go into the normals.
+    Colors are quantized to sRGB bytes, or linear bytes without srgb_colors.
+    """
+    timings: dict[str, float] = {}
+    def timed(name: str, fn: Callable[[], Any]) -> Any:
+        start_time = perf_counter()
+        result = fn()
+        timings[name] = perf_counter() - start_time
+        return result
+
+    timed("triangulate", mesh.calc_loop_triangles)
+    positions = timed("positions", lambda: read_array(mesh.vertices, "co", 3, np.float32))
+    if collision_only:
+        triangles = timed("triangles", lambda: read_array(mesh.loop_triangles, "vertices", 3, np.int32))
+        return MeshArrays(positions, triangles, timings=timings)
+
+    # everything below is gathered per triangle corner, then corners with identical data are welded
+    triangle_loops = timed("triangles", lambda: read_array(mesh.loop_triangles, "loops", 3, np.int32))
+    triangle_materials = timed("materials", lambda: read_array(mesh.loop_triangles, "material_index", 1, np.int32))
+    if sort_by_material:
+        triangle_order = np.argsort(triangle_materials, kind="stable")
+        triangle_loops = triangle_loops[triangle_order]
+        triangle_materials = triangle_materials[triangle_order]
+    corner_loops = triangle_loops.reshape(-1)
+
+    loop_vertices = timed("vertex indices", lambda: read_array(mesh.loops, "vertex_index", 1, np.int32))
+    corner_vertices = loop_vertices[corner_loops]
+    corner_normals = timed("normals", lambda: read_array(mesh.corner_normals, "vector", 3, np.float32)[corner_loops])
+    corner_uvs = timed("uvs", lambda: [read_array(uv_layer.uv, "vector", 2, np.float32)[corner_loops] for uv_layer in mesh.uv_layers])
+    corner_colors = timed("colors", lambda: [
+        (name, loop_colors[corner_loops]) for name, loop_colors in extract_loop_colors(mesh, loop_vertices, srgb_colors)
+    ])
+
+    with_tangents = with_tangents and len(mesh.uv_layers) != 0
+    loop_tangents = timed("tangents", lambda: read_loop_tangents(mesh, mesh.uv_layers[0].name)) if with_tangents else None
+    corner_tangents = [loop_array[corner_loops] for loop_array in loop_tangents] if loop_tangents is not None else []
+
+    # tangents are welded too, mikktspace splits vertices that share a normal and uv but not a tangent
+    render_corners, corner_to_render = timed("weld", lambda: weld_corners(
+        corner_vertices,
+        corner_normals,
+        *corner_uvs,
+        *(colors for _, colors in corner_colors),
+        *corner_tangents,
+    ))
+
+    render_source = corner_vertices[render_corners].astype(np.int64)
+    triangles = corner_to_render.reshape(-1, 3).astype(np.int32)
+    normals = np.ones((len(render_corners), 4), dtype=np.float32)  # stored as (binormal sign, x, y, z)
+    normals[:, 1:] = corner_normals[render_corners]
+
+    tangents = None
+    if corner_tangents:
+        tangents = corner_tangents[0][render_corners]
+        normals[:, 0] = corner_tangents[1][render_corners]
+    elif with_tangents:
+        # calc_tangents only takes tris and quads
+        tangents, normals[:, 0] = timed("tangents", lambda: compute_uv_tangents(
+            positions[render_source], triangles, corner_uvs[0][render_corners], normals[:, 1:],
+        ))
+
+    return MeshArrays(
+        positions[render_source],
+        triangles,
+        normals=normals,
+        tangents=tangents,
+        uvs=[uvs[render_corners] for uvs in corner_uvs],
+        colors=[uf_classes.VertexColor(name, colors[render_corners]) for name, colors in corner_colors],
+        triangle_materials=triangle_materials,
+        render_source=render_source,
+        timings=timings,
+    )
+
+
+def read_loop_tangents(mesh: Mesh, uv_map: str) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]] | None:
+    """Mikktspace tangent and bitangent sign of every loop, None when blender can't compute them (ngons)."""
+    try:
+        mesh.calc_tangents(uvmap=uv_map)
+    except RuntimeError:
+        return None
+
+    tangents = read_array(mesh.loops, "tangent", 3, np.float32)
+    bitangent_signs = read_array(mesh.loops, "bitangent_sign", 1, np.float32)
+    mesh.free_tangents()
+    return tangents, bitangent_signs
+
+
+def extract_loop_colors(
+    mesh: Mesh,
+    loop_vertices: npt.NDArray[np.int32],
+    srgb: bool = True,
+) -> list[tuple[str, npt.NDArray[np.uint8]]]:
+    """Every color attribute as (loops, 4) RGBA bytes, point colors are spread to their loops."""
+    loop_colors = []
+    for color_attr in mesh.color_attributes:
+        if not srgb:
+            colors = quantize_unit_floats(read_array(color_attr.data, "color", 4, np.float32))
+        elif color_attr.data_type == "BYTE_COLOR":
+            # stored as srgb bytes already, color_srgb gives them back exactly
+            colors = quantize_unit_floats(read_array(color_attr.data, "color_srgb", 4, np.float32))
+        else:
+            colors = linear_to_srgb_bytes(read_array(color_attr.data, "color", 4, np.float32))
+
+        if color_attr.domain == "POINT":
+            colors = colors[loop_vertices]
+        loop_colors.append((color_attr.name, colors))
+    return loop_colors
+
+
+def read_vertex_groups(mesh: Mesh) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32], npt.NDArray[np.float32]]:
+    """
+    Returns how many groups every vertex is in, and the group index and weight of every membership in vertex order.
+    Vertex groups aren't mesh attributes, there's nothing to foreach_get them from in one go. Instead the layout is read
+    in one flattened pass, map, chain and attrgetter keep the loops in C, so no python code runs per vertex.
+    """
+    vertex_groups = list(map(attrgetter("groups"), mesh.vertices))
+    counts = np.fromiter(map(len, vertex_groups), dtype=np.int32, count=len(vertex_groups))
+
+    memberships = list(itertools.chain.from_iterable(vertex_groups))
+    group_indices = np.fromiter(map(attrgetter("group"), memberships), dtype=np.int32, count=len(memberships))
+    group_weights = np.fromiter(map(attrgetter("weight"), memberships), dtype=np.float32, count=len(memberships))
+    return counts, group_indices, group_weights
+
+
+def extract_weights(obj: Object, mesh: Mesh, armature: Armature) -> npt.NDArray:
+    """Returns the skin weights of the mesh as a WEIGHT_DTYPE array, influences of groups without a bone are skipped."""
+    bone_index_by_name = {bone.name: idx for idx, bone in enumerate(armature.bones)}
+    group_to_bone = np.array([bone_index_by_name.get(vgroup.name, -1) for vgroup in obj.vertex_groups] + [-1], dtype=np.int16)
+
+    counts, group_indices, group_weights = read_vertex_groups(mesh)
+    if len(group_indices) == 0:
+        return np.zeros(0, dtype=uf_classes.WEIGHT_DTYPE)
+
+    vertex_indices = np.repeat(np.arange(len(counts)), counts)
+    group_indices[(group_indices < 0) | (group_indices >= len(obj.vertex_groups))] = -1  # points to the trailing -1 bone
+    bone_indices = group_to_bone[group_indices]
+    has_bone = bone_indices != -1
+
+    weights = np.empty(np.count_nonzero(has_bone), dtype=uf_classes.WEIGHT_DTYPE)
+    weights["bone_index"] = bone_indices[has_bone]
+    weights["vertex_index"] = vertex_indices[has_bone]
+    weights["weight"] = group_weights[has_bone]
+    return weights
+
+
+def iter_morph_targets(mesh: Mesh, threshold: float) -> Iterator[uf_classes.MorphTarget]:
+    """
+    Yields one morph target per non-basis shape key, only holding vertices that move further than threshold.
+    Keys where no vertex does are skipped. Keys are read one at a time, so only the basis and the current key are in memory.
+    """
+    basis = mesh.shape_keys.reference_key
+    num_verts = len(mesh.vertices)
+
+    basis_positions = np.empty(num_verts * 3, dtype=np.float32)
+    basis.data.foreach_get("co", basis_positions)
+    basis_positions = basis_positions.reshape(-1, 3)
+    basis_normals = np.array(basis.normals_vertex_get(), dtype=np.float32).reshape(-1, 3)
+
+    key_positions = np.empty(num_verts * 3, dtype=np.float32)
+    for key in mesh.shape_keys.key_blocks:
+        if key == basis:
+            continue
+
+        key.data.foreach_get("co", key_positions)
+        position_deltas = key_positions.reshape(-1, 3) - basis_positions
+        moved = np.flatnonzero(np.linalg.norm(position_deltas, axis=1) > threshold)
+        if len(moved) == 0:
+            continue
+
+        deltas = np.empty(len(moved), dtype=uf_classes.MORPH_DELTA_DTYPE)
+        deltas["position"] = position_deltas[moved]
+        key_normals = np.array(key.normals_vertex_get(), dtype=np.float32).reshape(-1, 3)
+        deltas["normal"] = key_normals[moved] - basis_normals[moved]
+        deltas["vertex_index"] = moved
+
+        yield uf_classes.MorphTarget(key.name, deltas)
+
+
+def extract_skeleton_index(armature: Armature) -> SkeletonIndex:
+    return SkeletonIndex(
+        [bone.name for bone in armature.bones],
+        [bone.parent.name if bone.parent else None for bone in armature.bones],
+        read_array(armature.bones, "head", 3, np.float32),
+        read_array(armature.bones, "tail", 3, np.float32),
+    )
+
+
+def extract_bone_matrices(armature: Armature) -> npt.NDArray[np.float32]:
+    # blender hands out matrices column by column, transpose to get the usual row major layout
+    return read_array(armature.bones, "matrix_local", 16, np.float32).reshape(-1, 4, 4).transpose(0, 2, 1)
+
+
+def hash_mesh_object(hasher: Any, obj: Object, mesh: Mesh, armature: Armature | None) -> None:
+    """Feeds everything the LOD or collision of obj is built from into hasher, with the same bulk reads as above."""
+    material_names = [material.name if material else "None" for material in mesh.materials]
+    hasher.update("\0".join([obj.name, obj.display_type, *material_names]).encode())
+
+    hasher.update(read_array(mesh.vertices, "co", 3, np.float32))
+    hasher.update(read_array(mesh.loops, "vertex_index", 1, np.int32))
+    hasher.update(read_array(mesh.polygons, "loop_start", 1, np.int32))
+    hasher.update(read_array(mesh.polygons, "material_index", 1, np.int32))
+    hasher.update(read_array(mesh.corner_normals, "vector", 3, np.float32))
+
+    for uv_layer in mesh.uv_layers:
+        hasher.update(uv_layer.name.encode())
+        hasher.update(read_array(uv_layer.uv, "vector", 2, np.float32))
+
+    for color_attr in mesh.color_attributes:
+        # the data type picks the srgb conversion, the same colors as BYTE_COLOR or FLOAT_COLOR export differently
+        hasher.update(f"{color_attr.name}\0{color_attr.domain}\0{color_attr.data_type}".encode())
+        hasher.update(read_array(color_attr.data, "color", 4, np.float32))
+
+    if armature and obj.vertex_groups:
+        # the raw memberships plus the names that map groups to bones, nothing gets remapped just for the key
+        group_names = "\0".join(vgroup.name for vgroup in obj.vertex_groups)
+        bone_names = "\0".join(bone.name for bone in armature.bones)
+        hasher.update(f"{group_names}\1{bone_names}".encode())
+        for array in read_vertex_groups(mesh):
+            hasher.update(array)
+
+    if mesh.shape_keys:
+        hasher.update(mesh.shape_keys.reference_key.name.encode())
+        for key in mesh.shape_keys.key_blocks:
+            hasher.update(key.name.encode())
+            hasher.update(read_array(key.data, "co", 3, np.float32))
+
+
+def hash_armature_object(hasher: Any, obj: Object, armature: Armature) -> None:
+    """Feeds the bones, sockets and virtual bones of the armature into hasher."""
+    skeleton_index = extract_skeleton_index(armature)
+    hasher.update("\0".join(skeleton_index.names).encode())
+    hasher.update(skeleton_index.parent_indices)
+    hasher.update(read_array(armature.bones, "matrix_local", 16, np.float32))
+    hasher.update(skeleton_index.heads)
+    hasher.update(skeleton_index.tails)
+
+    for collection_name in ("Sockets", "Virtual Bones"):
+        if armature.collections.find(collection_name) == -1:
+            continue
+        bones = armature.collections[collection_name].bones
+        hasher.update("\0".join([collection_name, *(bone.name for bone in bones)]).encode())
+
+        if collection_name == "Virtual Bones":
+            # the ik target ends up in the file too
+            for bone in bones:
+                pose_bone = obj.pose.bones.get(bone.name)
+                constraint = pose_bone.constraints.get("IK") if pose_bone else None
+                hasher.update(getattr(constraint, "subtarget", "").encode() + b"\0")
+
+
+def sample_pose_matrices(scene: Scene, obj: Object, frames: list[int]) -> npt.NDArray[np.float32]:
+    """
+    Returns the (frames, bones, 4, 4) armature space pose matrices of every bone for every frame.
+    Setting the frame is the only per frame work, all bones are read with a single foreach_get.
+    """
+    pose_bones = obj.pose.bones
+    samples = np.empty((len(frames), len(pose_bones) * 16), dtype=np.float32)
+
+    original_frame = scene.frame_current
+    try:
+        for idx, frame in enumerate(frames):
+            scene.frame_set(frame)
+            pose_bones.foreach_get("matrix", samples[idx])
+    finally:
+        scene.frame_set(original_frame)
+
+    # column by column like matrix_local
+    return samples.reshape(len(frames), -1, 4, 4).transpose(0, 1, 3, 2)
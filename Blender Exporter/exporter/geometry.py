@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import numpy as np
+import numpy.typing as npt
+
+from ..importer import classes as uf_classes
+
+
+def weld_corners(
+    corner_vertices: npt.NDArray[np.integer],
+    *corner_attributes: npt.NDArray[np.floating],
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Merges triangle corners that share the same source vertex and the exact same attributes into render vertices.
+    Returns the first corner of each render vertex, in order of first use, and the render vertex of every corner.
+    """
+    num_corners = len(corner_vertices)
+    if num_corners == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # pack everything into one row of 32 bit words per corner, so np.unique can compare rows as raw bytes
+    columns = [np.asarray(corner_vertices, dtype=np.uint32).reshape(num_corners, -1)]
+    for attribute in corner_attributes:
+        attribute = np.asarray(attribute, dtype=np.float32).reshape(num_corners, -1) + np.float32(0.0)  # -0.0 -> 0.0
+        columns.append(attribute.view(np.uint32))
+    packed = np.ascontiguousarray(np.hstack(columns))
+    keys = packed.view(np.dtype((np.void, packed.dtype.itemsize * packed.shape[1]))).reshape(-1)
+
+    _, first_corners, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    # np.unique sorts by key, put the render vertices back in order of first use instead
+    order = np.argsort(first_corners, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    return first_corners[order], rank[inverse.reshape(-1)]
+
+
+def compute_uv_tangents(
+    positions: npt.NDArray[np.floating],
+    triangles: npt.NDArray[np.integer],
+    uvs: npt.NDArray[np.floating],
+    normals: npt.NDArray[np.floating],
+) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+    """
+    Per vertex tangents from the uv gradients of the triangles around each vertex (Lengyel's method), for meshes
+    calc_tangents can't do. Returns tangents orthogonalized against the normals and the sign of the bitangent.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    normals = np.asarray(normals, dtype=np.float64)
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    corners = positions[triangles]
+    corner_uvs = np.asarray(uvs, dtype=np.float64)[triangles]
+
+    edges = corners[:, 1:] - corners[:, :1]
+    uv_edges = corner_uvs[:, 1:] - corner_uvs[:, :1]
+    determinants = uv_edges[:, 0, 0] * uv_edges[:, 1, 1] - uv_edges[:, 1, 0] * uv_edges[:, 0, 1]
+    inverse = np.divide(1.0, determinants, out=np.zeros_like(determinants), where=np.abs(determinants) > 1e-20)
+    face_tangents = (edges[:, 0] * uv_edges[:, 1, 1:] - edges[:, 1] * uv_edges[:, 0, 1:]) * inverse[:, None]
+    face_bitangents = (edges[:, 1] * uv_edges[:, 0, :1] - edges[:, 0] * uv_edges[:, 1, :1]) * inverse[:, None]
+
+    # every triangle counts by its area, no matter how its uvs are scaled
+    areas = np.linalg.norm(np.cross(edges[:, 0], edges[:, 1]), axis=1)
+    face_tangents *= (areas / np.maximum(np.linalg.norm(face_tangents, axis=1), 1e-30))[:, None]
+    face_bitangents *= (areas / np.maximum(np.linalg.norm(face_bitangents, axis=1), 1e-30))[:, None]
+
+    corner_vertices = triangles.reshape(-1)
+    def accumulate(face_vectors: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        corner_vectors = np.repeat(face_vectors, 3, axis=0)
+        return np.column_stack([np.bincount(corner_vertices, corner_vectors[:, axis], minlength=len(positions)) for axis in range(3)])
+    tangents, bitangents = accumulate(face_tangents), accumulate(face_bitangents)
+
+    # gram-schmidt, vertices without a usable uv gradient get any tangent that's perpendicular to the normal
+    tangents -= normals * np.einsum("ij,ij->i", normals, tangents)[:, None]
+    lengths = np.linalg.norm(tangents, axis=1)
+    degenerate = lengths < 1e-12
+    if np.any(degenerate):
+        fallback_axes = np.where(np.abs(normals[degenerate, :1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]])
+        tangents[degenerate] = np.cross(normals[degenerate], np.cross(fallback_axes, normals[degenerate]))
+        lengths[degenerate] = np.linalg.norm(tangents[degenerate], axis=1)
+    tangents /= np.maximum(lengths, 1e-30)[:, None]
+
+    signs = np.where(np.einsum("ij,ij->i", np.cross(normals, tangents), bitangents) < 0, -1.0, 1.0)
+    return tangents.astype(np.float32), signs.astype(np.float32)
+
+
+def split_to_render_vertices(
+    records: npt.NDArray[np.void],
+    render_source: npt.NDArray[np.integer],
+    num_source_vertices: int,
+) -> npt.NDArray[np.void]:
+    """
+    Copies every record with a vertex_index field (weights, morph deltas) to each render vertex made from that vertex.
+    Records of vertices that aren't used by any triangle are dropped.
+    """
+    if len(records) == 0 or len(render_source) == 0:
+        return records[:0]
+
+    render_order = np.argsort(render_source, kind="stable")
+    splits_per_vertex = np.bincount(render_source, minlength=num_source_vertices)
+    first_split = np.concatenate(([0], np.cumsum(splits_per_vertex)[:-1]))
+
+    source_vertices = records["vertex_index"]
+    splits_per_record = splits_per_vertex[source_vertices]
+    record_indices = np.repeat(np.arange(len(records)), splits_per_record)
+    split_offsets = np.arange(len(record_indices)) - np.repeat(np.cumsum(splits_per_record) - splits_per_record, splits_per_record)
+
+    split_records = records[record_indices]
+    split_records["vertex_index"] = render_order[first_split[source_vertices[record_indices]] + split_offsets]
+    return split_records
+
+
+def build_material_sections(
+    triangle_materials: npt.NDArray[np.integer],
+    material_names: list[str],
+) -> list[uf_classes.Material]:
+    """Returns one section per run of consecutive triangles that use the same material."""
+    if len(material_names) == 0 or len(triangle_materials) == 0:
+        return []
+
+    # blender clamps out of range indices to the last slot as well
+    triangle_materials = np.clip(triangle_materials, 0, len(material_names) - 1)
+    run_starts = np.concatenate(([0], np.flatnonzero(np.diff(triangle_materials)) + 1))
+    run_lengths = np.diff(np.append(run_starts, len(triangle_materials)))
+
+    return [
+        uf_classes.Material(material_names[material_index], 3 * start, length)
+        for material_index, start, length in zip(triangle_materials[run_starts].tolist(), run_starts.tolist(), run_lengths.tolist())
+    ]
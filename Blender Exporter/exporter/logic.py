@@ -1,70 +1,221 @@
 from __future__ import annotations
 
+import io
+import json
+import os
+import platform
+import tomllib
+from dataclasses import asdict
 from pathlib import Path
-from typing import cast
+from typing import BinaryIO, Iterator, cast
 
-import numpy as np
-import bmesh
 import bpy
-from bpy.types import Mesh, Armature, ShapeKey, ByteColorAttribute, Material, BoneCollection, PoseBone, KinematicConstraint, ArmatureModifier, ShapeKeyPoint, MeshVertex
-from mathutils import Vector, Quaternion
-
-from .classes import UEModel
-from .writer import FArchiveWriter
-from ..options import UEFormatOptions
+import numpy as np
+import numpy.typing as npt
+from bpy.types import Object, Mesh, Armature, BoneCollection, PoseBone, KinematicConstraint, ArmatureModifier
+
+from .animation import build_pose_samples, build_tracks
+from .builder import UEModelBuilder, serialize_entry, write_ueanim, write_uemodel
+from .cache import (
+    ExportCache,
+    default_cache_directory,
+    hash_options,
+    new_hasher,
+    pack_entries,
+    replace_if_changed,
+    unpack_entries,
+    write_if_changed,
+)
+from .extraction import (
+    extract_bone_matrices,
+    extract_mesh_arrays,
+    extract_skeleton_index,
+    extract_weights,
+    hash_armature_object,
+    hash_mesh_object,
+    iter_morph_targets,
+    sample_pose_matrices,
+)
+from .skeleton import SkeletonIndex
+from .streaming import stream_uemodel
+from .decimation import parse_lod_ratios
+from .geometry import build_material_sections, split_to_render_vertices
+from ..options import UEAnimOptions, UEFormatOptions
 
-from ..importer.logging import Log
+from ..importer.logging import Log, Profiler, get_peak_rss
 from ..importer import classes as uf_classes
-from ..importer.classes import (
-    ANIM_IDENTIFIER,
-    MAGIC,
-    MODEL_IDENTIFIER,
-)
+from ..importer.reader import UEModelReader
+from ..importer.validation import validate_uemodel
 
 
+# blender side of the export, reads the scene and fills a UEModelBuilder
+# everything after that (building, serializing, compressing) lives in builder.py and doesn't need bpy
 class UEFormatExport:
-    def __init__(self, options: UEFormatOptions) -> None:
+    def __init__(self, options: UEFormatOptions, objects: list[Object] | None = None) -> None:
         self.options = options
+        # exports every (selected) object of the file when not given
+        self.objects = objects
+        # shape keys of streamed LODs by id() of the LOD, read one at a time while the LOD is written
+        self.streamed_morphs: dict[int, Iterator[uf_classes.MorphTarget]] = {}
     
     def export_file(self, path: str | Path) -> None:
         path = path if isinstance(path, Path) else Path(path)
 
-        Log.time_start(f"Export {path}")
-
-        self.export_data(path)
-        
-        Log.time_end(f"Export {path}")
+        if self.options.profile_export:
+            Profiler.start(path.name)
+        peak_rss_before = get_peak_rss()
 
+        try:
+            Log.time_start(f"Export {path}")
 
-    def export_data(self, path: Path) -> None:
-        with FArchiveWriter(path) as ar:
-            ar: FArchiveWriter
+            self.export_data(path)
             
-            # for now, only handle models
-            identifier = MODEL_IDENTIFIER
-            self.file_version = uf_classes.EUEFormatVersion.LatestVersion
-            object_name = self.get_obj_name()
-            
-            ar.write_string(MAGIC)
-            ar.write_fstring(identifier)
-            ar.write_byte(int.to_bytes(self.file_version, byteorder="big"))
-            ar.write_fstring(object_name)
-
-            Log.info(f"Exporting {object_name}")
-
-            # TODO: maybe add compression option for the user
-            is_compressed = False
-            ar.write_bool(is_compressed)
-
-            # for now, only handle UEModel
-            self.export_uemodel_data(ar)
+            Log.time_end(f"Export {path}")
+
+            if getattr(self.options, "validate_export", False):
+                self.validate_file(path)
+        finally:
+            # always stopped, a failed export mustn't leave tracemalloc running
+            phases = Profiler.stop()
+
+        peak_rss = get_peak_rss()
+        if peak_rss is not None:
+            Log.info(f"Peak memory use {peak_rss / 2**20:.1f} MB, {max(peak_rss - peak_rss_before, 0) / 2**20:.1f} MB above the peak before the export")
+
+        if phases is not None:
+            self.write_profile(path, phases, peak_rss, peak_rss_before)
+
+
+    def export_data(self, path: Path | BinaryIO) -> None:
+        if isinstance(self.options, UEAnimOptions):
+            self.export_anim_data(path)
+            return
+
+        object_name = self.get_obj_name()
+        Log.info(f"Exporting {object_name}")
+
+        if getattr(self.options, "streaming_export", False):
+            with Profiler.phase("Stream"):
+                self.stream_uemodel(path, object_name)
+            return
+
+        # for now, only handle UEModel
+        with Profiler.phase("Build"):
+            uemodel = self.build_uemodel()
+        with Profiler.phase("Write"):
+            self.write_data(path, object_name, uemodel)
+
+    def export_anim_data(self, path: Path | BinaryIO) -> None:
+        obj = self.get_anim_object()
+        if obj is None:
+            Log.error("No armature to export an animation from")
+            return
+
+        action = obj.animation_data.action if obj.animation_data else None
+        object_name = action.name if action else obj.name
+        Log.info(f"Exporting {object_name}")
+
+        with Profiler.phase("Build"):
+            ueanim = self.build_ueanim(obj)
+        with Profiler.phase("Write"):
+            write_ueanim(path, object_name, ueanim, self.options.scale_factor, self.options.compression_type)
+
+    def get_anim_object(self) -> Object | None:
+        # the active armature, or the first one that's exported
+        active_object = bpy.context.active_object
+        if self.objects is None and active_object is not None and active_object.type == "ARMATURE":
+            return active_object
+        return next((obj for obj in self.get_objects() if obj.type == "ARMATURE"), None)
+
+    def build_ueanim(self, obj: Object) -> uf_classes.UEAnim:
+        scene = bpy.context.scene
+        action = obj.animation_data.action if obj.animation_data else None
+        if action is not None:
+            frame_start, frame_end = (round(frame) for frame in action.frame_range)
+        else:
+            frame_start, frame_end = scene.frame_start, scene.frame_end
+        frames = list(range(frame_start, frame_end + 1))
+
+        armature = cast(Armature, obj.data)
+        skeleton_index = extract_skeleton_index(armature)
+
+        Log.time_start(f"Sample {len(frames)} frames")
+        matrices = sample_pose_matrices(scene, obj, frames)
+        Log.time_end(f"Sample {len(frames)} frames")
+
+        samples = build_pose_samples(matrices, skeleton_index.parent_indices)
+
+        # sockets aren't bones in the exported skeleton, so they don't get tracks either
+        socket_idxs = set(self.find_socket_indices(armature, skeleton_index))
+        bone_idxs = [idx for idx in range(len(skeleton_index.names)) if idx not in socket_idxs]
+        names = [skeleton_index.names[idx] for idx in bone_idxs]
+
+        options = cast(UEAnimOptions, self.options)
+        tolerances = (options.position_tolerance, options.rotation_tolerance, options.scale_tolerance) if options.key_reduction else (0, 0, 0)
+        Log.time_start("Reduce keys")
+        tracks = build_tracks(names, samples[:, bone_idxs], *tolerances)
+        Log.time_end("Reduce keys")
+
+        num_keys = sum(len(track.position_keys) + len(track.rotation_keys) + len(track.scale_keys) for track in tracks)
+        Profiler.count("frames", len(frames))
+        Profiler.count("tracks", len(tracks))
+        Profiler.count("keys", num_keys)
+        Log.info(f"Kept {num_keys} of {3 * len(frames) * len(tracks)} keys")
+        return uf_classes.UEAnim(len(frames), scene.render.fps / scene.render.fps_base, tracks)
+
+    def write_data(self, path: Path | BinaryIO, object_name: str, uemodel: uf_classes.UEModel) -> None:
+        # doesn't touch bpy, so this can run outside the main thread
+        if not getattr(self.options, "use_export_cache", False) or not isinstance(path, Path):
+            write_uemodel(path, object_name, uemodel, self.options.scale_factor, self.options.compression_type)
+            return
+
+        # leave identical files alone, so unreal doesn't see a change and reimport them
+        data = io.BytesIO()
+        write_uemodel(data, object_name, uemodel, self.options.scale_factor, self.options.compression_type)
+        if not write_if_changed(path, data.getbuffer()):
+            Log.info(f"{path.name} is unchanged, not rewriting it")
+    
+    def write_profile(self, path: Path, phases: dict, peak_rss: int | None, peak_rss_before: int | None) -> None:
+        report = {
+            "file": path.name,
+            "addon_version": get_addon_version(),
+            "blender_version": bpy.app.version_string,
+            "python_version": platform.python_version(),
+            "options": asdict(self.options),
+            "file_bytes": path.stat().st_size,
+            # peak resident memory of the whole process, it only shows the export if that went past blender's own peak
+            "peak_rss_bytes": peak_rss,
+            "peak_rss_before_bytes": peak_rss_before,
+            "phases": phases,
+        }
+        # section sizes are read back from the written file, so writing itself doesn't have to count anything
+        if not isinstance(self.options, UEAnimOptions):
+            with UEModelReader(path) as reader:
+                report["sections"] = reader.section_summary()
+
+        report_path = path.with_name(path.name + ".profile.json")
+        report_path.write_text(json.dumps(report, indent=2))
+        Log.info(f"Wrote profile to {report_path}")
+
+    def validate_file(self, path: Path) -> list[str]:
+        Log.time_start(f"Validate {path}")
+        problems = validate_uemodel(path)
+        Log.time_end(f"Validate {path}")
+
+        for problem in problems:
+            Log.error(f"{path.name}: {problem}")
+        return problems
+    
+    def get_objects(self) -> list[Object]:
+        if self.objects is not None:
+            return self.objects
+        export_selected_only = getattr(self.options, "export_selected_only", False)
+        return [obj for obj in bpy.data.objects if not export_selected_only or obj.select_get()]
     
     def get_obj_name(self):
         # prefer armature name for now
         selected_meshes = []
-        for obj in bpy.data.objects:
-            if self.options.export_selected_only and not obj.select_get():
-                continue
+        for obj in self.get_objects():
             if obj.type == "ARMATURE":
                 return obj.data.name
             elif obj.type == "MESH":
@@ -76,267 +227,379 @@ class UEFormatExport:
         
         return "NO_NAME_FOUND"
     
-    def export_uemodel_data(self, ar: FArchiveWriter) -> None:
-        lods: list[uf_classes.UEModelLOD] = []
-        collisions: list[uf_classes.ConvexCollision] = []
-        skeleton: uf_classes.UEModelSkeleton | None = None
-        
-        socket_idxs = []
+    def build_uemodel(self) -> uf_classes.UEModel:
+        builder = UEModelBuilder()
+        objects = self.get_objects()
+
+        lod_ratios = self.get_lod_ratios()
+
+        cache = self.open_cache()
+        cache_salt = self.get_cache_salt(objects) if cache is not None else b""
+
+        fresh_entries = self.build_objects(builder, objects, cache, cache_salt, lod_ratios)
+        uemodel = self.finish_model(builder, cache, fresh_entries)
+        if cache is not None:
+            self.close_cache(cache)
+        return uemodel
+
+    def stream_uemodel(self, path: Path | BinaryIO, object_name: str) -> None:
+        if not getattr(self.options, "use_export_cache", False) or not isinstance(path, Path):
+            self.stream_objects(path, object_name)
+            return
+
+        # like write_data, identical files are left alone. the new one is streamed next to it and swapped in if it changed
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            self.stream_objects(temp_path, object_name)
+            if not replace_if_changed(temp_path, path):
+                Log.info(f"{path.name} is unchanged, not rewriting it")
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    def stream_objects(self, path: Path | BinaryIO, object_name: str) -> None:
+        """Reads, writes and drops one object at a time, so memory use doesn't grow with the number of objects."""
+        objects = self.get_objects()
+        lod_ratios = self.get_lod_ratios()
+
+        cache = self.open_cache()
+        cache_salt = self.get_cache_salt(objects) if cache is not None else b""
+        # shape keys go from blender into the file one at a time, unless something renumbers the vertices
+        # afterwards or the whole LOD has to be serialized for the cache
+        stream_morphs = len(lod_ratios) == 0 and not getattr(self.options, "optimize_vertex_cache", False) and cache is None
+
+        # the skeleton comes first, every LOD's weights are remapped against it. the last armature wins like in build_uemodel
+        skeleton_builder = UEModelBuilder()
+        armatures = [obj for obj in objects if obj.type == "ARMATURE"][-1:]
+        fresh_entries = self.build_objects(skeleton_builder, armatures, cache, cache_salt, lod_ratios)
+        num_bones, removed_bones = skeleton_builder.num_bones, skeleton_builder.removed_bones
+        skeleton = self.finish_model(skeleton_builder, cache, fresh_entries).skeleton
+
+        with stream_uemodel(path, object_name, self.options.scale_factor, self.options.compression_type) as writer:
+            def stream_group(group: list[Object]) -> None:
+                builder = UEModelBuilder()
+                builder.set_bone_removal(num_bones, removed_bones)
+                object_entries = self.build_objects(builder, group, cache, cache_salt, lod_ratios, stream_morphs=stream_morphs)
+                uemodel = self.finish_model(builder, cache, object_entries)
+
+                with Profiler.phase(f"Write {group[0].name}"):
+                    for lod in uemodel.lods:
+                        writer.write_lod(lod, self.streamed_morphs.pop(id(lod), ()))
+                    for collision in uemodel.collisions:
+                        writer.write_collision(collision)
+
+            # same section order as UEModel.to_archive: LODs, the skeleton, collisions
+            meshes = [obj for obj in objects if obj.type == "MESH"]
+            lod_objects = [obj for obj in meshes if self.is_lod(obj)]
+            if len(lod_ratios) != 0 and len(lod_objects) > 1:
+                # generated levels are merged across objects, so those have to be built together
+                stream_group(lod_objects)
+            else:
+                for obj in lod_objects:
+                    stream_group([obj])
+            if skeleton is not None:
+                writer.write_skeleton(skeleton)
+            if self.options.export_collision:
+                for obj in meshes:
+                    if not self.is_lod(obj):
+                        stream_group([obj])
+
+        if cache is not None:
+            self.close_cache(cache)
+
+    def build_objects(
+        self,
+        builder: UEModelBuilder,
+        objects: list[Object],
+        cache: ExportCache | None,
+        cache_salt: bytes,
+        lod_ratios: list[float],
+        *,
+        stream_morphs: bool = False,
+    ) -> list:
+        """Adds objects to builder and runs the hull, LOD and vertex cache stages, returns what has to be cached."""
+        # (cache key, entry) of everything that wasn't cached yet, stored once the model is built
+        fresh_entries = []
+        # generated levels of several objects are merged from the meshes themselves, cached LODs are only bytes
+        merges_lods = len(lod_ratios) != 0 and sum(obj.type == "MESH" and self.is_lod(obj) for obj in objects) > 1
+
+        for obj in objects:
+            if obj.type == "MESH":
+                is_lod = self.is_lod(obj)
+                if not is_lod and not self.options.export_collision:
+                    continue
 
-        for obj in bpy.data.objects:
-            if self.options.export_selected_only and not obj.select_get():
-                continue
-            with bpy.context.temp_override(selected_objects=[obj]):
-                if obj.type == "MESH" \
-                and (self.options.export_lods or self.options.export_collision):
-                    mesh: Mesh = cast(Mesh, obj.data)
-                    
-                    bm = bmesh.new()
-                    bm.from_mesh(mesh)
-                    bpy.ops.object.mode_set(mode="EDIT")
-                    bmesh.ops.triangulate(bm, faces=bm.faces)
-                    bpy.ops.object.mode_set(mode="OBJECT")
-                    bm.to_mesh(mesh)
-                    bm.free()
-                    
-                    verts = [v for v in mesh.vertices]
-                    ue_verts = np.array([v.co for v in verts], dtype=np.float32)
-                    ue_indices = np.array([list(poly.vertices) for poly in mesh.polygons], dtype=np.int32)
-                    
-                    if obj.display_type != "WIRE" and self.options.export_lods:
-                        lod = uf_classes.UEModelLOD(obj.name)
-                            
-                        lod.vertices = ue_verts
-                        lod.indices = ue_indices
-                        lod.normals = np.array([v.normal.to_4d().wxyz for v in verts], dtype=np.float32)
-                        if mesh.uv_layers:
-                            mesh.calc_tangents(uvmap=mesh.uv_layers[0].name)
-                            lod.tangents = np.array([loop.tangent for loop in mesh.loops])
-                        
-                        lod.weights = []
-                        armature_of_this_obj: Armature = None
-                        for modifier in obj.modifiers:
-                            if isinstance(modifier, ArmatureModifier):
-                                armature_of_this_obj = modifier.object.data
-                                break
-
-                        for vgroup in obj.vertex_groups:
-                            for vert in verts:
-                                for group in vert.groups:
-                                    if group.group == vgroup.index:
-                                        weight = uf_classes.Weight(0, 0, 0.0)
-                                        
-                                        weight.bone_index = armature_of_this_obj.bones.find(vgroup.name)
-                                        weight.vertex_index = vert.index
-                                        weight.weight = group.weight
-                                        
-                                        lod.weights.append(weight)
-                                        break
-
-                        lod.morphs = []
-                        if mesh.shape_keys:
-                            for key in mesh.shape_keys.key_blocks:
-                                key: ShapeKey
-                                morph = uf_classes.MorphTarget(key.name, deltas=[])
-                                morphTargetNormals = np.array(key.normals_vertex_get()).reshape((-1, 3))
-                                for idx in range(len(key.data)):
-                                    delta = uf_classes.MorphTargetData([], (0, 0, 0), idx)
-                                    
-                                    keyPoint: ShapeKeyPoint = key.data[idx]
-                                    delta.position = list(keyPoint.co.to_3d().to_tuple())
-                                    delta.normals = morphTargetNormals[idx]
-                                    
-                                    morph.deltas.append(delta)
-                                
-                                lod.morphs.append(morph)
-
-                        
-                        lod.colors = []
-                        for color_attr in mesh.color_attributes:
-                            color_attr = cast(ByteColorAttribute, color_attr)
-                            
-                            vcolor = uf_classes.VertexColor(color_attr.name, np.array([]))
-                            vcolor.data = np.array([list(c.color) for c in color_attr.data], dtype=np.float32)
-                            
-                            lod.colors.append(vcolor)
-
-                        
-                        bm = bmesh.new()
-                        bm.from_mesh(mesh)
-                        bpy.ops.object.mode_set(mode="EDIT")
-                        
-                        lod.uvs = []
-                        uv_layer = bm.loops.layers.uv.active
-                        lod_uv = [None] * len(bm.verts)
-                        for v in bm.verts:
-                            for l in v.link_loops:
-                                # only get the first UV
-                                lod_uv[v.index] = np.array(l[uv_layer].uv.to_tuple(), dtype=np.float32)
-                                break
-                        print(np.array(lod_uv))
-                        lod.uvs.append(np.array(lod_uv))
-                        
-                        vertices = [vertex for polygon in mesh.polygons for vertex in polygon.vertices]
-                        do_remapping = lambda array, indices: array[indices]
-                        print("REMAPPED: ")
-                        print(do_remapping(np.array(lod_uv), vertices))
-                        
-                        bpy.ops.object.mode_set(mode="OBJECT")
-                        bm.to_mesh(mesh)
-                        bm.free()
-                        
-
-
-                        lod.materials = []
-                        mat2Poly: dict[int, list[int]] = {}
-                        for poly in mesh.polygons:
-                            mat2Poly[poly.material_index] = mat2Poly.get(poly.material_index, []) + [poly.index]
-                        
-                        for i, material in enumerate(mesh.materials):
-                            material: Material
-                            
-                            # this happens if the material isn't used by any vertex
-                            try:
-                                polys = mat2Poly[i]
-                            except KeyError:
-                                continue
-
-                            polys.sort()
-
-                            startPoly = 0
-                            endPoly = 0
-                            while endPoly < len(polys):
-                                # get consecutive polys
-                                while endPoly+1 < len(polys) and polys[endPoly+1] - polys[endPoly] == 1:
-                                    endPoly += 1
-                                lod_mat = uf_classes.Material(
-                                    material.name,
-                                    3 * polys[startPoly],
-                                    endPoly - startPoly + 1
-                                )
-                                lod.materials.append(lod_mat)
-                                
-                                start = endPoly + 1
-                                endPoly = start
-                        
-                        lod.name = "LOD0"
-                        lods.append(lod)
-
-                    elif self.options.export_collision:
-                        collision = uf_classes.ConvexCollision(obj.name, ue_verts, ue_indices)
-                        collisions.append(collision)
-
-                elif obj.type == "ARMATURE":
-                    socket_idxs = []  # reset socket idxs if more than 1 armature, TODO: more than 1 armature?
-                    
+                key = self.get_cache_key(obj, cache_salt) if cache is not None and not (is_lod and merges_lods) else None
+                cached = self.get_cached_entries(cache, key, len(lod_ratios) if is_lod else 0) if key is not None else None
+                if cached is not None:
+                    for data in cached:
+                        if is_lod:
+                            builder.add_serialized_lod(data)
+                        else:
+                            for collision in unpack_entries(data):
+                                builder.add_serialized_collision(collision)
+                    continue
+
+                with Profiler.phase(f"Mesh {obj.name}"):
+                    entry = self.add_mesh(builder, obj, stream_morphs=stream_morphs)
+            elif obj.type == "ARMATURE":
+                # TODO: more than 1 armature? the last one wins for now
+                key = self.get_cache_key(obj, cache_salt) if cache is not None else None
+                cached = self.get_cached_entries(cache, key, 0) if key is not None else None
+                if cached is not None:
                     armature = cast(Armature, obj.data)
-                    skeleton = uf_classes.UEModelSkeleton()
-                    sockets_exist = armature.collections.find("Sockets") != -1
-                  
-                    for idx, a_bone in enumerate(armature.bones):
-                        if sockets_exist and a_bone.name in armature.collections["Sockets"].bones:
-                            socket_idxs.append(idx)
-                        
-                        bone = uf_classes.Bone(a_bone.name, -1, [], (0.0, 0.0, 0.0, 0.0))
-                        bone_matrix = a_bone.matrix_local
-
-                        if a_bone.parent:
-                            bone.parent_index = armature.bones.find(a_bone.parent.name)
-                            # in import, BlenderMatrix = ParentBlenderMatrix x UFBoneMatrix
-                            # so, UFBoneMatrix = inverted_ParentBlenderMatrix x BlenderMatrix
-                            bone_matrix = armature.bones[a_bone.parent.name].matrix_local.inverted_safe() @ bone_matrix
-                        
-                        translation, rotation, _ = bone_matrix.decompose()
-                        bone.position = list(translation.to_tuple())
-                        bone.rotation = (rotation.x, rotation.y, rotation.z, rotation.w)
-
-                        skeleton.bones.append(bone)
-                        
-                        
-                    if armature.collections.find("Sockets") != -1 and self.options.export_sockets:
-                        socket_collection: BoneCollection = armature.collections["Sockets"]
-                        for socket in socket_collection.bones:
-                            lod_socket: uf_classes.Socket = uf_classes.Socket(socket.name, "", [], (0,), (0,))
-                            
-                            bone_matrix = socket.matrix_local
-                            
-                            if socket.parent:
-                                lod_socket.parent_name = socket.parent.name
-                                bone_matrix = armature.bones[socket.parent.name].matrix_local.inverted_safe() @ bone_matrix
-                            
-                            translation, rotation, scale = bone_matrix.decompose()
-                            lod_socket.position = list(translation.to_tuple())
-                            lod_socket.rotation = (rotation.x, rotation.y, rotation.z, rotation.w)
-                            lod_socket.scale = scale
-
-                            skeleton.sockets.append(lod_socket)
-                            
-
-                    if armature.collections.find("Virtual Bones") != -1 and self.options.export_virtual_bones:
-
-                        virtual_bone_collection: BoneCollection = armature.collections["Virtual Bones"]
-                        for bone in virtual_bone_collection.bones:
-                            armature_bones = armature.bones
-                            lod_vbone = uf_classes.VirtualBone("", "", bone.name)
-
-                            for source_bone in armature_bones:
-                                if source_bone.tail == bone.head and source_bone.head == bone.tail:
-                                    lod_vbone.source_name = source_bone.name
-                                    break
-                            
-                            if lod_vbone.source_name == "":
-                                continue
-                            
-                            bpy.ops.object.mode_set(mode="POSE")
-                            pose_bone: PoseBone | None = obj.pose.bones[bone.name]
-                            if pose_bone is None:
-                                continue
-                            
-                            if pose_bone.constraints.find("IK") == -1:
-                                continue
-
-                            constraint = pose_bone.constraints["IK"]
-                            constraint = cast(KinematicConstraint, constraint)
-                            lod_vbone.target_name = constraint.subtarget
-
-                            skeleton.virtual_bones.append(lod_vbone)
-
-                        bpy.ops.object.mode_set(mode="OBJECT")
-
-
-        for idx in sorted(socket_idxs, reverse=True):  # why does this work, it's so simple
-            for bone in skeleton.bones:
-                if not bone:
+                    skeleton_index = extract_skeleton_index(armature)
+                    builder.set_serialized_skeleton(cached[0], len(skeleton_index.names), self.find_socket_indices(armature, skeleton_index))
+                    continue
+
+                with Profiler.phase(f"Armature {obj.name}"):
+                    entry = self.add_armature(builder, obj)
+            else:
+                continue
+
+            if key is not None and entry is not None:
+                fresh_entries.append((key, entry))
+
+        if self.options.export_collision and getattr(self.options, "build_convex_hulls", False):
+            max_hulls = self.options.max_hulls if self.options.split_concave_collision else 1
+            Log.time_start("Build convex hulls")
+            hulls = builder.build_convex_hulls(self.options.max_hull_vertices, max_hulls)
+            Log.time_end("Build convex hulls")
+            for collision_id, collision_hulls in hulls.items():
+                if len(collision_hulls) == 1 and id(collision_hulls[0]) == collision_id:
+                    Log.warn(f"{collision_hulls[0].name} is flat, exporting its triangles as they are")
                     continue
-                
-                if bone.parent_index == idx:
-                    bone.parent_index = -1
-                elif bone.parent_index > idx:
-                    bone.parent_index -= 1
-                
-                skeleton.bones[idx] = None
+                Log.info(f"{collision_hulls[0].name}: {len(collision_hulls)} hull(s), {sum(len(hull.vertices) for hull in collision_hulls)} vertices")
+                Profiler.count("hull vertices", sum(len(hull.vertices) for hull in collision_hulls))
+
+            # a collision object is cached as all of its hulls
+            fresh_entries = [(key, hulls.get(id(entry), entry)) for key, entry in fresh_entries]
+
+        if len(lod_ratios) != 0:
+            Log.time_start("Generate LODs")
+            chains = builder.generate_lod_chains(lod_ratios)
+            Log.time_end("Generate LODs")
+            for chain in chains.values():
+                Log.info("Generated " + ", ".join(f"{lod.name} ({len(lod.indices)} triangles)" for lod in chain))
+
+            # generated LODs are cached next to the LOD0 they came from
+            for key, entry in list(fresh_entries):
+                for level, lod in enumerate(chains.get(id(entry), []), start=1):
+                    fresh_entries.append((f"{key}.lod{level}", lod))
+
+        if getattr(self.options, "optimize_vertex_cache", False):
+            Log.time_start("Optimize vertex cache")
+            optimized = builder.optimize_lods()
+            Log.time_end("Optimize vertex cache")
+            for lod, stats in optimized:
+                Log.info(
+                    f"{lod.name}: ACMR {stats.acmr_before:.3f} -> {stats.acmr_after:.3f}, "
+                    f"ATVR {stats.atvr_before:.3f} -> {stats.atvr_after:.3f}"
+                )
+
+        return fresh_entries
+
+    def finish_model(self, builder: UEModelBuilder, cache: ExportCache | None, fresh_entries: list) -> uf_classes.UEModel:
+        uemodel = builder.build()
+        if cache is not None:
+            with Profiler.phase("Store in cache"):
+                self.store_in_cache(cache, uemodel, fresh_entries)
+        return uemodel
+
+    def get_lod_ratios(self) -> list[float]:
+        return parse_lod_ratios(self.options.lod_ratios) if getattr(self.options, "generate_lods", False) else []
+
+    def open_cache(self) -> ExportCache | None:
+        if not getattr(self.options, "use_export_cache", False):
+            return None
+        return ExportCache(default_cache_directory(), int(self.options.export_cache_size * 1024 * 1024))
+
+    def get_cached_entries(self, cache: ExportCache, key: str, num_generated_lods: int) -> list[bytes] | None:
+        # a LOD0 is only any good together with every LOD generated from it
+        entries = []
+        for entry_key in [key, *(f"{key}.lod{level}" for level in range(1, num_generated_lods + 1))]:
+            data = cache.get(entry_key)
+            if data is None:
+                return None
+            entries.append(data)
+        return entries
+
+    def get_cache_salt(self, objects: list[Object]) -> bytes:
+        # every LOD is remapped against the exported skeleton, so that one is part of every key
+        hasher = new_hasher(hash_options(self.options))
+        armatures = [obj for obj in objects if obj.type == "ARMATURE"]
+        if armatures:
+            hash_armature_object(hasher, armatures[-1], cast(Armature, armatures[-1].data))
+        return hasher.digest()
+
+    def get_cache_key(self, obj: Object, salt: bytes) -> str:
+        hasher = new_hasher(salt, obj.type.encode())
+        if obj.type == "ARMATURE":
+            hash_armature_object(hasher, obj, cast(Armature, obj.data))
+        else:
+            hash_mesh_object(hasher, obj, cast(Mesh, obj.data), self.get_armature_of(obj))
+        return hasher.hexdigest()
+
+    def store_in_cache(self, cache: ExportCache, uemodel: uf_classes.UEModel, fresh_entries: list) -> None:
+        serialized = {}
+        for key, entry in fresh_entries:
+            if isinstance(entry, uf_classes.UEModelSkeleton) and entry is not uemodel.skeleton:
+                continue  # replaced by a later armature
+            if isinstance(entry, (list, uf_classes.ConvexCollision)):
+                # collisions are stored as a list, one collision object can turn into several hulls
+                collisions = entry if isinstance(entry, list) else [entry]
+                parts = [serialize_entry(collision, self.options.scale_factor) for collision in collisions]
+                cache.put(key, pack_entries(parts))
+                serialized.update(zip([id(collision) for collision in collisions], parts))
+                continue
+            data = serialize_entry(entry, self.options.scale_factor)
+            cache.put(key, data)
+            serialized[id(entry)] = data
+
+        # swap in the bytes too, so writing the file doesn't serialize the same entries again
+        uemodel.lods = [serialized.get(id(lod), lod) for lod in uemodel.lods]
+        uemodel.collisions = [serialized.get(id(collision), collision) for collision in uemodel.collisions]
+        if uemodel.skeleton is not None:
+            uemodel.skeleton = serialized.get(id(uemodel.skeleton), uemodel.skeleton)
+
+    def close_cache(self, cache: ExportCache) -> None:
+        cache.evict()
+        Log.info(f"Export cache: {cache.hits} hits, {cache.misses} misses")
+
+    def is_lod(self, obj: Object) -> bool:
+        return obj.display_type != "WIRE" and self.options.export_lods
+
+    def get_armature_of(self, obj: Object) -> Armature | None:
+        for modifier in obj.modifiers:
+            if isinstance(modifier, ArmatureModifier) and modifier.object:
+                return modifier.object.data
+        return None
+
+    def add_mesh(
+        self,
+        builder: UEModelBuilder,
+        obj: Object,
+        *,
+        stream_morphs: bool = False,
+    ) -> uf_classes.UEModelLOD | uf_classes.ConvexCollision | None:
+        mesh: Mesh = cast(Mesh, obj.data)
+        
+        is_lod = self.is_lod(obj)
+        if not is_lod and not self.options.export_collision:
+            return None
+
+        # triangles come from loop_triangles, so obj.data is only read, never triangulated in place
+        with Profiler.phase("Extract"):
+            mesh_arrays = extract_mesh_arrays(
+                mesh,
+                collision_only=not is_lod,
+                sort_by_material=self.options.sort_triangles_by_material,
+                with_tangents=self.options.export_tangents,
+                srgb_colors=self.options.vertex_color_space == "SRGB",
+            )
+            for name, duration in mesh_arrays.timings.items():
+                Profiler.record(name, duration)
+        Log.info(f"Extracted {obj.name}: " + ", ".join(f"{name} {duration * 1000:.2f} ms" for name, duration in mesh_arrays.timings.items()))
+        Profiler.count("vertices", len(mesh_arrays.positions))
+        Profiler.count("triangles", len(mesh_arrays.triangles))
+
+        if not is_lod:
+            return builder.add_collision(obj.name, mesh_arrays.positions, mesh_arrays.triangles)
+
+        armature_of_this_obj = self.get_armature_of(obj)
+
+        weights = None
+        if armature_of_this_obj and obj.vertex_groups:
+            with Profiler.phase("Weights"):
+                weights = extract_weights(obj, mesh, armature_of_this_obj)
+                weights = split_to_render_vertices(weights, mesh_arrays.render_source, len(mesh.vertices))
+            Profiler.count("weights", len(weights))
+
+        morphs = []
+        has_morphs = mesh.shape_keys and self.options.export_morph_targets
+        if has_morphs and not stream_morphs:
+            with Profiler.phase("Morph targets"):
+                morphs = list(self.read_morph_targets(mesh, mesh_arrays.render_source))
+
+        material_names = [material.name if material else "None" for material in mesh.materials]
+
+        lod = builder.add_lod(
+            "LOD0",
+            mesh_arrays.positions,
+            mesh_arrays.triangles,
+            normals=mesh_arrays.normals,
+            tangents=mesh_arrays.tangents,
+            uvs=mesh_arrays.uvs,
+            colors=mesh_arrays.colors,
+            materials=build_material_sections(mesh_arrays.triangle_materials, material_names),
+            weights=weights,
+            morphs=morphs,
+        )
+        if has_morphs and stream_morphs:
+            self.streamed_morphs[id(lod)] = self.read_morph_targets(mesh, mesh_arrays.render_source)
+        return lod
+
+    def read_morph_targets(self, mesh: Mesh, render_source: npt.NDArray[np.int64]) -> Iterator[uf_classes.MorphTarget]:
+        for morph in iter_morph_targets(mesh, self.options.morph_target_threshold):
+            morph.deltas = split_to_render_vertices(morph.deltas, render_source, len(mesh.vertices))
+            Profiler.count("morph targets", 1)
+            Profiler.count("morph deltas", len(morph.deltas))
+            yield morph
+
+    def find_socket_indices(self, armature: Armature, skeleton_index: SkeletonIndex) -> list[int]:
+        if armature.collections.find("Sockets") == -1:
+            return []
+        socket_collection: BoneCollection = armature.collections["Sockets"]
+        return [skeleton_index.find(socket.name) for socket in socket_collection.bones]
+
+    def add_armature(self, builder: UEModelBuilder, obj: Object) -> uf_classes.UEModelSkeleton:
+        armature = cast(Armature, obj.data)
+        skeleton_index = extract_skeleton_index(armature)
+
+        Profiler.count("bones", len(skeleton_index.names))
+        skeleton = builder.set_skeleton(
+            skeleton_index.names,
+            skeleton_index.parent_indices,
+            extract_bone_matrices(armature),
+            socket_indices=self.find_socket_indices(armature, skeleton_index),
+            export_sockets=self.options.export_sockets,
+        )
+
+        if armature.collections.find("Virtual Bones") == -1 or not self.options.export_virtual_bones:
+            return skeleton
+
+        virtual_bone_collection: BoneCollection = armature.collections["Virtual Bones"]
+        for bone in virtual_bone_collection.bones:
+            lod_vbone = uf_classes.VirtualBone("", "", bone.name)
+
+            # the source bone runs from the virtual bone's tail to its head
+            vbone_index = skeleton_index.find(bone.name)
+            source_index = skeleton_index.find_by_endpoints(
+                skeleton_index.tails[vbone_index],
+                skeleton_index.heads[vbone_index],
+                exclude=vbone_index,
+            )
+            if source_index == -1:
+                continue
+            lod_vbone.source_name = skeleton_index.names[source_index]
             
-            for lod in lods:
-                for widx, weight in enumerate(lod.weights.copy()):
-                    if not weight:
-                        continue
-                    
-                    if weight.bone_index == idx:
-                        lod.weights[widx] = None
-                    elif weight.bone_index > idx:
-                        weight.bone_index -= 1
+            # pose bones and their constraints are readable from object mode
+            pose_bone: PoseBone | None = obj.pose.bones.get(bone.name)
+            if pose_bone is None:
+                continue
             
-                lod.weights = list(filter(lambda w: w is not None, lod.weights))
-        skeleton.bones = list(filter(lambda b: b is not None, skeleton.bones))
-        
-        
-        uemodel = uf_classes.UEModel()
-        if lods and len(lods) != 0:
-            uemodel.lods = lods
-        if collisions and len(collisions) != 0:
-            uemodel.collisions = collisions
-        if skeleton:
-            uemodel.skeleton = skeleton
-        
-        if uemodel.lods or uemodel.collisions or uemodel.skeleton:
-            UEModel.to_archive(uemodel, ar, self.options.scale_factor)
+            constraint = pose_bone.constraints.get("IK")
+            if constraint is None:
+                continue
+
+            constraint = cast(KinematicConstraint, constraint)
+            lod_vbone.target_name = constraint.subtarget
+
+            skeleton.virtual_bones.append(lod_vbone)
+
+        return skeleton
+
+
+def get_addon_version() -> str:
+    manifest_path = Path(__file__).parents[1] / "blender_manifest.toml"
+    with manifest_path.open("rb") as file:
+        return tomllib.load(file).get("version", "unknown")
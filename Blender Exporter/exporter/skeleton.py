@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import numpy as np
+import numpy.typing as npt
+
+from ..importer import classes as uf_classes
+
+
+class SkeletonIndex:
+    """
+    Lookup tables for an armature, built once so bones can be found by name or by endpoints in constant time.
+    Endpoints are matched exactly, like comparing Bone.head and Bone.tail (relative to the parent) does.
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        parent_names: list[str | None],
+        heads: npt.NDArray[np.floating],
+        tails: npt.NDArray[np.floating],
+    ) -> None:
+        self.names = names
+        self.index_by_name = {name: idx for idx, name in enumerate(names)}
+        self.parent_indices = np.array([self.find(name) if name else -1 for name in parent_names], dtype=np.int32)
+        self.heads = np.asarray(heads, dtype=np.float32).reshape(-1, 3)
+        self.tails = np.asarray(tails, dtype=np.float32).reshape(-1, 3)
+
+        self.bones_by_endpoints: dict[tuple[float, ...], list[int]] = {}
+        for idx, key in enumerate(np.hstack((self.heads, self.tails)).tolist()):
+            self.bones_by_endpoints.setdefault(tuple(key), []).append(idx)
+
+    def find(self, name: str) -> int:
+        return self.index_by_name.get(name, -1)
+
+    def find_by_endpoints(self, head: npt.ArrayLike, tail: npt.ArrayLike, exclude: int = -1) -> int:
+        """Returns the first bone with exactly this head and tail, or -1."""
+        key = np.hstack((np.asarray(head, dtype=np.float32).reshape(3), np.asarray(tail, dtype=np.float32).reshape(3)))
+        return next((idx for idx in self.bones_by_endpoints.get(tuple(key.tolist()), []) if idx != exclude), -1)
+
+
+def compute_local_transforms(matrices: npt.NDArray[np.floating], parent_indices: npt.NDArray[np.integer]) -> npt.NDArray[np.float64]:
+    """Converts (N, 4, 4) armature space matrices to parent relative ones."""
+    # in import, BlenderMatrix = ParentBlenderMatrix x UFBoneMatrix
+    # so, UFBoneMatrix = inverted_ParentBlenderMatrix x BlenderMatrix
+    matrices = np.asarray(matrices, dtype=np.float64)
+    local_matrices = matrices.copy()
+
+    has_parent = parent_indices != -1
+    try:
+        inverted_matrices = np.linalg.inv(matrices)
+    except np.linalg.LinAlgError:
+        inverted_matrices = np.linalg.pinv(matrices)  # same idea as inverted_safe, degenerate bones don't fail the export
+    local_matrices[has_parent] = inverted_matrices[parent_indices[has_parent]] @ matrices[has_parent]
+    return local_matrices
+
+
+def decompose_transforms(
+    matrices: npt.NDArray[np.floating],
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Vectorized Matrix.decompose, returns translations (N, 3), rotations as xyzw quaternions (N, 4) and scales (N, 3)."""
+    matrices = np.asarray(matrices, dtype=np.float64)
+    translations = matrices[:, :3, 3].copy()
+    basis = matrices[:, :3, :3]
+
+    # like mathutils, scale is the length of each column, negated when the basis is mirrored
+    scales = np.linalg.norm(basis, axis=1)
+    scales[np.linalg.det(basis) < 0] *= -1
+    safe_scales = np.where(scales == 0, 1.0, scales)
+    rotations = matrices_to_quaternions(basis / safe_scales[:, np.newaxis, :])
+
+    return translations, rotations, scales
+
+
+def matrices_to_quaternions(rotations: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Converts (N, 3, 3) rotation matrices to normalized xyzw quaternions with w >= 0."""
+    m = rotations
+    m00, m01, m02 = m[:, 0, 0], m[:, 0, 1], m[:, 0, 2]
+    m10, m11, m12 = m[:, 1, 0], m[:, 1, 1], m[:, 1, 2]
+    m20, m21, m22 = m[:, 2, 0], m[:, 2, 1], m[:, 2, 2]
+    trace = m00 + m11 + m22
+
+    # pick the numerically stable branch per matrix, then evaluate all branches at once
+    use_w = trace > 0
+    use_x = ~use_w & (m00 > m11) & (m00 > m22)
+    use_y = ~use_w & ~use_x & (m11 > m22)
+    use_z = ~use_w & ~use_x & ~use_y
+
+    quaternions = np.empty((len(m), 4), dtype=np.float64)  # xyzw
+
+    s = 2.0 * np.sqrt(np.maximum(1.0 + trace, 0.0)[use_w])
+    quaternions[use_w] = np.column_stack(((m21 - m12)[use_w] / s, (m02 - m20)[use_w] / s, (m10 - m01)[use_w] / s, s / 4))
+
+    s = 2.0 * np.sqrt(np.maximum(1.0 + m00 - m11 - m22, 0.0)[use_x])
+    quaternions[use_x] = np.column_stack((s / 4, (m01 + m10)[use_x] / s, (m02 + m20)[use_x] / s, (m21 - m12)[use_x] / s))
+
+    s = 2.0 * np.sqrt(np.maximum(1.0 + m11 - m00 - m22, 0.0)[use_y])
+    quaternions[use_y] = np.column_stack(((m01 + m10)[use_y] / s, s / 4, (m12 + m21)[use_y] / s, (m02 - m20)[use_y] / s))
+
+    s = 2.0 * np.sqrt(np.maximum(1.0 + m22 - m00 - m11, 0.0)[use_z])
+    quaternions[use_z] = np.column_stack(((m02 + m20)[use_z] / s, (m12 + m21)[use_z] / s, s / 4, (m10 - m01)[use_z] / s))
+
+    quaternions /= np.linalg.norm(quaternions, axis=1, keepdims=True)
+    quaternions[quaternions[:, 3] < 0] *= -1
+    return quaternions
+
+
+def build_bones(
+    names: list[str],
+    parent_indices: npt.NDArray[np.integer],
+    translations: npt.NDArray[np.floating],
+    rotations: npt.NDArray[np.floating],
+) -> list[uf_classes.Bone]:
+    return [
+        uf_classes.Bone(name, parent_index, position, tuple(rotation))
+        for name, parent_index, position, rotation in zip(names, parent_indices.tolist(), translations.tolist(), rotations.tolist())
+    ]
+
+
+def build_sockets(
+    names: list[str],
+    parent_indices: npt.NDArray[np.integer],
+    socket_indices: list[int],
+    translations: npt.NDArray[np.floating],
+    rotations: npt.NDArray[np.floating],
+    scales: npt.NDArray[np.floating],
+) -> list[uf_classes.Socket]:
+    sockets = []
+    for idx in socket_indices:
+        parent_index = int(parent_indices[idx])
+        sockets.append(uf_classes.Socket(
+            names[idx],
+            names[parent_index] if parent_index != -1 else "",
+            translations[idx].tolist(),
+            tuple(rotations[idx].tolist()),
+            tuple(scales[idx].tolist()),
+        ))
+    return sockets
+
+
+def build_bone_remap(num_bones: int, removed_bones: list[int]) -> npt.NDArray[np.int32]:
+    """Returns the new index of every bone, removed bones map to -1."""
+    kept = np.ones(num_bones, dtype=bool)
+    kept[removed_bones] = False
+
+    remap = np.full(num_bones, -1, dtype=np.int32)
+    remap[kept] = np.arange(np.count_nonzero(kept), dtype=np.int32)
+    return remap
+
+
+def remap_weights(weights: npt.NDArray[np.void], remap: npt.NDArray[np.int32]) -> npt.NDArray[np.void]:
+    """Applies a bone remap to a WEIGHT_DTYPE array, influences of removed or unknown bones are dropped."""
+    bone_indices = weights["bone_index"].astype(np.int32)
+    in_range = (bone_indices >= 0) & (bone_indices < len(remap))
+    new_indices = np.full(len(weights), -1, dtype=np.int32)
+    new_indices[in_range] = remap[bone_indices[in_range]]
+
+    kept = new_indices != -1
+    remapped_weights = weights[kept]
+    remapped_weights["bone_index"] = new_indices[kept]
+    return remapped_weights
+
+
+def remove_bones(
+    skeleton: uf_classes.UEModelSkeleton | None,
+    lods: list[uf_classes.UEModelLOD],
+    removed_bones: list[int],
+    num_bones: int | None = None,
+) -> None:
+    """
+    Removes bones from the skeleton in one go, fixing up parent indices and the weights of every LOD.
+    skeleton can be None when it was already written out, num_bones has to be passed in that case.
+    """
+    if len(removed_bones) == 0:
+        return
+
+    remap = build_bone_remap(len(skeleton.bones) if num_bones is None else num_bones, removed_bones)
+
+    if skeleton is not None:
+        parent_indices = np.array([bone.parent_index for bone in skeleton.bones], dtype=np.int32)
+        has_parent = parent_indices != -1
+        parent_indices[has_parent] = remap[parent_indices[has_parent]]  # children of removed bones become roots
+
+        kept = remap != -1
+        skeleton.bones = [bone for bone, is_kept in zip(skeleton.bones, kept.tolist()) if is_kept]
+        for bone, parent_index in zip(skeleton.bones, parent_indices[kept].tolist()):
+            bone.parent_index = parent_index
+
+    for lod in lods:
+        lod.weights = remap_weights(lod.weights, remap)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import itertools
+import mmap
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from ..importer import classes as uf_classes
+from ..importer.classes import MODEL_IDENTIFIER
+from .builder import write_compressed, write_header
+from .classes import ConvexCollision, MorphTarget, UEModelLOD, UEModelSkeleton
+from .writer import FArchiveWriter
+
+# top level sections in the order UEModel.to_archive writes them, streamed files keep that order
+SECTION_ORDER = ("LODS", "SKELETON", "COLLISION")
+
+
+@dataclass(slots=True)
+class OpenSection:
+    name: str
+    count_position: int  # the size follows right after the count
+    start: int
+    count: int = 0
+
+
+class UEModelStreamWriter:
+    """
+    Writes the sections of a .uemodel one LOD, collision or morph target at a time, so only the entry being written
+    has to be in memory. Counts and sizes aren't known up front, they're written as 0 and patched in once a section
+    is done, which needs a seekable archive. The file comes out the same as UEModel.to_archive would write it.
+    """
+
+    def __init__(self, ar: FArchiveWriter, scale_factor: float) -> None:
+        self.ar = ar
+        self.scale_factor = scale_factor
+        self.section: OpenSection | None = None
+        self.finished: list[str] = []
+
+    def begin_section(self, name: str) -> OpenSection:
+        self.ar.write_fstring(name)
+        count_position = self.ar.tell()
+        self.ar.write_int(0)
+        self.ar.write_int(0)
+        return OpenSection(name, count_position, self.ar.tell())
+
+    def end_section(self, section: OpenSection) -> None:
+        self.ar.patch_int(section.count_position, section.count)
+        self.ar.patch_int(section.count_position + 4, self.ar.tell() - section.start)
+
+    def enter_section(self, name: str) -> OpenSection:
+        if self.section is not None and self.section.name == name:
+            return self.section
+
+        self.close_section()
+        if self.finished and SECTION_ORDER.index(name) <= SECTION_ORDER.index(self.finished[-1]):
+            raise ValueError(f"{name} has to be written before {self.finished[-1]}")
+        self.section = self.begin_section(name)
+        return self.section
+
+    def close_section(self) -> None:
+        if self.section is None:
+            return
+        self.end_section(self.section)
+        self.finished.append(self.section.name)
+        self.section = None
+
+    def write_lod(self, lod: uf_classes.UEModelLOD | bytes, morphs: Iterable[uf_classes.MorphTarget] = ()) -> None:
+        """
+        Writes one LOD, morphs can be a generator that reads one shape key at a time, they end up after the
+        LOD's own morph targets.
+        """
+        section = self.enter_section("LODS")
+        if isinstance(lod, bytes):
+            self.ar.write_bytes(lod)
+            section.count += 1
+            return
+
+        ar = self.ar
+        ar.write_fstring(lod.name)
+        size_position = ar.tell()
+        ar.write_int(0)
+
+        # morph targets are the last section of a LOD, so they can be appended once everything else is written
+        own_morphs, lod.morphs = lod.morphs, []
+        try:
+            UEModelLOD.write_lod_data(lod, ar, self.scale_factor)
+        finally:
+            lod.morphs = own_morphs
+        self.write_morph_targets(itertools.chain(own_morphs, morphs))
+
+        ar.patch_int(size_position, ar.tell() - size_position - 4)
+        section.count += 1
+
+    def write_morph_targets(self, morphs: Iterable[uf_classes.MorphTarget]) -> None:
+        section = None
+        for morph in morphs:
+            if section is None:
+                section = self.begin_section("MORPHTARGETS")
+            MorphTarget.to_archive(morph, self.ar, self.scale_factor)
+            section.count += 1
+
+        if section is not None:
+            self.end_section(section)
+
+    def write_skeleton(self, skeleton: uf_classes.UEModelSkeleton | bytes) -> None:
+        section = self.enter_section("SKELETON")
+        if section.count != 0:
+            raise ValueError("A model only has one skeleton")
+        UEModelSkeleton.to_archive(skeleton, self.ar, self.scale_factor)
+        section.count += 1
+
+    def write_collision(self, collision: uf_classes.ConvexCollision | bytes) -> None:
+        section = self.enter_section("COLLISION")
+        ConvexCollision.to_archive(collision, self.ar, self.scale_factor)
+        section.count += 1
+
+
+@contextmanager
+def stream_uemodel(
+    path: str | Path | BinaryIO,
+    object_name: str,
+    scale_factor: float = 100,
+    compression_type: str = "NONE",
+) -> Iterator[UEModelStreamWriter]:
+    """
+    Opens a .uemodel to stream entries into, it's complete once the block ends. Uncompressed files are patched in
+    place, streams and compressed files are written to a temporary file first and copied or compressed from there.
+    """
+    is_compressed = compression_type != "NONE"
+    if not is_compressed and not hasattr(path, "write"):
+        with FArchiveWriter(path) as ar:
+            write_header(ar, MODEL_IDENTIFIER, object_name, False)
+            writer = UEModelStreamWriter(ar, scale_factor)
+            yield writer
+            writer.close_section()
+        return
+
+    with tempfile.TemporaryFile() as payload:
+        with FArchiveWriter(payload) as payload_ar:
+            writer = UEModelStreamWriter(payload_ar, scale_factor)
+            yield writer
+            writer.close_section()
+
+        with FArchiveWriter(path) as ar:
+            write_header(ar, MODEL_IDENTIFIER, object_name, is_compressed)
+            if not is_compressed:
+                payload.seek(0)
+                shutil.copyfileobj(payload, ar.file)
+            elif payload.seek(0, os.SEEK_END) == 0:
+                write_compressed(ar, memoryview(b""), object_name, compression_type)
+            else:
+                # mapped instead of read, so pages that were already compressed can be dropped again
+                with mmap.mmap(payload.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as data:
+                    write_compressed(ar, data, object_name, compression_type)
@@ -1,21 +1,28 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
 
-from .writer import FArchiveWriter
+from .writer import FArchiveSizer, FArchiveWriter
 
 if TYPE_CHECKING:
     from collections.abc import Callable
 
 
 def write_byte_size_wrapper(ar: FArchiveWriter, fn: Callable[[FArchiveWriter], int]):
-    pos_before = ar.tell()
-    ar.pad(4)
-
-    total_bytes_written = fn(ar)
-    pos_after = ar.tell()
+    # while planning, nested sections note down their size so writing them later doesn't plan them again
+    if isinstance(ar, FArchiveSizer):
+        index = len(ar.sizes)
+        ar.sizes.append(0)
+        ar.sizes[index] = fn(ar)
+        return ar.sizes[index] + 4
     
-    ar.seek(pos_before)
-    ar.write_int(total_bytes_written)
-    ar.seek(pos_after)
+    # the outermost section plans everything below it in one go, the nested ones take their size from that plan
+    if ar.planned_sizes:
+        size = ar.planned_sizes.popleft()
+    else:
+        sizer = FArchiveSizer()
+        size = fn(sizer)
+        ar.planned_sizes.extend(sizer.sizes)
+    ar.write_int(size)
+    total_bytes_written = fn(ar)
 
     return total_bytes_written + 4  # add 4 cuz total_bytes_written itself takes 4 bytes
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from ..importer import classes as uf_classes
+
+# post transform cache size the triangle order is tuned for, most gpus are somewhere between 16 and 32 entries
+VERTEX_CACHE_SIZE = 16
+
+
+@dataclass(slots=True)
+class VertexCacheStats:
+    # average cache misses per triangle, 0.5 is the best a regular mesh can get, 3 means no reuse at all
+    acmr_before: float
+    acmr_after: float
+    # average cache misses per vertex, 1 is perfect
+    atvr_before: float
+    atvr_after: float
+
+
+def measure_vertex_cache(triangles: npt.NDArray[np.integer], cache_size: int = VERTEX_CACHE_SIZE) -> tuple[float, float]:
+    """Simulates a FIFO vertex cache and returns (ACMR, ATVR)."""
+    corners = np.asarray(triangles).reshape(-1).tolist()
+    if len(corners) == 0:
+        return 0.0, 0.0
+
+    # a vertex is still cached if fewer than cache_size misses happened since it was loaded
+    loaded_at: dict[int, int] = {}
+    misses = 0
+    for vertex in corners:
+        if misses - loaded_at.get(vertex, -cache_size) >= cache_size:
+            loaded_at[vertex] = misses
+            misses += 1
+
+    return misses / (len(corners) // 3), misses / len(loaded_at)
+
+
+def order_triangles_for_cache(
+    triangles: npt.NDArray[np.integer],
+    num_vertices: int,
+    cache_size: int = VERTEX_CACHE_SIZE,
+) -> tuple[npt.NDArray[np.int64], list[int]]:
+    """
+    Tipsify (Sander, Nehab & Barczak 2007): fans around one vertex at a time and moves on to the neighbour that's
+    still in the cache and has the fewest triangles left. Returns the new triangle order and where each cluster
+    starts, a cluster ends whenever the walk hits a dead end and has to jump.
+    """
+    num_triangles = len(triangles)
+    if num_triangles == 0:
+        return np.zeros(0, dtype=np.int64), []
+
+    corners = np.asarray(triangles, dtype=np.int64).reshape(-1)
+    uses = np.bincount(corners, minlength=num_vertices)
+    # triangles around every vertex, as one flat list plus offsets
+    adjacency = (np.argsort(corners, kind="stable") // 3).tolist()
+    offsets = np.concatenate(([0], np.cumsum(uses))).tolist()
+
+    # plain python lists, indexing numpy arrays one element at a time is a lot slower
+    triangle_list = np.asarray(triangles, dtype=np.int64).tolist()
+    live = uses.tolist()
+    cache_time = [0] * num_vertices
+    emitted = [False] * num_triangles
+    dead_end: list[int] = []
+    output: list[int] = []
+    cluster_starts = [0]
+
+    time = cache_size + 1
+    cursor = 0
+    vertex = int(corners[0])
+    while vertex >= 0:
+        candidates = []
+        for triangle in adjacency[offsets[vertex]:offsets[vertex + 1]]:
+            if emitted[triangle]:
+                continue
+            emitted[triangle] = True
+            output.append(triangle)
+            for corner in triangle_list[triangle]:
+                dead_end.append(corner)
+                candidates.append(corner)
+                live[corner] -= 1
+                if time - cache_time[corner] > cache_size:
+                    cache_time[corner] = time
+                    time += 1
+
+        # prefer the neighbour that will still be cached after fanning around it
+        next_vertex, best_priority = -1, -1
+        for candidate in candidates:
+            if live[candidate] <= 0:
+                continue
+            priority = 0
+            if time - cache_time[candidate] + 2 * live[candidate] <= cache_size:
+                priority = time - cache_time[candidate]
+            if priority > best_priority:
+                next_vertex, best_priority = candidate, priority
+
+        if next_vertex == -1:
+            while dead_end:
+                candidate = dead_end.pop()
+                if live[candidate] > 0:
+                    next_vertex = candidate
+                    break
+            else:
+                while cursor < num_vertices and live[cursor] <= 0:
+                    cursor += 1
+                next_vertex = cursor if cursor < num_vertices else -1
+            if next_vertex != -1:
+                cluster_starts.append(len(output))
+
+        vertex = next_vertex
+
+    return np.array(output, dtype=np.int64), cluster_starts
+
+
+def sort_clusters_for_overdraw(
+    positions: npt.NDArray[np.floating],
+    triangles: npt.NDArray[np.integer],
+    cluster_starts: list[int],
+) -> npt.NDArray[np.int64]:
+    """
+    Orders already cache optimized clusters so the ones facing away from the mesh center are drawn first,
+    they're the most likely to cover the rest (the view independent sort from the Tipsify paper).
+    Returns the new order of the triangles.
+    """
+    num_triangles = len(triangles)
+    starts = np.unique(np.asarray(cluster_starts, dtype=np.int64))
+    if len(starts) <= 1:
+        return np.arange(num_triangles)
+
+    corners = np.asarray(positions, dtype=np.float64)[triangles]
+    area_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(area_normals, axis=1)
+    centroids = corners.mean(axis=1)
+    mesh_center = np.average(centroids, axis=0, weights=areas) if areas.sum() > 0 else centroids.mean(axis=0)
+
+    cluster_normals = np.add.reduceat(area_normals, starts)
+    cluster_areas = np.add.reduceat(areas, starts)
+    cluster_centroids = np.add.reduceat(centroids * areas[:, None], starts) / np.maximum(cluster_areas, 1e-30)[:, None]
+    cluster_normals /= np.maximum(np.linalg.norm(cluster_normals, axis=1), 1e-30)[:, None]
+    facing = np.einsum("ij,ij->i", cluster_centroids - mesh_center, cluster_normals)
+
+    cluster_order = np.argsort(-facing, kind="stable")
+    ends = np.append(starts[1:], num_triangles)
+    return np.concatenate([np.arange(starts[cluster], ends[cluster]) for cluster in cluster_order])
+
+
+def reorder_vertices_by_first_use(triangles: npt.NDArray[np.integer], num_vertices: int) -> npt.NDArray[np.int64]:
+    """Returns the new index of every vertex, numbered in the order the triangles first use them. Unused vertices go last."""
+    corners = np.asarray(triangles, dtype=np.int64).reshape(-1)
+    used, first_use = np.unique(corners, return_index=True)
+    by_first_use = used[np.argsort(first_use, kind="stable")]
+
+    unused = np.ones(num_vertices, dtype=bool)
+    unused[used] = False
+    new_order = np.concatenate((by_first_use, np.flatnonzero(unused)))
+
+    old_to_new = np.empty(num_vertices, dtype=np.int64)
+    old_to_new[new_order] = np.arange(num_vertices)
+    return old_to_new
+
+
+def optimize_lod(lod: uf_classes.UEModelLOD, cache_size: int = VERTEX_CACHE_SIZE) -> VertexCacheStats:
+    """
+    Reorders the triangles of every material section for the vertex cache and overdraw, then renumbers the vertices
+    by first use. Every per vertex array, the weights and the morph deltas are remapped in place.
+    """
+    triangles = np.asarray(lod.indices, dtype=np.int64).reshape(-1, 3)
+    num_vertices = len(lod.vertices)
+    acmr_before, atvr_before = measure_vertex_cache(triangles, cache_size)
+
+    # sections stay where they are, only the triangles inside them move
+    sections = [(material.first_index // 3, material.first_index // 3 + material.num_faces) for material in lod.materials]
+    if len(sections) == 0:
+        sections = [(0, len(triangles))]
+
+    triangle_order = np.arange(len(triangles))
+    for start, end in sections:
+        section_triangles = triangles[start:end]
+        cache_order, cluster_starts = order_triangles_for_cache(section_triangles, num_vertices, cache_size)
+        overdraw_order = sort_clusters_for_overdraw(lod.vertices, section_triangles[cache_order], cluster_starts)
+        triangle_order[start:end] = start + cache_order[overdraw_order]
+    triangles = triangles[triangle_order]
+
+    old_to_new = reorder_vertices_by_first_use(triangles, num_vertices)
+    new_to_old = np.argsort(old_to_new)
+
+    lod.indices = old_to_new[triangles].astype(np.int32)
+    lod.vertices = lod.vertices[new_to_old]
+    if lod.normals is not None and len(lod.normals) == num_vertices:
+        lod.normals = lod.normals[new_to_old]
+    if isinstance(lod.tangents, np.ndarray) and len(lod.tangents) == num_vertices:
+        lod.tangents = lod.tangents[new_to_old]
+    lod.uvs = [uv[new_to_old] for uv in lod.uvs]
+    lod.colors = [uf_classes.VertexColor(color.name, color.data[new_to_old]) for color in lod.colors]
+    lod.weights = renumber_vertex_records(lod.weights, old_to_new)
+    for morph in lod.morphs:
+        morph.deltas = renumber_vertex_records(morph.deltas, old_to_new)
+
+    acmr_after, atvr_after = measure_vertex_cache(lod.indices, cache_size)
+    return VertexCacheStats(acmr_before, acmr_after, atvr_before, atvr_after)
+
+
+def renumber_vertex_records(records: npt.NDArray[np.void], old_to_new: npt.NDArray[np.int64]) -> npt.NDArray[np.void]:
+    """Renumbers weight or morph records and sorts them by their new vertex, so they're read in vertex order too."""
+    new_indices = old_to_new[records["vertex_index"]]
+    order = np.argsort(new_indices, kind="stable")
+    renumbered = records[order]
+    renumbered["vertex_index"] = new_indices[order]
+    return renumbered
@@ -0,0 +1,284 @@
+"""
+Convex hulls and the convex decomposition of collision meshes, plain numpy.
+Spawned worker processes import this by its own name, so it mustn't import bpy or anything from the addon package.
+"""
+
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+# quickhull that adds the farthest outside point of the whole hull each step, so stopping early at a vertex budget
+# leaves the best hull that can be built from that many input points (it's always inside the exact hull)
+
+# a split has to shrink the hull volume of a part by at least this much, or the part is convex enough as it is
+MIN_SPLIT_GAIN = 0.1
+
+# where a part is cut along each axis, as a fraction of its bounds
+SPLIT_POSITIONS = (0.25, 0.5, 0.75)
+
+
+@dataclass(slots=True)
+class ConvexHull:
+    vertices: npt.NDArray[np.float64]
+    triangles: npt.NDArray[np.int32]  # counter clockwise seen from outside
+    volume: float
+
+
+def find_initial_simplex(points: npt.NDArray[np.float64], epsilon: float) -> list[int] | None:
+    """Picks 4 points spanning a tetrahedron that's as big as cheaply possible, None if the points are flat."""
+    extremes = np.unique(np.concatenate((np.argmin(points, axis=0), np.argmax(points, axis=0))))
+    distances = np.linalg.norm(points[extremes][:, None] - points[extremes][None, :], axis=-1)
+    first, second = np.unravel_index(np.argmax(distances), distances.shape)
+    a, b = int(extremes[first]), int(extremes[second])
+
+    line_distances = np.linalg.norm(np.cross(points - points[a], points[b] - points[a]), axis=1)
+    c = int(np.argmax(line_distances))
+    if line_distances[c] <= epsilon * np.linalg.norm(points[b] - points[a]):
+        return None
+
+    normal = np.cross(points[b] - points[a], points[c] - points[a])
+    plane_distances = (points - points[a]) @ (normal / np.linalg.norm(normal))
+    d = int(np.argmax(np.abs(plane_distances)))
+    if abs(plane_distances[d]) <= epsilon:
+        return None
+    return [a, b, c, d]
+
+
+def face_planes(points: npt.NDArray[np.float64], faces: npt.NDArray[np.int64]) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    corners = points[faces]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-300)[:, None]
+    return normals, np.einsum("ij,ij->i", normals, corners[:, 0])
+
+
+def quickhull(points: npt.ArrayLike, max_vertices: int = 0) -> ConvexHull | None:
+    """
+    Convex hull of a point cloud, with at most max_vertices vertices when that's set (0 is no limit).
+    Returns None for flat or too few points, they don't enclose any volume.
+    """
+    points = np.unique(np.asarray(points, dtype=np.float64).reshape(-1, 3), axis=0)
+    if len(points) < 4:
+        return None
+
+    epsilon = 1e-9 * max(float(np.ptp(points, axis=0).max()), 1e-30) * 3
+    simplex = find_initial_simplex(points, epsilon)
+    if simplex is None:
+        return None
+
+    # the faces themselves are plain lists, only a few of them change per step
+    # all the point to plane distances are done with numpy
+    faces: list[list[int]] = []
+    planes: list[list[float]] = []  # normal xyz and offset
+    neighbours: list[list[int]] = []  # face across the edge from corner k to corner k + 1
+    alive: list[bool] = []
+    outside: dict[int, tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]] = {}
+    farthest: list[tuple[float, int]] = []  # heap of (-distance of the farthest outside point, face)
+    vertex_uses = [0] * len(points)
+    point_list = points.tolist()
+
+    def add_faces(new_faces: list[list[int]]) -> int:
+        normals, offsets = face_planes(points, np.array(new_faces, dtype=np.int64))
+        first_face = len(faces)
+        faces.extend(new_faces)
+        planes.extend(np.column_stack((normals, offsets)).tolist())
+        neighbours.extend([-1, -1, -1] for _ in new_faces)
+        alive.extend(True for _ in new_faces)
+        for face in new_faces:
+            for vertex in face:
+                vertex_uses[vertex] += 1
+        return first_face
+
+    def assign_outside(point_indices: npt.NDArray[np.int64], face_indices: list[int]) -> None:
+        # every point outside the hull belongs to the face it's farthest in front of
+        if len(point_indices) == 0:
+            return
+        face_planes_array = np.array([planes[face] for face in face_indices])
+        distances = points[point_indices] @ face_planes_array[:, :3].T - face_planes_array[:, 3]
+        best = np.argmax(distances, axis=1)
+        best_distances = distances[np.arange(len(point_indices)), best]
+        is_outside = best_distances > epsilon
+        point_indices, best, best_distances = point_indices[is_outside], best[is_outside], best_distances[is_outside]
+
+        order = np.argsort(best, kind="stable")
+        groups, starts = np.unique(best[order], return_index=True)
+        for group, group_points, group_distances in zip(groups.tolist(), np.split(point_indices[order], starts[1:]), np.split(best_distances[order], starts[1:])):
+            face = face_indices[group]
+            outside[face] = (group_points, group_distances)
+            heapq.heappush(farthest, (-float(group_distances.max()), face))
+
+    def distance_to(face: int, point: list[float]) -> float:
+        plane = planes[face]
+        return plane[0] * point[0] + plane[1] * point[1] + plane[2] * point[2] - plane[3]
+
+    a, b, c, d = simplex
+    tetrahedron = [[a, b, c], [a, c, d], [a, d, b], [b, d, c]]
+    # turn every face of the tetrahedron outwards
+    center = points[simplex].mean(axis=0).tolist()
+    normals, offsets = face_planes(points, np.array(tetrahedron, dtype=np.int64))
+    tetrahedron = [face[::-1] if normal @ center - offset > 0 else face for face, normal, offset in zip(tetrahedron, normals, offsets)]
+    add_faces(tetrahedron)
+    edge_faces = {(face[k], face[(k + 1) % 3]): idx for idx, face in enumerate(faces) for k in range(3)}
+    for idx, face in enumerate(faces):
+        neighbours[idx] = [edge_faces[(face[(k + 1) % 3], face[k])] for k in range(3)]
+    assign_outside(np.setdiff1d(np.arange(len(points)), simplex), [0, 1, 2, 3])
+
+    num_vertices = 4
+    while farthest:
+        _, seed = heapq.heappop(farthest)
+        if not alive[seed] or seed not in outside:
+            continue
+        if max_vertices > 0 and num_vertices >= max_vertices:
+            break
+
+        seed_points, seed_distances = outside.pop(seed)
+        eye = int(seed_points[np.argmax(seed_distances)])
+        eye_point = point_list[eye]
+
+        # walk from the seed face to every face the eye sees, the edges where that stops are the horizon
+        visible = [seed]
+        is_visible = {seed: True}
+        horizon: list[tuple[int, int, int]] = []  # (start, end, face on the other side)
+        stack = [seed]
+        while stack:
+            face = stack.pop()
+            for k in range(3):
+                neighbour = neighbours[face][k]
+                if neighbour not in is_visible:
+                    is_visible[neighbour] = distance_to(neighbour, eye_point) > epsilon
+                    if is_visible[neighbour]:
+                        visible.append(neighbour)
+                        stack.append(neighbour)
+                if not is_visible[neighbour]:
+                    horizon.append((faces[face][k], faces[face][(k + 1) % 3], neighbour))
+
+        first_face = add_faces([[start, end, eye] for start, end, _ in horizon])
+        num_vertices += 1
+        starting_at = {start: first_face + idx for idx, (start, _, _) in enumerate(horizon)}
+        ending_at = {end: first_face + idx for idx, (_, end, _) in enumerate(horizon)}
+        for idx, (start, end, other) in enumerate(horizon):
+            new_face = first_face + idx
+            neighbours[new_face] = [other, starting_at[end], ending_at[start]]
+            other_face = faces[other]
+            for k in range(3):
+                if other_face[k] == end and other_face[(k + 1) % 3] == start:
+                    neighbours[other][k] = new_face
+
+        orphans = [seed_points[seed_points != eye]]
+        for face in visible:
+            alive[face] = False
+            for vertex in faces[face]:
+                vertex_uses[vertex] -= 1
+                if vertex_uses[vertex] == 0:
+                    num_vertices -= 1
+            if face in outside:
+                orphans.append(outside.pop(face)[0])
+
+        # only points in front of a removed face can be in front of a new one
+        assign_outside(np.concatenate(orphans), list(range(first_face, len(faces))))
+
+    used, triangles = np.unique(np.array([face for face, is_alive in zip(faces, alive) if is_alive]), return_inverse=True)
+    vertices = points[used]
+    triangles = triangles.reshape(-1, 3)
+    corners = vertices[triangles]
+    volume = float(np.einsum("ij,ij->i", corners[:, 0], np.cross(corners[:, 1], corners[:, 2])).sum() / 6)
+    return ConvexHull(vertices, triangles.astype(np.int32), volume)
+
+
+def cut_triangles(
+    triangles: npt.NDArray[np.float64],
+    axis: int,
+    position: float,
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Cuts (triangles, 3, 3) corner positions with an axis aligned plane. Triangles across it are split into one
+    triangle on the side of their lone corner and two on the other side, only their corners matter for the hulls.
+    """
+    sides = triangles[:, :, axis] - position
+    lower = triangles[np.all(sides <= 0, axis=1)]
+    upper = triangles[np.all(sides >= 0, axis=1)]
+    crossing = ~np.all(sides <= 0, axis=1) & ~np.all(sides >= 0, axis=1)
+    crossed, crossed_sides = triangles[crossing], sides[crossing]
+
+    # rotate the corners so the one alone on its side comes first
+    above = crossed_sides > 0
+    lone = np.where(np.count_nonzero(above, axis=1) == 1, np.argmax(above, axis=1), np.argmin(above, axis=1))
+    rotation = (lone[:, None] + np.arange(3)) % 3
+    crossed = np.take_along_axis(crossed, rotation[:, :, None], axis=1)
+    crossed_sides = np.take_along_axis(crossed_sides, rotation, axis=1)
+
+    lone_corner, first, second = crossed[:, 0], crossed[:, 1], crossed[:, 2]
+    first_t = crossed_sides[:, 0] / (crossed_sides[:, 0] - crossed_sides[:, 1])
+    second_t = crossed_sides[:, 0] / (crossed_sides[:, 0] - crossed_sides[:, 2])
+    first_cut = lone_corner + (first - lone_corner) * first_t[:, None]
+    second_cut = lone_corner + (second - lone_corner) * second_t[:, None]
+
+    lone_side = np.stack((lone_corner, first_cut, second_cut), axis=1)
+    other_side = np.concatenate((np.stack((first_cut, first, second), axis=1), np.stack((first_cut, second, second_cut), axis=1)))
+    lone_above = crossed_sides[:, 0] > 0
+    lower = np.concatenate((lower, lone_side[~lone_above], other_side[np.tile(lone_above, 2)]))
+    upper = np.concatenate((upper, lone_side[lone_above], other_side[np.tile(~lone_above, 2)]))
+    return lower, upper
+
+
+def find_best_split(triangles: npt.NDArray[np.float64], hull: ConvexHull, max_vertices: int) -> tuple[float, list] | None:
+    """Tries a few cuts along every axis, returns (volume saved, [(triangles, hull), ...]) of the best one that's worth it."""
+    corners = triangles.reshape(-1, 3)
+    lowest, highest = corners.min(axis=0), corners.max(axis=0)
+    best = None
+    for axis in range(3):
+        for fraction in SPLIT_POSITIONS:
+            halves = cut_triangles(triangles, axis, lowest[axis] + (highest[axis] - lowest[axis]) * fraction)
+            hulls = [quickhull(half.reshape(-1, 3), max_vertices) if len(half) != 0 else None for half in halves]
+            if any(half_hull is None for half_hull in hulls):
+                continue
+            saved = hull.volume - sum(half_hull.volume for half_hull in hulls)
+            if saved >= MIN_SPLIT_GAIN * hull.volume and (best is None or saved > best[0]):
+                best = (saved, list(zip(halves, hulls)))
+    return best
+
+
+def decompose(
+    vertices: npt.NDArray[np.float64],
+    triangles: npt.NDArray[np.integer],
+    max_vertices: int,
+    max_hulls: int,
+) -> list[ConvexHull]:
+    """
+    Splits a concave mesh into up to max_hulls convex hulls. The part whose best cut saves the most hull volume
+    is split first, until no cut is worth it anymore.
+    """
+    hull = quickhull(vertices, max_vertices)
+    if hull is None:
+        return []
+
+    # (triangles, hull, best split or None) of every part
+    soup = vertices[triangles]
+    parts = [(soup, hull, find_best_split(soup, hull, max_vertices))]
+    while len(parts) < max_hulls:
+        splittable = [idx for idx, part in enumerate(parts) if part[2] is not None]
+        if not splittable:
+            break
+        split_idx = max(splittable, key=lambda idx: parts[idx][2][0])
+        _, _, (_, halves) = parts.pop(split_idx)
+        parts.extend((half, half_hull, find_best_split(half, half_hull, max_vertices)) for half, half_hull in halves)
+    return [hull for _, hull, _ in parts]
+
+
+def build_hulls(
+    vertices: npt.NDArray[np.floating],
+    triangles: npt.NDArray[np.integer],
+    max_vertices: int,
+    max_hulls: int,
+) -> list[tuple[npt.NDArray[np.float32], npt.NDArray[np.int32]]]:
+    """Runs in the worker processes, so it only takes and returns plain arrays."""
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    if max_hulls > 1 and len(triangles) != 0:
+        hulls = decompose(vertices, np.asarray(triangles).reshape(-1, 3), max_vertices, max_hulls)
+    else:
+        hull = quickhull(vertices, max_vertices)
+        hulls = [hull] if hull is not None else []
+    return [(hull.vertices.astype(np.float32), hull.triangles) for hull in hulls]
@@ -1,23 +1,39 @@
 from __future__ import annotations
 
 import struct
+from collections import deque
 from pathlib import Path
-from typing import TYPE_CHECKING, TypeVar
+from typing import TYPE_CHECKING, BinaryIO, TypeVar
 
+import numpy as np
 import numpy.typing as npt
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
     from types import TracebackType
 
 R = TypeVar("R")
 
+# scaled and converted arrays are converted this many elements (or rows) at a time, so writing them never copies the whole array
+CONVERT_CHUNK_SIZE = 1 << 20
+
 
 class FArchiveWriter:
-    def __init__(self, path: Path) -> None:
-        self.path = path if isinstance(path, Path) else Path(path)
+    # accepts a path or any writable binary stream (file, pipe, socket file, BytesIO)
+    # section sizes are planned up front by FArchiveSizer, only the streaming export seeks back to patch them in
+    def __init__(self, path: str | Path | BinaryIO) -> None:
+        # sizes of nested sections, planned together with their outermost section and used up in write order
+        self.planned_sizes: deque[int] = deque()
+        self.owns_file = not hasattr(path, "write")
+        if self.owns_file:
+            self.path = path if isinstance(path, Path) else Path(path)
+        else:
+            self.path = None
+            self.file = path
 
     def __enter__(self) -> FArchiveWriter:
-        self.file = open(self.path, "wb")
+        if self.owns_file:
+            self.file = open(self.path, "wb")
         return self
     
     def __exit__(
@@ -26,13 +42,10 @@ class FArchiveWriter:
             exc_value: BaseException | None,
             traceback: TracebackType | None,
     ) -> None:
-        self.file.close()
-
-    def tell(self) -> int:
-        return self.file.tell()
-    
-    def seek(self, offset: int, whence: int = 0) -> None:
-        self.file.seek(offset, whence)
+        if self.owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
     
     def write_bool(self, boolean: bool) -> int:
         number_bytes_written = self.file.write(struct.pack("?", boolean))
@@ -42,6 +55,10 @@ class FArchiveWriter:
         number_bytes_written = self.file.write(string.encode(encoding="utf-8"))
         return number_bytes_written
     
+    def write_bytes(self, data: bytes | memoryview) -> int:
+        number_bytes_written = self.file.write(data)
+        return number_bytes_written
+    
     def write_fstring(self, fstring: str) -> int:
         number_bytes_written = self.file.write(struct.pack("i", len(fstring)))
         number_bytes_written += self.file.write(fstring.encode(encoding="utf-8"))
@@ -52,8 +69,8 @@ class FArchiveWriter:
         return number_bytes_written
     
     def write_int_vector(self, int_vec: tuple[int, ...] | npt.NDArray) -> int:
-        if type(int_vec) == npt.NDArray:
-            int_vec = tuple(int_vec)
+        if isinstance(int_vec, np.ndarray):
+            return self.write_array(int_vec, "<u4")
         number_bytes_written = self.file.write(struct.pack("I"*len(int_vec), *int_vec))
         return number_bytes_written
     
@@ -70,15 +87,73 @@ class FArchiveWriter:
         return number_bytes_written
     
     def write_float_vector(self, float_vec: tuple[float, ...] | npt.NDArray) -> int:
-        if type(float_vec) == npt.NDArray:
-            float_vec = tuple(float_vec)
+        if isinstance(float_vec, np.ndarray):
+            return self.write_array(float_vec, "<f4")
         number_bytes_written = self.file.write(struct.pack("f"*len(float_vec), *float_vec))
         return number_bytes_written
     
-    def write_byte_vector(self, byte_vec: tuple[int, ...]) -> int:
+    def write_scaled_float_vector(self, array: npt.NDArray, scale: float) -> int:
+        flattened = array.reshape(-1)
+        number_bytes_written = 0
+        for start in range(0, len(flattened), CONVERT_CHUNK_SIZE):
+            chunk = flattened[start:start + CONVERT_CHUNK_SIZE].astype(np.float32) * np.float32(scale)
+            number_bytes_written += self.write_array(chunk, "<f4")
+        return number_bytes_written
+    
+    def write_converted_array(self, array: npt.NDArray, dtype: npt.DTypeLike, convert: Callable[[npt.NDArray], npt.NDArray]) -> int:
+        # convert has to keep the shape and map rows to rows, it only runs here and never while sizing
+        number_bytes_written = 0
+        for start in range(0, len(array), CONVERT_CHUNK_SIZE):
+            number_bytes_written += self.write_array(convert(array[start:start + CONVERT_CHUNK_SIZE]), dtype)
+        return number_bytes_written
+    
+    def write_byte_vector(self, byte_vec: tuple[int, ...] | npt.NDArray) -> int:
+        if isinstance(byte_vec, np.ndarray):
+            return self.write_array(byte_vec, "<u1")
         number_bytes_written = self.file.write(struct.pack("B"*len(byte_vec), *byte_vec))
         return number_bytes_written
     
+    def write_array(self, array: npt.NDArray, dtype: npt.DTypeLike) -> int:
+        # writes the raw buffer of the array, only copies if the dtype or layout differs
+        array = np.ascontiguousarray(array, dtype=dtype)
+        number_bytes_written = self.file.write(memoryview(array.reshape(-1).view(np.uint8)))
+        return number_bytes_written
+    
+    def tell(self) -> int:
+        return self.file.tell()
+    
+    def patch_int(self, position: int, integer: int) -> None:
+        # overwrites an int that was written earlier, needs a seekable file
+        end = self.file.tell()
+        self.file.seek(position)
+        self.write_int(integer)
+        self.file.seek(end)
+    
     def pad(self, size: int) -> int:
         number_bytes_written = self.file.write(struct.pack("B"*size, *([0]*size)))
         return number_bytes_written
+
+
+class _NullStream:
+    def write(self, data: bytes | memoryview) -> int:
+        return len(data)
+    
+    def flush(self) -> None:
+        pass
+
+
+class FArchiveSizer(FArchiveWriter):
+    # same interface as FArchiveWriter, but only counts the bytes that would be written
+    def __init__(self) -> None:
+        super().__init__(_NullStream())
+        # every nested section size in the order the sections start
+        self.sizes: list[int] = []
+    
+    def write_scaled_float_vector(self, array: npt.NDArray, scale: float) -> int:
+        return array.size * 4
+    
+    def write_converted_array(self, array: npt.NDArray, dtype: npt.DTypeLike, convert: Callable[[npt.NDArray], npt.NDArray]) -> int:
+        return array.size * np.dtype(dtype).itemsize
+    
+    def write_array(self, array: npt.NDArray, dtype: npt.DTypeLike) -> int:
+        return array.size * np.dtype(dtype).itemsize
@@ -11,6 +11,14 @@ MAGIC = "UEFORMAT"
 MODEL_IDENTIFIER = "UEMODEL"
 ANIM_IDENTIFIER = "UEANIM"
 
+# packed layout of a WEIGHTS entry, lets the whole section be written in one call
+WEIGHT_DTYPE = np.dtype([("bone_index", "<i2"), ("vertex_index", "<i4"), ("weight", "<f4")])
+# packed layout of a MorphTargetData entry
+MORPH_DELTA_DTYPE = np.dtype([("position", "<f4", (3,)), ("normal", "<f4", (3,)), ("vertex_index", "<i4")])
+# packed layouts of the position/scale and the rotation (xyzw) keys of an animation track
+VECTOR_KEY_DTYPE = np.dtype([("frame", "<i4"), ("value", "<f4", (3,))])
+QUAT_KEY_DTYPE = np.dtype([("frame", "<i4"), ("value", "<f4", (4,))])
+
 
 class EUEFormatVersion(IntEnum):
     BeforeCustomVersionWasAdded = 0
@@ -42,7 +50,7 @@ class UEModelLOD:
     uvs: list[npt.NDArray[Any]] = field(default_factory=list)
     materials: list[Material] = field(default_factory=list)
     morphs: list[MorphTarget] = field(default_factory=list)
-    weights: list[Weight] = field(default_factory=list)
+    weights: npt.NDArray[np.void] = field(default_factory=lambda: np.zeros(0, dtype=WEIGHT_DTYPE))
 
 
 @dataclass(slots=True)
@@ -62,7 +70,7 @@ class ConvexCollision:
 @dataclass(slots=True)
 class VertexColor:
     name: str
-    data: npt.NDArray[np.float32]
+    data: npt.NDArray[np.uint8] | npt.NDArray[np.float32]  # (N, 4) RGBA bytes, or 0..1 floats
 
 
 @dataclass(slots=True)
@@ -90,7 +98,7 @@ class Weight:
 @dataclass(slots=True)
 class MorphTarget:
     name: str
-    deltas: list[MorphTargetData]
+    deltas: npt.NDArray[np.void] = field(default_factory=lambda: np.zeros(0, dtype=MORPH_DELTA_DTYPE))
 
 
 @dataclass(slots=True)
@@ -114,3 +122,18 @@ class VirtualBone:
     source_name: str
     target_name: str
     virtual_name: str
+
+
+@dataclass(slots=True)
+class UEAnim:
+    num_frames: int = 0
+    frames_per_second: float = 30
+    tracks: list[Track] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Track:
+    name: str
+    position_keys: npt.NDArray[np.void] = field(default_factory=lambda: np.zeros(0, dtype=VECTOR_KEY_DTYPE))
+    rotation_keys: npt.NDArray[np.void] = field(default_factory=lambda: np.zeros(0, dtype=QUAT_KEY_DTYPE))
+    scale_keys: npt.NDArray[np.void] = field(default_factory=lambda: np.zeros(0, dtype=VECTOR_KEY_DTYPE))
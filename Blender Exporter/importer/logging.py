@@ -1,5 +1,12 @@
+from __future__ import annotations
+
+import sys
+import threading
 import time
-from typing import ClassVar
+import tracemalloc
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Iterator
 
 
 class Log:
@@ -10,7 +17,8 @@ class Log:
 
     NoLog: bool = False
 
-    timers: ClassVar[dict[str, float]] = {}
+    # by thread too, batch exports time the same steps of different files at once
+    timers: ClassVar[dict[tuple[int, str], float]] = {}
 
     @classmethod
     def info(cls, message: str) -> None:
@@ -29,17 +37,210 @@ class Log:
 
     @classmethod
     def time_start(cls, name: str) -> None:
+        # every timer is a profiler phase too, so they all show up in the report
+        Profiler.begin(name)
         if not cls.NoLog:
-            cls.timers[name] = time.time()
+            cls.timers[(threading.get_ident(), name)] = time.perf_counter()
 
     @classmethod
     def time_end(cls, name: str) -> None:
+        Profiler.end(name)
         if cls.NoLog:
             return
 
-        start_time = cls.timers.pop(name, None)
+        start_time = cls.timers.pop((threading.get_ident(), name), None)
 
         if start_time is None:
             cls.error(f"Timer {name} does not exist")
         else:
-            cls.info(f"{name} took {time.time() - start_time} seconds")
+            cls.info(f"{name} took {time.perf_counter() - start_time} seconds")
+
+
+@dataclass(slots=True)
+class ProfilePhase:
+    name: str
+    start_time: float = 0.0
+    seconds: float = 0.0
+    # traced python and numpy memory when the phase started, and the highest it got while it ran
+    tracked_memory: bool = False
+    start_memory: int = 0
+    peak_memory: int = 0
+    end_memory: int = 0
+    counts: dict[str, int] = field(default_factory=dict)
+    children: list[ProfilePhase] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        report: dict[str, Any] = {"name": self.name, "seconds": self.seconds}
+        if self.tracked_memory:
+            report["peak_allocated_bytes"] = self.peak_memory - self.start_memory
+            report["retained_bytes"] = self.end_memory - self.start_memory
+        if self.counts:
+            report["counts"] = self.counts
+        if self.children:
+            report["children"] = [child.to_dict() for child in self.children]
+        return report
+
+
+# handed out while the profiler is off, so an unprofiled phase is one attribute check
+NO_PHASE = nullcontext()
+
+
+class Profiler:
+    """
+    Nested phase timings, allocation peaks (tracemalloc) and element counts of one export.
+    Off unless started, and only the thread that started it is profiled.
+    """
+
+    enabled: ClassVar[bool] = False
+    track_memory: ClassVar[bool] = False
+    stops_tracemalloc: ClassVar[bool] = False
+    thread_id: ClassVar[int] = 0
+    root: ClassVar[ProfilePhase | None] = None
+    stack: ClassVar[list[ProfilePhase]] = []
+
+    @classmethod
+    def start(cls, name: str, *, track_memory: bool = True) -> None:
+        # tracemalloc makes every allocation slower, the timings of a memory tracking run are a bit pessimistic
+        cls.stops_tracemalloc = track_memory and not tracemalloc.is_tracing()
+        if cls.stops_tracemalloc:
+            tracemalloc.start()
+        cls.track_memory = track_memory
+        cls.thread_id = threading.get_ident()
+        cls.root = ProfilePhase(name)
+        cls.stack = []
+        cls.enabled = True
+        cls.enter(cls.root)
+
+    @classmethod
+    def stop(cls) -> dict[str, Any] | None:
+        """Closes every open phase and returns the phase tree as a dict, None if the profiler wasn't running."""
+        if not cls.enabled or cls.root is None:
+            return None
+
+        while cls.stack:
+            cls.leave()
+        if cls.stops_tracemalloc:
+            tracemalloc.stop()
+        cls.enabled = False
+        return cls.root.to_dict()
+
+    @classmethod
+    def is_profiling(cls) -> bool:
+        return cls.enabled and threading.get_ident() == cls.thread_id
+
+    @classmethod
+    def phase(cls, name: str) -> AbstractContextManager[None]:
+        if not cls.enabled:
+            return NO_PHASE
+        return cls.timed_phase(name)
+
+    @classmethod
+    @contextmanager
+    def timed_phase(cls, name: str) -> Iterator[None]:
+        cls.begin(name)
+        try:
+            yield
+        finally:
+            cls.end(name)
+
+    @classmethod
+    def begin(cls, name: str) -> None:
+        if not cls.is_profiling() or not cls.stack:
+            return
+        phase = ProfilePhase(name)
+        cls.stack[-1].children.append(phase)
+        cls.enter(phase)
+
+    @classmethod
+    def end(cls, name: str) -> None:
+        if not cls.is_profiling():
+            return
+        # anything opened inside the phase and never closed ends with it
+        for depth in range(len(cls.stack) - 1, 0, -1):
+            if cls.stack[depth].name == name:
+                while len(cls.stack) > depth:
+                    cls.leave()
+                return
+
+    @classmethod
+    def record(cls, name: str, seconds: float) -> None:
+        """Adds a finished phase that was timed somewhere else, like the extraction timings."""
+        if cls.is_profiling() and cls.stack:
+            cls.stack[-1].children.append(ProfilePhase(name, seconds=seconds))
+
+    @classmethod
+    def count(cls, name: str, value: int) -> None:
+        if cls.is_profiling() and cls.stack:
+            counts = cls.stack[-1].counts
+            counts[name] = counts.get(name, 0) + int(value)
+
+    @classmethod
+    def enter(cls, phase: ProfilePhase) -> None:
+        if cls.track_memory:
+            # the parent keeps the peak it reached so far, the tracemalloc peak restarts for the child
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            if cls.stack:
+                cls.stack[-1].peak_memory = max(cls.stack[-1].peak_memory, peak_memory)
+            phase.start_memory = phase.peak_memory = current_memory
+            tracemalloc.reset_peak()
+        cls.stack.append(phase)
+        phase.start_time = time.perf_counter()
+
+    @classmethod
+    def leave(cls) -> None:
+        phase = cls.stack.pop()
+        phase.seconds = time.perf_counter() - phase.start_time
+        if cls.track_memory:
+            phase.tracked_memory = True
+            phase.end_memory, peak_memory = tracemalloc.get_traced_memory()
+            phase.peak_memory = max(phase.peak_memory, peak_memory)
+            if cls.stack:
+                cls.stack[-1].peak_memory = max(cls.stack[-1].peak_memory, phase.peak_memory)
+            tracemalloc.reset_peak()
+
+
+def get_peak_rss() -> int | None:
+    """
+    Most resident memory the process ever had, in bytes, None where it can't be read.
+    It never goes down, so an export only shows up if it pushes the peak higher than blender already got.
+    """
+    if sys.platform == "win32":
+        return get_windows_peak_rss()
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macos, kilobytes everywhere else
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def get_windows_peak_rss() -> int | None:
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    get_current_process = ctypes.windll.kernel32.GetCurrentProcess
+    get_current_process.restype = wintypes.HANDLE
+    get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+    get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not get_process_memory_info(get_current_process(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import gzip
+import mmap
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import numpy.typing as npt
+
+from .classes import MAGIC, MORPH_DELTA_DTYPE, WEIGHT_DTYPE
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class FArchiveReader:
+    """Reads little endian data from a memory mapped file or a buffer, arrays are returned as views without copying."""
+
+    def __init__(self, source: str | Path | bytes | bytearray | memoryview) -> None:
+        self.mmap: mmap.mmap | None = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self.data = memoryview(source).cast("B")
+        else:
+            with open(source, "rb") as file:
+                self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = memoryview(self.mmap)
+        self.position = 0
+
+    def __enter__(self) -> FArchiveReader:
+        return self
+
+    def __exit__(
+            self,
+            exc_type: type[BaseException] | None,
+            exc_value: BaseException | None,
+            traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.data.release()
+        if self.mmap is not None:
+            try:
+                self.mmap.close()
+            except BufferError:
+                pass  # arrays still point into the map, it gets closed once they are gone
+
+    def size(self) -> int:
+        return len(self.data)
+
+    def eof(self) -> bool:
+        return self.position >= len(self.data)
+
+    def seek(self, position: int) -> None:
+        self.position = position
+
+    def skip(self, size: int) -> None:
+        self.position += size
+
+    def read_bytes(self, size: int) -> memoryview:
+        if size < 0 or self.position + size > len(self.data):
+            raise EOFError(f"Reading {size} bytes at {self.position} goes past the end of the data ({len(self.data)} bytes)")
+        data = self.data[self.position:self.position + size]
+        self.position += size
+        return data
+
+    def read_struct(self, fmt: str) -> Any:
+        return struct.unpack(fmt, self.read_bytes(struct.calcsize(fmt)))[0]
+
+    def read_bool(self) -> bool:
+        return self.read_struct("<?")
+
+    def read_byte(self) -> int:
+        return self.read_struct("<B")
+
+    def read_short(self) -> int:
+        return self.read_struct("<h")
+
+    def read_int(self) -> int:
+        return self.read_struct("<i")
+
+    def read_float(self) -> float:
+        return self.read_struct("<f")
+
+    def read_string(self, size: int) -> str:
+        return bytes(self.read_bytes(size)).decode("utf-8")
+
+    def read_fstring(self) -> str:
+        return self.read_string(self.read_int())
+
+    def read_array(self, count: int, dtype: npt.DTypeLike) -> npt.NDArray[Any]:
+        dtype = np.dtype(dtype)
+        data = self.read_bytes(count * dtype.itemsize)
+        return np.frombuffer(data, dtype=dtype, count=count)
+
+
+@dataclass(slots=True)
+class SectionInfo:
+    name: str
+    count: int
+    offset: int  # where the section data starts
+    size: int
+
+
+@dataclass(slots=True)
+class LODInfo:
+    name: str
+    offset: int
+    size: int
+    sections: dict[str, SectionInfo] = field(default_factory=dict)
+
+
+class UEModelReader:
+    """
+    Reads a .uemodel lazily, only the section headers are parsed up front.
+    Uncompressed files are memory mapped, compressed ones are decompressed into memory first.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.file_ar = FArchiveReader(self.path)
+        ar = self.file_ar
+
+        self.magic = ar.read_string(len(MAGIC))
+        if self.magic != MAGIC:
+            raise ValueError(f"{self.path} is not a UEFormat file")
+        self.identifier = ar.read_fstring()
+        self.file_version = ar.read_byte()
+        self.object_name = ar.read_fstring()
+        self.is_compressed = ar.read_bool()
+
+        self.compression_type = "NONE"
+        self.ar = ar
+        if self.is_compressed:
+            self.compression_type = ar.read_fstring()
+            uncompressed_size = ar.read_int()
+            compressed_size = ar.read_int()
+            compressed_data = ar.read_bytes(compressed_size)
+            self.ar = FArchiveReader(decompress(compressed_data, self.compression_type, uncompressed_size))
+        self.payload_offset = self.ar.position
+
+        self.sections = self.read_section_table(self.ar, self.ar.size())
+        self._lods: list[LODInfo] | None = None
+
+    def __enter__(self) -> UEModelReader:
+        return self
+
+    def __exit__(
+            self,
+            exc_type: type[BaseException] | None,
+            exc_value: BaseException | None,
+            traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.ar is not self.file_ar:
+            self.ar.close()
+        self.file_ar.close()
+
+    @staticmethod
+    def read_section_table(ar: FArchiveReader, end: int) -> dict[str, SectionInfo]:
+        sections = {}
+        while ar.position < end:
+            name = ar.read_fstring()
+            count = ar.read_int()
+            size = ar.read_int()
+            if size < 0 or ar.position + size > end:
+                raise ValueError(f"Section {name} at {ar.position} claims {size} bytes, only {end - ar.position} are left")
+            sections[name] = SectionInfo(name, count, ar.position, size)
+            ar.skip(size)
+        return sections
+
+    @property
+    def lods(self) -> list[LODInfo]:
+        if self._lods is None:
+            self._lods = []
+            if lods_section := self.sections.get("LODS"):
+                ar = self.ar
+                ar.seek(lods_section.offset)
+                for _ in range(lods_section.count):
+                    name = ar.read_fstring()
+                    size = ar.read_int()
+                    lod = LODInfo(name, ar.position, size)
+                    lod.sections = self.read_section_table(ar, ar.position + size)
+                    self._lods.append(lod)
+        return self._lods
+
+    def skeleton_sections(self) -> dict[str, SectionInfo]:
+        if not (skeleton_section := self.sections.get("SKELETON")):
+            return {}
+        self.ar.seek(skeleton_section.offset)
+        return self.read_section_table(self.ar, skeleton_section.offset + skeleton_section.size)
+
+    def section_summary(self) -> dict[str, Any]:
+        """Element count and data size of every section, LODs and the skeleton list their own sections too."""
+        def describe(sections: dict[str, SectionInfo]) -> dict[str, Any]:
+            return {name: {"count": section.count, "bytes": section.size} for name, section in sections.items()}
+
+        summary = describe(self.sections)
+        if "LODS" in summary:
+            summary["LODS"]["lods"] = [
+                {"name": lod.name, "bytes": lod.size, "sections": describe(lod.sections)} for lod in self.lods
+            ]
+        if "SKELETON" in summary:
+            summary["SKELETON"]["sections"] = describe(self.skeleton_sections())
+        return summary
+
+    def read_array_section(self, section: SectionInfo, dtype: npt.DTypeLike, width: int = 1) -> npt.NDArray[Any]:
+        self.ar.seek(section.offset)
+        array = self.ar.read_array(section.count * width, dtype)
+        return array.reshape(-1, width) if width != 1 else array
+
+    def vertices(self, lod: LODInfo) -> npt.NDArray[np.float32]:
+        return self.read_array_section(lod.sections["VERTICES"], "<f4", 3)
+
+    def indices(self, lod: LODInfo) -> npt.NDArray[np.int32]:
+        return self.read_array_section(lod.sections["INDICES"], "<i4")
+
+    def normals(self, lod: LODInfo) -> npt.NDArray[np.float32]:
+        return self.read_array_section(lod.sections["NORMALS"], "<f4", 4)
+
+    def tangents(self, lod: LODInfo) -> npt.NDArray[np.float32]:
+        return self.read_array_section(lod.sections["TANGENTS"], "<f4", 3)
+
+    def weights(self, lod: LODInfo) -> npt.NDArray[np.void]:
+        return self.read_array_section(lod.sections["WEIGHTS"], WEIGHT_DTYPE)
+
+    def texcoords(self, lod: LODInfo) -> list[npt.NDArray[np.float32]]:
+        section = lod.sections["TEXCOORDS"]
+        self.ar.seek(section.offset)
+        return [self.ar.read_array(self.ar.read_int() * 2, "<f4").reshape(-1, 2) for _ in range(section.count)]
+
+    def vertex_colors(self, lod: LODInfo) -> list[tuple[str, npt.NDArray[np.uint8]]]:
+        section = lod.sections["VERTEXCOLORS"]
+        self.ar.seek(section.offset)
+        colors = []
+        for _ in range(section.count):
+            name = self.ar.read_fstring()
+            colors.append((name, self.ar.read_array(self.ar.read_int() * 4, "<u1").reshape(-1, 4)))
+        return colors
+
+    def materials(self, lod: LODInfo) -> list[tuple[str, int, int]]:
+        section = lod.sections["MATERIALS"]
+        self.ar.seek(section.offset)
+        return [(self.ar.read_fstring(), self.ar.read_int(), self.ar.read_int()) for _ in range(section.count)]
+
+    def morph_targets(self, lod: LODInfo) -> list[tuple[str, npt.NDArray[np.void]]]:
+        section = lod.sections["MORPHTARGETS"]
+        self.ar.seek(section.offset)
+        morphs = []
+        for _ in range(section.count):
+            name = self.ar.read_fstring()
+            morphs.append((name, self.ar.read_array(self.ar.read_int(), MORPH_DELTA_DTYPE)))
+        return morphs
+
+    def bones(self) -> list[tuple[str, int, npt.NDArray[np.float32], npt.NDArray[np.float32]]]:
+        section = self.skeleton_sections().get("BONES")
+        if section is None:
+            return []
+        self.ar.seek(section.offset)
+        return [
+            (self.ar.read_fstring(), self.ar.read_int(), self.ar.read_array(3, "<f4"), self.ar.read_array(4, "<f4"))
+            for _ in range(section.count)
+        ]
+
+    def collisions(self) -> list[tuple[str, npt.NDArray[np.float32], npt.NDArray[np.int32]]]:
+        section = self.sections.get("COLLISION")
+        if section is None:
+            return []
+        self.ar.seek(section.offset)
+        collisions = []
+        for _ in range(section.count):
+            name = self.ar.read_fstring()
+            vertices = self.ar.read_array(self.ar.read_int() * 3, "<f4").reshape(-1, 3)
+            indices = self.ar.read_array(self.ar.read_int(), "<i4")
+            collisions.append((name, vertices, indices))
+        return collisions
+
+
+def decompress(data: memoryview, compression_type: str, uncompressed_size: int) -> bytes:
+    if compression_type == "GZIP":
+        return gzip.decompress(data)
+    if compression_type == "ZSTD":
+        if zstandard is None:
+            raise RuntimeError("zstandard is needed to read ZSTD compressed files")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=uncompressed_size)
+    raise ValueError(f"Unknown compression type {compression_type}")
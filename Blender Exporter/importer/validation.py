@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from .classes import WEIGHT_DTYPE
+from .reader import LODInfo, SectionInfo, UEModelReader
+
+# bytes per element of the sections that are plain arrays
+FIXED_SECTION_SIZES = {
+    "VERTICES": 12,
+    "INDICES": 4,
+    "NORMALS": 16,
+    "TANGENTS": 12,
+    "WEIGHTS": WEIGHT_DTYPE.itemsize,
+}
+
+
+def validate_uemodel(path: str | Path) -> list[str]:
+    """Checks a .uemodel for broken sections and out of range data, returns a description of every problem found."""
+    problems: list[str] = []
+    try:
+        with UEModelReader(path) as reader:
+            validate_reader(reader, problems)
+    except (ValueError, EOFError, RuntimeError, struct.error, UnicodeDecodeError) as e:
+        problems.append(f"Could not read {path}: {e}")
+    return problems
+
+
+def validate_reader(reader: UEModelReader, problems: list[str]) -> None:
+    num_bones = None
+    if "SKELETON" in reader.sections:
+        bones = reader.bones()
+        num_bones = len(bones)
+        parent_indices = np.array([parent_index for _, parent_index, _, _ in bones], dtype=np.int64)
+        if num_bones != 0:
+            invalid_parents = (parent_indices < -1) | (parent_indices >= num_bones) | (parent_indices == np.arange(num_bones))
+            if invalid_parents.any():
+                problems.append(f"SKELETON: {np.count_nonzero(invalid_parents)} bones have an invalid parent index")
+
+    for lod in reader.lods:
+        validate_lod(reader, lod, num_bones, problems)
+
+    for name, vertices, indices in reader.collisions():
+        if len(indices) % 3 != 0:
+            problems.append(f"COLLISION {name}: {len(indices)} indices is not a multiple of 3")
+        if len(indices) != 0 and (indices.min() < 0 or indices.max() >= len(vertices)):
+            problems.append(f"COLLISION {name}: indices go past the {len(vertices)} vertices")
+
+
+def validate_lod(reader: UEModelReader, lod: LODInfo, num_bones: int | None, problems: list[str]) -> None:
+    prefix = f"LOD {lod.name}"
+
+    for name, section in lod.sections.items():
+        element_size = FIXED_SECTION_SIZES.get(name)
+        if element_size is not None and section.size != section.count * element_size:
+            problems.append(f"{prefix} {name}: size is {section.size} bytes, {section.count} elements need {section.count * element_size}")
+            return
+
+    if "VERTICES" not in lod.sections:
+        problems.append(f"{prefix}: has no VERTICES section")
+        return
+
+    vertices = reader.vertices(lod)
+    num_vertices = len(vertices)
+    if not np.isfinite(vertices).all():
+        problems.append(f"{prefix} VERTICES: contains NaN or infinite positions")
+
+    num_indices = 0
+    if "INDICES" in lod.sections:
+        indices = reader.indices(lod)
+        num_indices = len(indices)
+        if num_indices % 3 != 0:
+            problems.append(f"{prefix} INDICES: {num_indices} indices is not a multiple of 3")
+        if num_indices != 0 and (indices.min() < 0 or indices.max() >= num_vertices):
+            problems.append(f"{prefix} INDICES: indices go past the {num_vertices} vertices")
+
+    for name in ("NORMALS", "TANGENTS"):
+        if name in lod.sections and lod.sections[name].count != num_vertices:
+            problems.append(f"{prefix} {name}: has {lod.sections[name].count} entries for {num_vertices} vertices")
+
+    if "TEXCOORDS" in lod.sections:
+        texcoords = reader.texcoords(lod)
+        check_section_end(reader, lod.sections["TEXCOORDS"], prefix, problems)
+        for idx, uvs in enumerate(texcoords):
+            if len(uvs) != num_vertices:
+                problems.append(f"{prefix} TEXCOORDS: channel {idx} has {len(uvs)} entries for {num_vertices} vertices")
+
+    if "VERTEXCOLORS" in lod.sections:
+        colors = reader.vertex_colors(lod)
+        check_section_end(reader, lod.sections["VERTEXCOLORS"], prefix, problems)
+        for name, data in colors:
+            if len(data) != num_vertices:
+                problems.append(f"{prefix} VERTEXCOLORS: {name} has {len(data)} entries for {num_vertices} vertices")
+
+    if "MATERIALS" in lod.sections:
+        materials = reader.materials(lod)
+        check_section_end(reader, lod.sections["MATERIALS"], prefix, problems)
+        if materials:
+            starts = np.array([first_index for _, first_index, _ in materials], dtype=np.int64)
+            ends = starts + 3 * np.array([num_faces for _, _, num_faces in materials], dtype=np.int64)
+            if ((starts % 3 != 0) | (starts < 0) | (ends <= starts) | (ends > num_indices)).any():
+                problems.append(f"{prefix} MATERIALS: ranges are empty, misaligned or go past the {num_indices} indices")
+            order = np.argsort(starts)
+            if (ends[order][:-1] > starts[order][1:]).any():
+                problems.append(f"{prefix} MATERIALS: ranges overlap")
+
+    if "WEIGHTS" in lod.sections:
+        weights = reader.weights(lod)
+        if len(weights) != 0:
+            vertex_indices = weights["vertex_index"]
+            bone_indices = weights["bone_index"]
+            if vertex_indices.min() < 0 or vertex_indices.max() >= num_vertices:
+                problems.append(f"{prefix} WEIGHTS: vertex indices go past the {num_vertices} vertices")
+            if num_bones is None:
+                problems.append(f"{prefix} WEIGHTS: there is no skeleton to bind to")
+            elif bone_indices.min() < 0 or bone_indices.max() >= num_bones:
+                problems.append(f"{prefix} WEIGHTS: bone indices go past the {num_bones} bones")
+            values = weights["weight"]
+            if not np.isfinite(values).all() or values.min() < 0 or values.max() > 1 + 1e-4:
+                problems.append(f"{prefix} WEIGHTS: weights outside of [0, 1]")
+
+    if "MORPHTARGETS" in lod.sections:
+        morphs = reader.morph_targets(lod)
+        check_section_end(reader, lod.sections["MORPHTARGETS"], prefix, problems)
+        for name, deltas in morphs:
+            if len(deltas) == 0:
+                continue
+            if deltas["vertex_index"].min() < 0 or deltas["vertex_index"].max() >= num_vertices:
+                problems.append(f"{prefix} MORPHTARGETS: {name} has vertex indices past the {num_vertices} vertices")
+            if not np.isfinite(deltas["position"]).all():
+                problems.append(f"{prefix} MORPHTARGETS: {name} contains NaN or infinite deltas")
+
+
+def check_section_end(reader: UEModelReader, section: SectionInfo, prefix: str, problems: list[str]) -> None:
+    if reader.ar.position != section.offset + section.size:
+        problems.append(f"{prefix} {section.name}: contents take {reader.ar.position - section.offset} bytes, the size says {section.size}")
@@ -2,15 +2,16 @@ import bpy
 from bpy.props import PointerProperty
 from bpy.types import Context, Menu, Scene
 
-from .export_helpers import UFExportUEModel
+from .export_helpers import UFExportUEAnim, UFExportUEModel
 from .panels import UEEXPORT_PT_Panel
 from .settings import UMESettings
 
-operators = [UEEXPORT_PT_Panel, UFExportUEModel, UMESettings]
+operators = [UEEXPORT_PT_Panel, UFExportUEModel, UFExportUEAnim, UMESettings]
 
 
 def draw_export_menu(self: Menu, context: Context) -> None:
     self.layout.operator(UFExportUEModel.bl_idname, text="Unreal Model (.uemodel)")
+    self.layout.operator(UFExportUEAnim.bl_idname, text="Unreal Animation (.ueanim)")
 
 def register() -> None:
     for operator in operators:
@@ -1,14 +1,16 @@
 from pathlib import Path
+from time import perf_counter
 from typing import Generic, TypeVar
 
 from bpy.props import CollectionProperty, StringProperty
 from bpy.types import Operator, OperatorFileListElement
 from bpy_extras.io_utils import ExportHelper
 
+from ..exporter.batch import collect_batch_groups, export_batch, summarize_batch
 from ..exporter.logic import UEFormatExport
 from .panels import UEEXPORT_PT_Panel
 from ..ue_typing import UFormatContext
-from ..options import UEFormatOptions, UEModelOptions
+from ..options import UEAnimOptions, UEFormatOptions, UEModelOptions
 
 T = TypeVar("T", bound=UEFormatOptions)
 
@@ -25,6 +27,9 @@ class UFExportBase(Operator, ExportHelper, Generic[T]):
     def execute(self, context: UFormatContext) -> set[str]:
         options = self.options_class.from_settings(context.scene.ume_settings)
 
+        if getattr(options, "batch_mode", "NONE") != "NONE":
+            return self.execute_batch(options)
+
         directory = Path(self.directory)
         for file in self.files:
             file: OperatorFileListElement
@@ -32,6 +37,19 @@ class UFExportBase(Operator, ExportHelper, Generic[T]):
         
         return {"FINISHED"}
 
+    def execute_batch(self, options: T) -> set[str]:
+        directory = Path(self.filepath).parent
+        exporter = UEFormatExport(options)
+        groups = collect_batch_groups(options.batch_mode, exporter.get_objects())
+        if not groups:
+            self.report({"WARNING"}, "Nothing to export")
+            return {"CANCELLED"}
+
+        start_time = perf_counter()
+        results = export_batch(options, directory, groups, self.filename_ext)
+        self.report({"INFO"}, summarize_batch(results, perf_counter() - start_time))
+        return {"FINISHED"}
+
 
 class UFExportUEModel(UFExportBase):
     bl_idname = "uf.export_uemodel"
@@ -50,3 +68,20 @@ class UFExportUEModel(UFExportBase):
             export_menu=True
         )
 
+
+class UFExportUEAnim(UFExportBase):
+    bl_idname = "uf.export_ueanim"
+    bl_label = "Export Animation"
+
+    filename_ext = ".ueanim"
+    filter_glob: StringProperty(default="*.ueanim", options={"HIDDEN"}, maxlen=255) # type: ignore[reportInvalidTypeForm]
+
+    options_class = UEAnimOptions
+
+    def draw(self, context: UFormatContext) -> None:
+        UEEXPORT_PT_Panel.draw_general_options(self, context.scene.ume_settings)
+        UEEXPORT_PT_Panel.draw_anim_options(
+            self,
+            context.scene.ume_settings,
+            export_menu=True
+        )
@@ -19,12 +19,15 @@ class UEEXPORT_PT_Panel(Panel):
 
         self.draw_general_options(self, ume_settings)
         self.draw_model_options(self, ume_settings)
+        self.draw_anim_options(self, ume_settings)
     
     @staticmethod
     def draw_general_options(obj: Panel | Operator, settings: UMESettings) -> None:
         box = obj.layout.box()
         box.label(text="General", icon="SETTINGS")
         box.row().prop(settings, "scale_factor")
+        box.row().prop(settings, "compression_type")
+        box.row().prop(settings, "profile_export")
     
     @staticmethod
     def draw_model_options(
@@ -36,9 +39,32 @@ class UEEXPORT_PT_Panel(Panel):
         box = obj.layout.box()
         box.label(text="Model", icon="OUTLINER_OB_MESH")
         box.row().prop(settings, "export_selected_only")
+        box.row().prop(settings, "batch_mode")
+        box.row().prop(settings, "validate_export")
+        box.row().prop(settings, "streaming_export")
+        box.row().prop(settings, "use_export_cache")
+        if settings.use_export_cache:
+            box.row().prop(settings, "export_cache_size")
         box.row().prop(settings, "export_lods")
+        if settings.export_lods:
+            box.row().prop(settings, "generate_lods")
+            if settings.generate_lods:
+                box.row().prop(settings, "lod_ratios")
+        box.row().prop(settings, "export_tangents")
+        box.row().prop(settings, "vertex_color_space")
+        box.row().prop(settings, "sort_triangles_by_material")
+        box.row().prop(settings, "optimize_vertex_cache")
         box.row().prop(settings, "export_collision")
+        if settings.export_collision:
+            box.row().prop(settings, "build_convex_hulls")
+            if settings.build_convex_hulls:
+                box.row().prop(settings, "max_hull_vertices")
+                box.row().prop(settings, "split_concave_collision")
+                if settings.split_concave_collision:
+                    box.row().prop(settings, "max_hulls")
         box.row().prop(settings, "export_morph_targets")
+        if settings.export_morph_targets:
+            box.row().prop(settings, "morph_target_threshold")
         box.row().prop(settings, "export_sockets")
         box.row().prop(settings, "export_virtual_bones")
         # box.row().prop(settings, "reorient_bones")
@@ -47,3 +73,20 @@ class UEEXPORT_PT_Panel(Panel):
         if not export_menu:
             box.row().operator("uf.export_uemodel", icon="MESH_DATA")
 
+    @staticmethod
+    def draw_anim_options(
+        obj: Panel | Operator,
+        settings: UMESettings,
+        *,
+        export_menu: bool = False
+    ) -> None:
+        box = obj.layout.box()
+        box.label(text="Animation", icon="ACTION")
+        box.row().prop(settings, "key_reduction")
+        if settings.key_reduction:
+            box.row().prop(settings, "position_tolerance")
+            box.row().prop(settings, "rotation_tolerance")
+            box.row().prop(settings, "scale_tolerance")
+
+        if not export_menu:
+            box.row().operator("uf.export_ueanim", icon="ACTION")
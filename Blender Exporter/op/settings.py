@@ -1,19 +1,64 @@
 from typing import Any
 
-from bpy.props import BoolProperty, FloatProperty
+from bpy.props import BoolProperty, EnumProperty, FloatProperty, IntProperty, StringProperty
 from bpy.types import PropertyGroup
 
 
 class UMESettings(PropertyGroup):
     scale_factor: FloatProperty(name="Scale", default=100, min=0.01) # type: ignore[reportInvalidTypeForm]
+    compression_type: EnumProperty(
+        name="Compression",
+        items=[
+            ("NONE", "None", "Write the data uncompressed"),
+            ("GZIP", "GZIP", "Compress with zlib, split into blocks that are compressed in parallel"),
+            ("ZSTD", "ZSTD", "Compress with zstandard if it is installed, otherwise GZIP is used"),
+        ],
+        default="NONE",
+    ) # type: ignore[reportInvalidTypeForm]
+    profile_export: BoolProperty(name="Write Profile", default=False, description="Time every export phase, track its memory and write a .profile.json report next to the file") # type: ignore[reportInvalidTypeForm]
     export_selected_only: BoolProperty(name="Export Only Selected", default=False) # type: ignore[reportInvalidTypeForm]
+    batch_mode: EnumProperty(
+        name="Batch",
+        items=[
+            ("NONE", "Single File", "Export everything into the chosen file"),
+            ("OBJECT", "Per Object", "Export one file per mesh object, next to the chosen file"),
+            ("COLLECTION", "Per Collection", "Export one file per top-level collection, next to the chosen file"),
+        ],
+        default="NONE",
+    ) # type: ignore[reportInvalidTypeForm]
     # bone_length: FloatProperty(name="Bone Length", default=4.0, min=0.1) # type: ignore[reportInvalidTypeForm]
     # reorient_bones: BoolProperty(name="Reorient Bones", default=False) # type: ignore[reportInvalidTypeForm]
+    validate_export: BoolProperty(name="Validate After Export", default=False, description="Read the written file back and check its sections, indices, weights and materials") # type: ignore[reportInvalidTypeForm]
+    streaming_export: BoolProperty(name="Stream Objects", default=False, description="Write every object to the file as soon as it's read instead of collecting the whole scene first, keeps memory use flat for big scenes") # type: ignore[reportInvalidTypeForm]
+    use_export_cache: BoolProperty(name="Cache Unchanged Objects", default=False, description="Reuse the serialized data of objects that didn't change since the last export, and leave identical files untouched") # type: ignore[reportInvalidTypeForm]
+    export_cache_size: FloatProperty(name="Cache Size (MB)", default=512, min=1) # type: ignore[reportInvalidTypeForm]
     export_lods: BoolProperty(name="Export Levels of Detail", default=True) # type: ignore[reportInvalidTypeForm]
+    generate_lods: BoolProperty(name="Generate LODs", default=False, description="Decimate every mesh into a chain of lower LODs") # type: ignore[reportInvalidTypeForm]
+    lod_ratios: StringProperty(name="LOD Triangle Ratios", default="0.5, 0.25, 0.125", description="Comma separated triangle ratio of LOD1, LOD2, ... compared to LOD0") # type: ignore[reportInvalidTypeForm]
+    export_tangents: BoolProperty(name="Export Tangents", default=True, description="Export the tangents of the first UV map, so Unreal doesn't have to recompute them") # type: ignore[reportInvalidTypeForm]
+    vertex_color_space: EnumProperty(
+        name="Vertex Colors",
+        items=[
+            ("SRGB", "sRGB", "Write vertex colors as sRGB bytes, the way they look in the viewport"),
+            ("LINEAR", "Linear", "Write the linear vertex color values"),
+        ],
+        default="SRGB",
+    ) # type: ignore[reportInvalidTypeForm]
+    sort_triangles_by_material: BoolProperty(name="Sort Triangles by Material", default=True, description="Group triangles so each material is a single section") # type: ignore[reportInvalidTypeForm]
+    optimize_vertex_cache: BoolProperty(name="Optimize Vertex Cache", default=False, description="Reorder triangles and vertices of every LOD for the gpu vertex cache and less overdraw") # type: ignore[reportInvalidTypeForm]
     export_collision: BoolProperty(name="Export Collision", default=True) # type: ignore[reportInvalidTypeForm]
+    build_convex_hulls: BoolProperty(name="Build Convex Hulls", default=True, description="Export the convex hull of every collision mesh instead of its triangles") # type: ignore[reportInvalidTypeForm]
+    max_hull_vertices: IntProperty(name="Max Hull Vertices", default=32, min=4, description="Hulls with more vertices are simplified down to this many") # type: ignore[reportInvalidTypeForm]
+    split_concave_collision: BoolProperty(name="Split Concave Collision", default=False, description="Split concave collision meshes into several convex hulls") # type: ignore[reportInvalidTypeForm]
+    max_hulls: IntProperty(name="Max Hulls", default=8, min=1, description="Most hulls a single collision mesh is split into") # type: ignore[reportInvalidTypeForm]
     export_morph_targets: BoolProperty(name="Export Morph Targets", default=True) # type: ignore[reportInvalidTypeForm]
+    morph_target_threshold: FloatProperty(name="Morph Delta Threshold", default=1e-5, min=0.0, precision=6) # type: ignore[reportInvalidTypeForm]
     export_sockets: BoolProperty(name="Export Sockets", default=True) # type: ignore[reportInvalidTypeForm]
     export_virtual_bones: BoolProperty(name="Export Virtual Bones", default=True) # type: ignore[reportInvalidTypeForm]
+    key_reduction: BoolProperty(name="Reduce Keys", default=True, description="Drop animation keys that linear interpolation between their neighbours already reproduces") # type: ignore[reportInvalidTypeForm]
+    position_tolerance: FloatProperty(name="Position Tolerance", default=1e-4, min=0.0, precision=6) # type: ignore[reportInvalidTypeForm]
+    rotation_tolerance: FloatProperty(name="Rotation Tolerance", default=1e-4, min=0.0, precision=6, subtype="ANGLE") # type: ignore[reportInvalidTypeForm]
+    scale_tolerance: FloatProperty(name="Scale Tolerance", default=1e-4, min=0.0, precision=6) # type: ignore[reportInvalidTypeForm]
 
     def get_props(self) -> dict[str, Any]:
         return {key: getattr(self, key) for key in self.__annotations__}
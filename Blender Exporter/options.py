@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 @dataclass(slots=True)
 class UEFormatOptions:
     scale_factor: float = 100
+    compression_type: str = "NONE"
+    profile_export: bool = False
 
     @classmethod
     def from_settings(cls, settings: UMESettings) -> UEFormatOptions:
@@ -20,8 +22,31 @@ class UEModelOptions(UEFormatOptions):
     # bone_length: float = 4.0
     # reorient_bones: bool = False
     export_collision: bool = True
+    build_convex_hulls: bool = True
+    max_hull_vertices: int = 32
+    split_concave_collision: bool = False
+    max_hulls: int = 8
     export_sockets: bool = True
     export_morph_targets: bool = True
+    morph_target_threshold: float = 1e-5
     export_lods: bool = True
+    generate_lods: bool = False
+    lod_ratios: str = "0.5, 0.25, 0.125"
+    export_tangents: bool = True
+    vertex_color_space: str = "SRGB"
+    sort_triangles_by_material: bool = True
+    optimize_vertex_cache: bool = False
     export_virtual_bones: bool = True
     export_selected_only: bool = False
+    batch_mode: str = "NONE"
+    validate_export: bool = False
+    streaming_export: bool = False
+    use_export_cache: bool = False
+    export_cache_size: float = 512  # MB
+
+@dataclass(slots=True)
+class UEAnimOptions(UEFormatOptions):
+    key_reduction: bool = True
+    position_tolerance: float = 1e-4
+    rotation_tolerance: float = 1e-4  # radians
+    scale_tolerance: float = 1e-4
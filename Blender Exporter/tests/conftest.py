@@ -0,0 +1,20 @@
+"""
+The add-on folder isn't an importable name, so load it as a package the same way cli.py does.
+Only the modules that don't need bpy are tested here.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+
+if "uemodel_exporter" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "uemodel_exporter",
+        PACKAGE_DIR / "__init__.py",
+        submodule_search_locations=[str(PACKAGE_DIR)],
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["uemodel_exporter"] = package
+    spec.loader.exec_module(package)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from uemodel_exporter.exporter.animation import interpolate_kept, key_errors, reduce_keys
+
+
+def random_positions(num_frames: int = 120, num_bones: int = 6) -> np.ndarray:
+    rng = np.random.default_rng(7)
+    # smooth curves with some noise on top, like baked mocap
+    frames = np.linspace(0.0, 4.0, num_frames)[:, None, None]
+    phases = rng.uniform(0, np.pi, (1, num_bones, 3))
+    return np.sin(frames * 2 + phases) + rng.normal(0.0, 0.002, (num_frames, num_bones, 3))
+
+
+def random_rotations(num_frames: int = 120, num_bones: int = 6) -> np.ndarray:
+    rng = np.random.default_rng(11)
+    axes = rng.normal(size=(1, num_bones, 3))
+    axes /= np.linalg.norm(axes, axis=-1, keepdims=True)
+    angles = np.cumsum(rng.normal(0.0, 0.05, (num_frames, num_bones)), axis=0)[..., None]
+    rotations = np.concatenate((axes * np.sin(angles / 2), np.cos(angles / 2)), axis=-1)
+    # q and -q are the same rotation, the reduction must not see a jump there
+    rotations[::7] *= -1
+    return rotations
+
+
+@pytest.mark.parametrize("tolerance", [0.001, 0.01, 0.1])
+def test_positions_stay_within_tolerance(tolerance):
+    values = random_positions()
+    keep = reduce_keys(values, tolerance)
+    assert np.all(keep[0])
+    errors = key_errors(values, interpolate_kept(values, keep))
+    assert errors.max() <= tolerance
+
+
+@pytest.mark.parametrize("tolerance", [0.001, 0.01, 0.05])
+def test_rotations_stay_within_tolerance(tolerance):
+    values = random_rotations()
+    keep = reduce_keys(values, tolerance, is_rotation=True)
+    errors = key_errors(values, interpolate_kept(values, keep, is_rotation=True), is_rotation=True)
+    assert errors.max() <= tolerance + 1e-6
+
+
+def test_larger_tolerance_keeps_fewer_keys():
+    values = random_positions()
+    counts = [np.count_nonzero(reduce_keys(values, tolerance)) for tolerance in (0.001, 0.01, 0.1)]
+    assert counts == sorted(counts, reverse=True)
+    assert counts[-1] < values.shape[0] * values.shape[1] // 4
+
+
+def test_zero_tolerance_keeps_every_key():
+    values = random_positions(10, 2)
+    assert np.all(reduce_keys(values, 0.0))
+
+
+def test_still_and_linear_tracks():
+    frames = np.arange(30, dtype=np.float64)[:, None, None]
+    still = np.broadcast_to([1.0, 2.0, 3.0], (30, 1, 3))
+    linear = np.concatenate((frames, frames * 2, frames * 0), axis=-1)
+    keep = reduce_keys(np.concatenate((still, linear), axis=1), 1e-4)
+
+    # a still track only needs its first key, a straight line its ends
+    np.testing.assert_array_equal(np.flatnonzero(keep[:, 0]), [0])
+    np.testing.assert_array_equal(np.flatnonzero(keep[:, 1]), [0, 29])
@@ -0,0 +1,124 @@
+import numpy as np
+
+from uemodel_exporter.exporter.builder import UEModelBuilder, make_morph_target, make_weights
+from uemodel_exporter.exporter.decimation import decimate_lod, parse_lod_ratios
+from uemodel_exporter.importer import classes as uf_classes
+
+GRID_SIZE = 16
+
+
+def make_grid() -> uf_classes.UEModelLOD:
+    """A bumpy grid, the left half uses one material and the right half another, every vertex weighted to two bones."""
+    steps = np.linspace(0.0, 1.0, GRID_SIZE + 1)
+    x, y = np.meshgrid(steps, steps, indexing="ij")
+    vertices = np.stack((x, y, 0.05 * np.sin(x * 6) * np.cos(y * 5)), axis=-1).reshape(-1, 3)
+
+    quads = np.arange((GRID_SIZE + 1) ** 2).reshape(GRID_SIZE + 1, GRID_SIZE + 1)[:-1, :-1].reshape(-1)
+    corners = np.stack((quads, quads + GRID_SIZE + 1, quads + GRID_SIZE + 2, quads + 1), axis=1)
+    triangles = np.concatenate((corners[:, [0, 1, 2]], corners[:, [0, 2, 3]]))
+    centers = vertices[triangles].mean(axis=1)
+    left = centers[:, 0] < 0.5
+    triangles = np.concatenate((triangles[left], triangles[~left]))
+
+    num_vertices = len(vertices)
+    vertex_indices = np.repeat(np.arange(num_vertices), 2)
+    bone_indices = np.tile([0, 1], num_vertices)
+    weights = np.stack((vertices[:, 0], 1.0 - vertices[:, 0]), axis=1).reshape(-1)
+
+    builder = UEModelBuilder()
+    return builder.add_lod(
+        "LOD0",
+        vertices,
+        triangles,
+        normals=np.tile([0.0, 0.0, 1.0], (num_vertices, 1)),
+        uvs=[vertices[:, :2]],
+        materials=[
+            uf_classes.Material("Left", 0, int(np.count_nonzero(left))),
+            uf_classes.Material("Right", int(np.count_nonzero(left)) * 3, int(np.count_nonzero(~left))),
+        ],
+        weights=make_weights(bone_indices, vertex_indices, weights),
+        morphs=[make_morph_target("Lift", np.arange(num_vertices), np.tile([0.0, 0.0, 1.0], (num_vertices, 1)))],
+    )
+
+
+def source_vertices(lod: uf_classes.UEModelLOD, decimated: uf_classes.UEModelLOD) -> np.ndarray:
+    """Index of the input vertex every decimated vertex was kept from, decimation never moves vertices."""
+    lookup = {tuple(vertex): index for index, vertex in enumerate(lod.vertices.tolist())}
+    return np.array([lookup[tuple(vertex)] for vertex in decimated.vertices.tolist()])
+
+
+def test_reduces_triangles():
+    lod = make_grid()
+    decimated = decimate_lod(lod, 0.25, "LOD1")
+    assert decimated.name == "LOD1"
+    assert len(decimated.indices) < len(lod.indices) // 2
+    assert decimated.indices.min() >= 0
+    assert decimated.indices.max() < len(decimated.vertices)
+
+
+def test_keeps_material_sections():
+    lod = make_grid()
+    decimated = decimate_lod(lod, 0.25, "LOD1")
+
+    assert [material.material_name for material in decimated.materials] == ["Left", "Right"]
+    first_index = 0
+    for material in decimated.materials:
+        assert material.first_index == first_index
+        first_index += material.num_faces * 3
+    assert first_index == decimated.indices.size
+
+    # the vertices between the sections are locked, so no triangle can cross over
+    centers = decimated.vertices[decimated.indices].mean(axis=1)
+    left, right = decimated.materials
+    assert np.all(centers[:left.num_faces, 0] < 0.5)
+    assert np.all(centers[left.num_faces:, 0] > 0.5)
+
+
+def test_keeps_weights_and_morphs():
+    lod = make_grid()
+    decimated = decimate_lod(lod, 0.25, "LOD1")
+    sources = source_vertices(lod, decimated)
+
+    weights = decimated.weights
+    assert weights["vertex_index"].min() >= 0
+    assert weights["vertex_index"].max() < len(decimated.vertices)
+    assert len(weights) == 2 * len(decimated.vertices)
+
+    # every kept vertex keeps exactly the weights it had, so they still sum to 1
+    original = {(int(weight["vertex_index"]), int(weight["bone_index"])): weight["weight"] for weight in lod.weights}
+    for weight in weights:
+        assert original[(int(sources[weight["vertex_index"]]), int(weight["bone_index"]))] == weight["weight"]
+    sums = np.bincount(weights["vertex_index"], weights=weights["weight"], minlength=len(decimated.vertices))
+    np.testing.assert_allclose(sums, 1.0, rtol=1e-6)
+
+    morph, = decimated.morphs
+    np.testing.assert_array_equal(np.sort(morph.deltas["vertex_index"]), np.arange(len(decimated.vertices)))
+
+
+def test_generates_chains_per_level():
+    builder = UEModelBuilder()
+    builder.lods.append(make_grid())
+    chains = builder.generate_lod_chains([0.5, 0.25])
+
+    assert [lod.name for lod in builder.lods] == ["LOD0", "LOD1", "LOD2"]
+    face_counts = [len(lod.indices) for lod in builder.lods]
+    assert face_counts == sorted(face_counts, reverse=True)
+    assert len(chains) == 1
+
+
+def test_merges_levels_of_several_objects():
+    builder = UEModelBuilder()
+    builder.lods.extend((make_grid(), make_grid()))
+    builder.generate_lod_chains([0.5])
+
+    assert [lod.name for lod in builder.lods] == ["LOD0", "LOD1"]
+    base, reduced = builder.lods
+    assert len(base.vertices) == 2 * (GRID_SIZE + 1) ** 2
+    assert reduced.indices.max() < len(reduced.vertices)
+    assert reduced.weights["vertex_index"].max() < len(reduced.vertices)
+    assert sum(material.num_faces for material in reduced.materials) == len(reduced.indices)
+
+
+def test_parse_lod_ratios():
+    assert parse_lod_ratios("0.5, 0.25;0.1") == [0.5, 0.25, 0.1]
+    assert parse_lod_ratios("1, 0, -2, 0.5,") == [0.5]
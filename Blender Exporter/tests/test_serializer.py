@@ -0,0 +1,152 @@
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from uemodel_exporter.exporter.builder import UEModelBuilder, make_morph_target, make_weights, serialize_entry
+from uemodel_exporter.exporter.streaming import stream_uemodel
+from uemodel_exporter.importer import classes as uf_classes
+from uemodel_exporter.importer.reader import UEModelReader
+from uemodel_exporter.importer.validation import validate_uemodel
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+# a unit cube split into two material sections, every value is exact in float32 so
+# the fixture doesn't depend on rounding
+CUBE_VERTICES = np.array(
+    [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]],
+    dtype=np.float32,
+) * 0.5
+CUBE_INDICES = np.array(
+    [
+        [0, 2, 1], [0, 3, 2], [4, 5, 6], [4, 6, 7], [0, 1, 5], [0, 5, 4],
+        [1, 2, 6], [1, 6, 5], [2, 3, 7], [2, 7, 6], [3, 0, 4], [3, 4, 7],
+    ],
+    dtype=np.int32,
+)
+CUBE_NORMALS = np.repeat(np.eye(3, dtype=np.float32), [3, 3, 2], axis=0)
+CUBE_UVS = CUBE_VERTICES[:, :2]
+CUBE_COLORS = (CUBE_VERTICES[:, [0, 1, 2, 0]] * 2).astype(np.float32)
+
+
+def skeleton_matrices() -> np.ndarray:
+    matrices = np.tile(np.eye(4, dtype=np.float32), (3, 1, 1))
+    matrices[:, :3, 3] = [[0, 0, 0], [0, 0, 0.5], [0, 0.25, 1]]
+    return matrices
+
+
+def add_cube(builder: UEModelBuilder, name: str = "LOD0") -> uf_classes.UEModelLOD:
+    return builder.add_lod(
+        name,
+        CUBE_VERTICES,
+        CUBE_INDICES,
+        normals=CUBE_NORMALS,
+        uvs=[CUBE_UVS],
+        colors=[uf_classes.VertexColor("Col", CUBE_COLORS)],
+        materials=[uf_classes.Material("Top", 0, 6), uf_classes.Material("Bottom", 18, 6)],
+        weights=make_weights([0, 1, 0, 1], [0, 4, 5, 6], [1.0, 0.5, 0.5, 0.25]),
+        morphs=[make_morph_target("Squash", [4, 5], [[0, 0, -0.25], [0, 0, -0.5]], [[0, 0, 1], [0, 0, 1]])],
+    )
+
+
+def build_model() -> UEModelBuilder:
+    builder = UEModelBuilder()
+    builder.set_skeleton(["root", "spine", "socket"], [-1, 0, 1], skeleton_matrices(), socket_indices=[2])
+    add_cube(builder)
+    builder.add_collision("Box", CUBE_VERTICES, CUBE_INDICES[:4])
+    return builder
+
+
+def write_model(compression_type: str = "NONE") -> bytes:
+    stream = io.BytesIO()
+    build_model().write(stream, "Cube", compression_type=compression_type)
+    return stream.getvalue()
+
+
+def stream_model(compression_type: str = "NONE") -> bytes:
+    skeleton_builder = UEModelBuilder()
+    skeleton_builder.set_skeleton(["root", "spine", "socket"], [-1, 0, 1], skeleton_matrices(), socket_indices=[2])
+    num_bones, removed_bones = skeleton_builder.num_bones, skeleton_builder.removed_bones
+
+    stream = io.BytesIO()
+    with stream_uemodel(stream, "Cube", compression_type=compression_type) as writer:
+        builder = UEModelBuilder()
+        builder.set_bone_removal(num_bones, removed_bones)
+        add_cube(builder)
+        writer.write_lod(builder.build().lods[0])
+        writer.write_skeleton(skeleton_builder.build().skeleton)
+        writer.write_collision(uf_classes.ConvexCollision("Box", CUBE_VERTICES, CUBE_INDICES[:4]))
+    return stream.getvalue()
+
+
+def test_matches_baseline_fixture():
+    # cube.uemodel was written by the serializer before it moved to numpy arrays
+    assert write_model() == (FIXTURES / "cube.uemodel").read_bytes()
+
+
+def test_serialized_entries_match_built_lods():
+    # what the section cache stores has to write the same bytes as the LOD it came from
+    built_lod = build_model().build().lods[0]
+    builder = UEModelBuilder()
+    builder.set_skeleton(["root", "spine", "socket"], [-1, 0, 1], skeleton_matrices(), socket_indices=[2])
+    builder.add_serialized_lod(serialize_entry(built_lod, 100))
+    builder.add_collision("Box", CUBE_VERTICES, CUBE_INDICES[:4])
+
+    stream = io.BytesIO()
+    builder.write(stream, "Cube")
+    assert stream.getvalue() == write_model()
+
+
+@pytest.mark.parametrize("compression_type", ["NONE", "GZIP"])
+def test_stream_matches_buffered(compression_type, tmp_path):
+    streamed, buffered = stream_model(compression_type), write_model(compression_type)
+    if compression_type == "NONE":
+        assert streamed == buffered
+        return
+
+    # compressed bytes can differ in the gzip header, the payload can't
+    payloads = []
+    for index, data in enumerate((streamed, buffered)):
+        path = tmp_path / f"{index}.uemodel"
+        path.write_bytes(data)
+        with UEModelReader(path) as reader:
+            payloads.append(bytes(reader.ar.data))
+    assert payloads[0] == payloads[1]
+
+
+def test_gzip_round_trip(tmp_path):
+    path = tmp_path / "cube.uemodel"
+    path.write_bytes(write_model("GZIP"))
+    assert validate_uemodel(path) == []
+
+    with UEModelReader(path) as reader:
+        assert reader.is_compressed
+        assert reader.compression_type == "GZIP"
+        lod, = reader.lods
+        assert lod.name == "LOD0"
+        np.testing.assert_array_equal(reader.vertices(lod), CUBE_VERTICES * 100)
+        np.testing.assert_array_equal(reader.indices(lod).reshape(-1, 3), CUBE_INDICES)
+        np.testing.assert_array_equal(reader.normals(lod)[:, 1:], CUBE_NORMALS)
+        np.testing.assert_array_equal(reader.texcoords(lod)[0], CUBE_UVS)
+        assert reader.materials(lod) == [("Top", 0, 6), ("Bottom", 18, 6)]
+
+        weights = reader.weights(lod)
+        np.testing.assert_array_equal(weights["vertex_index"], [0, 4, 5, 6])
+        np.testing.assert_array_equal(weights["weight"], [1.0, 0.5, 0.5, 0.25])
+
+        (morph_name, deltas), = reader.morph_targets(lod)
+        assert morph_name == "Squash"
+        np.testing.assert_array_equal(deltas["position"], [[0, 0, -25], [0, 0, -50]])
+
+        assert [bone[0] for bone in reader.bones()] == ["root", "spine"]
+        (collision_name, vertices, indices), = reader.collisions()
+        assert collision_name == "Box"
+        np.testing.assert_array_equal(vertices, CUBE_VERTICES * 100)
+        np.testing.assert_array_equal(indices, CUBE_INDICES[:4].reshape(-1))
+
+
+def test_validator_finds_truncated_files(tmp_path):
+    path = tmp_path / "cube.uemodel"
+    path.write_bytes(write_model()[:-20])
+    assert validate_uemodel(path) != []